@@ -0,0 +1,308 @@
+"""
+Benchmarks for the WESAD feature pipeline on full-length recordings.
+Usage: python -m stress_detection.data.benchmark_features [--subjects 3] [--minutes 100]
+       [--loader] [--resample]
+Each vectorized step is timed against the original per-element loop kept
+here as a reference, and both outputs are checked for equality.
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import numpy as np
+from scipy import signal as scipy_signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from stress_detection.data.feature_engineering import (
+    compute_ibi, create_windows, map_wesad_labels, resample_to_4hz,
+)
+from stress_detection.data.wesad_loader import WESADLoader
+
+
+def compute_ibi_loop(bvp_4hz: np.ndarray) -> np.ndarray:
+    """Original per-peak loop version of compute_ibi."""
+    peaks, _ = scipy_signal.find_peaks(bvp_4hz, distance=2)
+    ibi_series = np.full(len(bvp_4hz), 800.0, dtype=np.float32)
+    for i in range(1, len(peaks)):
+        ibi_ms = (peaks[i] - peaks[i - 1]) / 4.0 * 1000.0
+        ibi_series[peaks[i - 1]:peaks[i]] = ibi_ms
+    if len(peaks) >= 2:
+        first_ibi = (peaks[1] - peaks[0]) / 4.0 * 1000.0
+        ibi_series[:peaks[0]] = first_ibi
+        ibi_series[peaks[-1]:] = ibi_series[peaks[-1] - 1]
+    return ibi_series
+
+
+def map_wesad_labels_loop(
+    labels_700hz: np.ndarray,
+    eda_4hz: np.ndarray,
+    ibi_4hz: np.ndarray,
+) -> np.ndarray:
+    """Original per-slot bincount version of map_wesad_labels."""
+    factor = 700 // 4
+    n_out = len(labels_700hz) // factor
+    labels_4hz = np.array([
+        np.bincount(np.clip(labels_700hz[i * factor:(i + 1) * factor], 0, 4)).argmax()
+        for i in range(n_out)
+    ], dtype=np.int32)
+
+    length = min(len(labels_4hz), len(eda_4hz), len(ibi_4hz))
+    labels_4hz = labels_4hz[:length]
+    eda = eda_4hz[:length]
+    ibi = ibi_4hz[:length]
+
+    stress_mask = labels_4hz == 2
+    if stress_mask.sum() > 0:
+        eda_75 = np.percentile(eda[stress_mask], 75)
+        ibi_25 = np.percentile(ibi[stress_mask], 25)
+    else:
+        eda_75, ibi_25 = np.inf, 0.0
+
+    mapped = np.full(length, -1, dtype=np.int32)
+    mapped[labels_4hz == 1] = 0
+    mapped[labels_4hz == 3] = 1
+    moderate = stress_mask & ~((eda > eda_75) & (ibi < ibi_25))
+    critical = stress_mask & (eda > eda_75) & (ibi < ibi_25)
+    mapped[moderate] = 2
+    mapped[critical] = 3
+    return mapped
+
+
+def create_windows_loop(
+    features: np.ndarray,
+    labels: np.ndarray,
+    window_size: int = 30,
+    step: int = 15,
+):
+    """Original per-window loop version of create_windows."""
+    X, y = [], []
+    for start in range(0, len(features) - window_size + 1, step):
+        end = start + window_size
+        window_labels = labels[start:end]
+        if np.any(window_labels == -1):
+            continue
+        label = int(np.bincount(window_labels, minlength=4)[:4].argmax())
+        X.append(features[start:end])
+        y.append(label)
+    return np.array(X, dtype=np.float32), np.array(y, dtype=np.int32)
+
+
+def synthetic_recording(minutes: float = 100.0, seed: int = 0) -> Dict[str, np.ndarray]:
+    """
+    WESAD-shaped wrist recording: BVP 64 Hz, EDA/TEMP 4 Hz, ACC 32 Hz, labels 700 Hz.
+    A full WESAD session is roughly 100 minutes.
+    """
+    rng = np.random.default_rng(seed)
+    seconds = int(minutes * 60)
+    t_bvp = np.arange(seconds * 64) / 64.0
+    heart_hz = 1.2 + 0.2 * np.sin(2 * np.pi * t_bvp / 600.0)
+    bvp = np.sin(2 * np.pi * np.cumsum(heart_hz) / 64.0) + 0.3 * rng.standard_normal(t_bvp.size)
+    # Protocol-like label blocks: baseline, stress, amusement, meditation, undefined
+    blocks = rng.choice([0, 1, 2, 3, 4], size=seconds // 60 + 1, p=[0.2, 0.3, 0.2, 0.15, 0.15])
+    labels = np.repeat(blocks, 60 * 700)[:seconds * 700]
+    return {
+        'BVP': bvp.astype(np.float32),
+        'EDA': (2.0 + rng.standard_normal(seconds * 4).cumsum() * 0.01).astype(np.float32),
+        'TEMP': (33.0 + rng.standard_normal(seconds * 4) * 0.05).astype(np.float32),
+        'ACC': np.abs(1.0 + 0.1 * rng.standard_normal(seconds * 32)).astype(np.float32),
+        'labels': labels.astype(np.int32),
+    }
+
+
+def best_time(fn: Callable, repeats: int = 3) -> float:
+    """Best wall time of `repeats` calls, in ms."""
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000
+
+
+def compare(name: str, fast: Callable, reference: Callable, repeats: int = 3) -> dict:
+    """Time both implementations and check their outputs are identical."""
+    out_fast, out_ref = fast(), reference()
+    if isinstance(out_fast, tuple):
+        identical = all(np.array_equal(a, b) for a, b in zip(out_fast, out_ref))
+    else:
+        identical = np.array_equal(out_fast, out_ref)
+    fast_ms = best_time(fast, repeats)
+    ref_ms = best_time(reference, repeats)
+    return {
+        'step': name,
+        'reference_ms': round(ref_ms, 3),
+        'vectorized_ms': round(fast_ms, 3),
+        'speedup': round(ref_ms / fast_ms, 1) if fast_ms else 0.0,
+        'identical': bool(identical),
+    }
+
+
+def benchmark_subject(rec: Dict[str, np.ndarray], repeats: int = 3) -> list:
+    bvp = resample_to_4hz(rec['BVP'], 64)
+    ibi = compute_ibi(bvp)
+    eda, labels = rec['EDA'], rec['labels']
+    rows = [
+        compare('compute_ibi', lambda: compute_ibi(bvp), lambda: compute_ibi_loop(bvp), repeats),
+        compare('map_wesad_labels',
+                lambda: map_wesad_labels(labels, eda, ibi),
+                lambda: map_wesad_labels_loop(labels, eda, ibi), repeats),
+    ]
+    mapped = map_wesad_labels(labels, eda, ibi)
+    acc = resample_to_4hz(rec['ACC'], 32)
+    n = min(len(bvp), len(eda), len(rec['TEMP']), len(acc), len(ibi), len(mapped))
+    features = np.stack([bvp[:n], eda[:n], rec['TEMP'][:n], acc[:n], ibi[:n]], axis=1)
+    rows.append(compare('create_windows',
+                        lambda: create_windows(features, mapped[:n]),
+                        lambda: create_windows_loop(features, mapped[:n]), repeats))
+    return rows
+
+
+def _peak_mb(fn: Callable) -> float:
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round(peak / 2 ** 20, 1)
+
+
+def benchmark_resample(minutes: float = 100.0, source_hz: int = 64, chunk_size: int = 1 << 16,
+                       repeats: int = 3) -> list:
+    """
+    Speed, peak memory and fidelity of each resample_to_4hz method.
+    The test signal is in-band sines plus a slow drift, with 6 Hz and 15 Hz
+    components above the 2 Hz Nyquist that must be filtered out. Errors are
+    against the in-band part sampled at 4 Hz: RMS away from the ends, and
+    the maximum within 30 s of either end (edge ringing). Peak memory is
+    what tracemalloc sees, which leaves out scipy.fft's internal buffers.
+    """
+    # Odd length, as real recordings have: FFT sizes are rarely powers of two
+    t = np.arange(int(minutes * 60 * source_hz) + 7) / source_hz
+    duration = t[-1] + 1 / source_hz
+
+    def in_band(tt):
+        return (np.sin(2 * np.pi * 0.2 * tt) + 0.5 * np.sin(2 * np.pi * 0.9 * tt)
+                + 0.3 * np.sin(2 * np.pi * 1.4 * tt) + tt / duration)
+
+    x = (in_band(t) + 0.5 * np.sin(2 * np.pi * 6.0 * t) + 0.5 * np.sin(2 * np.pi * 15.0 * t)).astype(np.float32)
+    n_out = int(len(x) * 4 / source_hz)
+    ideal = in_band(np.arange(n_out) / 4.0)
+    edge = 30 * 4
+
+    rows = []
+    for name, kwargs in (('fft', {'method': 'fft'}),
+                         ('poly', {'method': 'poly'}),
+                         ('poly_chunked', {'method': 'poly', 'chunk_size': chunk_size})):
+        def run():
+            return resample_to_4hz(x, source_hz, **kwargs)
+        err = run() - ideal
+        rows.append({
+            'method': name,
+            'ms': round(best_time(run, repeats), 2),
+            'peak_mb': _peak_mb(run),
+            'rms_error': float(f"{np.sqrt(np.mean(err[edge:-edge] ** 2)):.3g}"),
+            'edge_max_error': float(f"{np.abs(np.r_[err[:edge], err[-edge:]]).max():.3g}"),
+        })
+    return rows
+
+
+def write_wesad_pickle(data_dir: str, subject: str, rec: Dict[str, np.ndarray]) -> str:
+    """Write rec as a WESAD .pkl, including 700 Hz chest channels like the real files."""
+    n_chest = len(rec['labels'])
+    rng = np.random.default_rng(0)
+    chest = {name: rng.standard_normal((n_chest, width))
+             for name, width in (('ACC', 3), ('ECG', 1), ('EMG', 1), ('EDA', 1), ('Temp', 1), ('Resp', 1))}
+    acc = np.repeat(rec['ACC'][:, None] / np.sqrt(3), 3, axis=1)
+    data = {
+        'signal': {
+            'chest': chest,
+            'wrist': {
+                'BVP': rec['BVP'][:, None].astype(np.float64),
+                'EDA': rec['EDA'][:, None].astype(np.float64),
+                'TEMP': rec['TEMP'][:, None].astype(np.float64),
+                'ACC': acc.astype(np.float64),
+            },
+        },
+        'label': rec['labels'],
+        'subject': subject,
+    }
+    os.makedirs(os.path.join(data_dir, subject), exist_ok=True)
+    path = os.path.join(data_dir, subject, f"{subject}.pkl")
+    with open(path, 'wb') as f:
+        pickle.dump(data, f)
+    return path
+
+
+def _load_and_touch(loader: WESADLoader, subject: str) -> float:
+    d = loader.load_subject(subject)
+    return float(sum(np.asarray(d[k]).sum() for k in ('BVP', 'EDA', 'TEMP', 'ACC', 'labels')))
+
+
+def benchmark_loader(rec: Dict[str, np.ndarray], repeats: int = 3) -> dict:
+    """Load time and peak Python heap of pickle vs columnar loading (every channel read)."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        pkl = write_wesad_pickle(data_dir, 'S2', rec)
+        loader = WESADLoader(data_dir)
+        results = {'pickle_mb': round(os.path.getsize(pkl) / 2 ** 20, 1)}
+
+        def measure(name):
+            results[f'{name}_ms'] = round(best_time(lambda: _load_and_touch(loader, 'S2'), repeats), 2)
+            results[f'{name}_peak_mb'] = _peak_mb(lambda: _load_and_touch(loader, 'S2'))
+
+        measure('pickle')
+        expected = {k: np.array(v) for k, v in loader.load_subject('S2').items() if k != 'subject'}
+        loader.convert_subject('S2')
+        measure('columnar')
+        lazy = loader.load_subject('S2')
+        results['identical'] = all(np.array_equal(lazy[k], v) for k, v in expected.items())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized WESAD feature steps")
+    parser.add_argument('--subjects', type=int, default=3)
+    parser.add_argument('--minutes', type=float, default=100.0, help="Recording length per subject")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--loader', action='store_true',
+                        help="Also compare pickle and columnar subject loading")
+    parser.add_argument('--resample', action='store_true',
+                        help="Also compare resample_to_4hz methods on 64 Hz BVP-like input")
+    parser.add_argument('--output', help="Also write the results JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for seed in range(args.subjects):
+        rec = synthetic_recording(args.minutes, seed)
+        for row in benchmark_subject(rec, args.repeats):
+            results.append({'subject': seed, **row})
+            print(f"  subject {seed}  {row['step']:<18} {row['reference_ms']:>10.2f} ms -> "
+                  f"{row['vectorized_ms']:>8.2f} ms  ({row['speedup']}x, identical={row['identical']})")
+
+        if args.loader:
+            row = benchmark_loader(rec, args.repeats)
+            results.append({'subject': seed, 'step': 'load_subject', **row})
+            print(f"  subject {seed}  load_subject       pickle {row['pickle_ms']:.1f} ms / "
+                  f"{row['pickle_peak_mb']} MB -> columnar {row['columnar_ms']:.1f} ms / "
+                  f"{row['columnar_peak_mb']} MB  (identical={row['identical']})")
+
+    if args.resample:
+        for row in benchmark_resample(args.minutes, repeats=args.repeats):
+            results.append({'step': 'resample_to_4hz', **row, 'identical': True})
+            print(f"  resample {row['method']:<13} {row['ms']:>8.2f} ms  peak {row['peak_mb']:>6.1f} MB  "
+                  f"rms err {row['rms_error']:.2e}  edge err {row['edge_max_error']:.2e}")
+
+    if not all(r['identical'] for r in results):
+        raise AssertionError("Vectorized output differs from the reference implementation")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
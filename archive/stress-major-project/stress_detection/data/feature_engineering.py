@@ -1,30 +1,110 @@
+from math import gcd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy import signal as scipy_signal
 from typing import Tuple, Optional
 
 
-def resample_to_4hz(arr: np.ndarray, source_hz: int) -> np.ndarray:
-    """Resample 1-D signal from source_hz to 4 Hz."""
+RESAMPLE_METHODS = ('fft', 'poly')
+
+
+class PolyphaseResampler:
+    """
+    Streaming polyphase resampler (scipy resample_poly) for unbounded signals.
+    Input is processed in chunks with enough overlap on each side to cover
+    the anti-aliasing FIR, so the concatenated output equals one
+    resample_poly call over the whole signal (to float rounding) while
+    memory stays bounded by the chunk size.
+    """
+
+    def __init__(self, up: int, down: int, chunk_size: int = 1 << 16):
+        g = gcd(up, down)
+        self.up, self.down = up // g, down // g
+        # Input samples the FIR reaches on each side (resample_poly uses a
+        # half-length of 10 * max(up, down) at the upsampled rate), rounded
+        # up to whole output periods so chunk boundaries stay aligned
+        half = -(-10 * max(self.up, self.down) // self.up)
+        self.overlap = (half // self.down + 1) * self.down
+        self.chunk = max(1, chunk_size // self.down) * self.down
+        self._buffer = np.zeros(0, dtype=np.float64)
+        self._context = 0   # leading samples of _buffer kept only as left context
+
+    def _resample(self, x: np.ndarray) -> np.ndarray:
+        return scipy_signal.resample_poly(x, self.up, self.down)
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        """Feed the next input samples; return the output that is now final."""
+        self._buffer = np.concatenate([self._buffer, np.asarray(x, dtype=np.float64)])
+        out = []
+        while len(self._buffer) - self._context >= self.chunk + self.overlap:
+            window = self._buffer[:self._context + self.chunk + self.overlap]
+            skip = self._context * self.up // self.down
+            keep = self.chunk * self.up // self.down
+            out.append(self._resample(window)[skip:skip + keep])
+            # Keep up to `overlap` samples before the next chunk as its left context
+            context = min(self.overlap, self._context + self.chunk)
+            self._buffer = self._buffer[self._context + self.chunk - context:]
+            self._context = context
+        return np.concatenate(out) if out else np.zeros(0)
+
+    def flush(self) -> np.ndarray:
+        """Output for the remaining input (zero-padded past the end, as resample_poly)."""
+        if len(self._buffer) - self._context <= 0:
+            return np.zeros(0)
+        skip = self._context * self.up // self.down
+        tail = self._resample(self._buffer)[skip:]
+        self._buffer = self._buffer[len(self._buffer) - self._context:]
+        return tail
+
+
+def resample_to_4hz(
+    arr: np.ndarray,
+    source_hz: int,
+    method: str = 'fft',
+    chunk_size: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Resample 1-D signal from source_hz to 4 Hz.
+    method='fft' is scipy.signal.resample over the whole signal (periodic,
+    rings at the edges). method='poly' is polyphase FIR filtering
+    (resample_poly); with chunk_size it runs chunk-wise with overlap through
+    PolyphaseResampler, for recordings too long to filter in one piece.
+    Both return int(len * 4 / source_hz) samples.
+    """
     if source_hz == 4:
         return arr
+    if method not in RESAMPLE_METHODS:
+        raise ValueError(f"Unknown resample method '{method}' (choose from {RESAMPLE_METHODS})")
     n_out = int(len(arr) * 4 / source_hz)
-    return scipy_signal.resample(arr, n_out).astype(np.float32)
+    if method == 'fft':
+        return scipy_signal.resample(arr, n_out).astype(np.float32)
+    if chunk_size is None:
+        out = scipy_signal.resample_poly(np.asarray(arr, dtype=np.float64), 4, source_hz)
+    else:
+        resampler = PolyphaseResampler(4, source_hz, chunk_size)
+        # Feed chunk by chunk so only one chunk (plus overlap) is ever filtered or copied
+        parts = [resampler.process(arr[i:i + chunk_size]) for i in range(0, len(arr), chunk_size)]
+        out = np.concatenate(parts + [resampler.flush()])
+    return out[:n_out].astype(np.float32)
 
 
 def compute_ibi(bvp_4hz: np.ndarray) -> np.ndarray:
     """
     Estimate IBI (ms) from BVP at 4 Hz.
     Returns forward-filled IBI series of same length as input.
+    Each peak-to-peak interval fills [peak, next peak); the first interval is
+    back-filled before the first peak and the last one forward-filled after
+    the last peak. Fewer than 2 peaks leaves the 800 ms resting default.
     """
     peaks, _ = scipy_signal.find_peaks(bvp_4hz, distance=2)  # min 0.5s gap
     ibi_series = np.full(len(bvp_4hz), 800.0, dtype=np.float32)  # default resting
-    for i in range(1, len(peaks)):
-        ibi_ms = (peaks[i] - peaks[i - 1]) / 4.0 * 1000.0
-        ibi_series[peaks[i - 1]:peaks[i]] = ibi_ms
-    if len(peaks) >= 2:
-        first_ibi = (peaks[1] - peaks[0]) / 4.0 * 1000.0
-        ibi_series[:peaks[0]] = first_ibi  # back-fill pre-peak region
-        ibi_series[peaks[-1]:] = ibi_series[peaks[-1] - 1]  # forward-fill tail
+    if len(peaks) < 2:
+        return ibi_series
+    gaps = np.diff(peaks)
+    ibi_ms = gaps / 4.0 * 1000.0
+    ibi_series[peaks[0]:peaks[-1]] = np.repeat(ibi_ms, gaps)
+    ibi_series[:peaks[0]] = ibi_ms[0]  # back-fill pre-peak region
+    ibi_series[peaks[-1]:] = ibi_ms[-1]  # forward-fill tail
     return ibi_series
 
 
@@ -44,10 +124,18 @@ def map_wesad_labels(
     """
     factor = 700 // 4  # 175 samples per 4 Hz slot
     n_out = len(labels_700hz) // factor
-    labels_4hz = np.array([
-        np.bincount(np.clip(labels_700hz[i * factor:(i + 1) * factor], 0, 4)).argmax()
-        for i in range(n_out)
-    ], dtype=np.int32)
+    # Mode pooling over [n_out, 175] slots. Protocol labels come in long runs,
+    # so most slots hold one label; only mixed slots get a 5-class count.
+    # argmax breaks ties toward the lower label, like bincount(...).argmax().
+    slots = np.clip(labels_700hz[:n_out * factor], 0, 4).astype(np.uint8).reshape(n_out, factor)
+    labels_4hz = slots[:, 0].astype(np.int32)
+    mixed = np.flatnonzero((slots != slots[:, :1]).any(axis=1))
+    if len(mixed):
+        mixed_slots = slots[mixed]
+        counts = np.stack(
+            [(mixed_slots == c).sum(axis=1, dtype=np.int16) for c in range(5)], axis=1
+        )
+        labels_4hz[mixed] = counts.argmax(axis=1)
 
     length = min(len(labels_4hz), len(eda_4hz), len(ibi_4hz))
     labels_4hz = labels_4hz[:length]
@@ -82,18 +170,27 @@ def create_windows(
     features: [N, n_features]   labels: [N]
     Returns (X, y): X shape [windows, window_size, n_features]
     Windows containing any label == -1 are discarded.
+    Windows are strided views of `features`; when no window is discarded and
+    features is already float32, X is a read-only view that shares memory
+    with `features` (overlapping windows share rows), otherwise a copy.
     """
-    X, y = [], []
-    for start in range(0, len(features) - window_size + 1, step):
-        end = start + window_size
-        window_labels = labels[start:end]
-        if np.any(window_labels == -1):
-            continue
-        # Clamp to 4 classes; argmax breaks ties toward lower index (calm wins)
-        label = int(np.bincount(window_labels, minlength=4)[:4].argmax())
-        X.append(features[start:end])
-        y.append(label)
-    return np.array(X, dtype=np.float32), np.array(y, dtype=np.int32)
+    n = len(features)
+    if n < window_size:
+        return np.array([], dtype=np.float32), np.array([], dtype=np.int32)
+    # [windows, window_size] and [windows, window_size, n_features] views
+    label_windows = sliding_window_view(labels, window_size)[::step]
+    feature_windows = sliding_window_view(features, window_size, axis=0)[::step].transpose(0, 2, 1)
+
+    keep = ~np.any(label_windows == -1, axis=1)
+    if not keep.any():
+        return np.array([], dtype=np.float32), np.array([], dtype=np.int32)
+    if not keep.all():
+        label_windows = label_windows[keep]
+        feature_windows = feature_windows[keep]
+    # Clamp to 4 classes; argmax breaks ties toward lower index (calm wins)
+    counts = np.stack([(label_windows == c).sum(axis=1) for c in range(4)], axis=1)
+    y = counts.argmax(axis=1).astype(np.int32)
+    return np.asarray(feature_windows, dtype=np.float32), y
 
 
 def normalize_features(
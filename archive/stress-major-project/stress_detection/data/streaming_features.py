@@ -0,0 +1,157 @@
+"""
+Incremental feature extraction for live stress inference.
+Accepts BVP/EDA/TEMP/ACC chunks as they arrive and emits normalized
+[window_size, 5] windows every `step` 4 Hz samples with bounded memory.
+"""
+import os
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from stress_detection.data.feature_engineering import PolyphaseResampler
+
+FEATURES = ('BVP', 'EDA', 'TEMP', 'ACC', 'IBI')  # column order of training windows
+DEFAULT_IBI_MS = 800.0  # compute_ibi's resting default
+
+
+class StreamingPeakDetector:
+    """
+    Online local-maximum detection on the 4 Hz BVP stream.
+    Same rule as scipy.signal.find_peaks(x, distance=2): a sample higher
+    than its left neighbour and not lower than the samples up to the next
+    drop; flat tops report their middle sample. distance=2 never removes
+    such peaks, so it needs no extra state.
+    """
+
+    def __init__(self):
+        self.n = 0            # samples seen
+        self._prev = None     # last sample value
+        self._rise = None     # index where the current candidate top started
+        self._top = None      # value of the candidate top
+
+    def push(self, x: np.ndarray) -> list:
+        """Feed samples; return indices of peaks confirmed by them."""
+        peaks = []
+        for value in np.asarray(x, dtype=np.float64).tolist():
+            i = self.n
+            if self._rise is not None and value != self._top:
+                if value < self._top:
+                    peaks.append((self._rise + i - 1) // 2)
+                self._rise = None
+            if self._rise is None and self._prev is not None and self._prev < value:
+                self._rise, self._top = i, value
+            self._prev = value
+            self.n += 1
+        return peaks
+
+
+class StreamingFeatureExtractor:
+    """
+    Chunked BVP/EDA/TEMP/ACC in, normalized model windows out.
+
+    BVP (64 Hz) and ACC (32 Hz) go through streaming polyphase resamplers,
+    so features match resample_to_4hz(..., method='poly'); train with
+    --resample BVP=poly --resample ACC=poly for identical inputs. IBI fills
+    each sample with the interval of the peaks around it, like compute_ibi,
+    and falls back to the last known interval once no new peak arrives
+    within `ibi_delay` samples. A 4 Hz frame is released when every channel
+    has reached it, then kept in a window_size ring buffer; memory is the
+    ring plus however far the channels' chunks run ahead of each other.
+    """
+
+    def __init__(
+        self,
+        means: np.ndarray,
+        stds: np.ndarray,
+        window_size: int = 30,
+        step: int = 15,
+        bvp_hz: int = 64,
+        acc_hz: int = 32,
+        ibi_delay: int = 8,
+        chunk_size: int = 1024,
+    ):
+        self.means = np.asarray(means, dtype=np.float32)
+        self.stds = np.asarray(stds, dtype=np.float32)
+        self.window_size = window_size
+        self.step = step
+        self.ibi_delay = ibi_delay
+        self._bvp_resampler = PolyphaseResampler(4, bvp_hz, chunk_size)
+        self._acc_resampler = PolyphaseResampler(4, acc_hz, chunk_size)
+        self._peaks = StreamingPeakDetector()
+
+        # Pending 4 Hz samples per channel; index 0 is frame self.frames
+        self._pending = {name: deque() for name in ('BVP', 'EDA', 'TEMP', 'ACC')}
+        self._recent_peaks = deque()  # peaks still needed for unreleased frames
+        self.frames = 0  # frames released so far
+        self._ring = np.zeros((window_size, len(FEATURES)), dtype=np.float32)
+
+    @classmethod
+    def from_model_dir(cls, models_dir: str, **kwargs) -> 'StreamingFeatureExtractor':
+        """Use the scaler saved by train_stress_model."""
+        means = np.load(os.path.join(models_dir, 'scaler_means.npy'))
+        stds = np.load(os.path.join(models_dir, 'scaler_stds.npy'))
+        return cls(means, stds, **kwargs)
+
+    def push(
+        self,
+        bvp: Optional[np.ndarray] = None,
+        eda: Optional[np.ndarray] = None,
+        temp: Optional[np.ndarray] = None,
+        acc: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Feed the next samples of any channels (ACC as magnitude or [n, 3]).
+        Returns the windows completed by this chunk, shape [n, window_size, 5].
+        """
+        if bvp is not None:
+            bvp_4hz = self._bvp_resampler.process(bvp)
+            self._pending['BVP'].extend(bvp_4hz.tolist())
+            for p in self._peaks.push(bvp_4hz):
+                self._recent_peaks.append(p)
+        if eda is not None:
+            self._pending['EDA'].extend(np.asarray(eda, dtype=np.float32).ravel().tolist())
+        if temp is not None:
+            self._pending['TEMP'].extend(np.asarray(temp, dtype=np.float32).ravel().tolist())
+        if acc is not None:
+            acc = np.asarray(acc, dtype=np.float32)
+            if acc.ndim == 2:
+                acc = np.linalg.norm(acc, axis=1)
+            self._pending['ACC'].extend(self._acc_resampler.process(acc).tolist())
+        return self._release()
+
+    def _ibi(self, frame: int) -> Optional[float]:
+        """IBI (ms) for a frame, or None while it still depends on a future peak."""
+        peaks = self._recent_peaks
+        # Drop peaks that no longer bound an unreleased frame, keeping one spare
+        # so the last interval stays known for forward-filling
+        while len(peaks) > 2 and peaks[1] <= frame:
+            peaks.popleft()
+        before = [p for p in peaks if p <= frame]
+        after = [p for p in peaks if p > frame]
+        if before and after:
+            return (after[0] - before[-1]) / 4.0 * 1000.0
+        if not before and len(after) >= 2:
+            return (after[1] - after[0]) / 4.0 * 1000.0  # back-fill before the first peak
+        if self._peaks.n < frame + self.ibi_delay:
+            return None
+        if len(before) >= 2:
+            return (before[-1] - before[-2]) / 4.0 * 1000.0  # forward-fill the last interval
+        return DEFAULT_IBI_MS
+
+    def _release(self) -> np.ndarray:
+        windows = []
+        while all(self._pending.values()):
+            ibi = self._ibi(self.frames)
+            if ibi is None:
+                break
+            row = [self._pending[name].popleft() for name in ('BVP', 'EDA', 'TEMP', 'ACC')] + [ibi]
+            self._ring[self.frames % self.window_size] = row
+            self.frames += 1
+            start = self.frames - self.window_size
+            if start >= 0 and start % self.step == 0:
+                order = np.arange(self.frames, self.frames + self.window_size) % self.window_size
+                windows.append((self._ring[order] - self.means) / self.stds)
+        if not windows:
+            return np.zeros((0, self.window_size, len(FEATURES)), dtype=np.float32)
+        return np.stack(windows).astype(np.float32)
@@ -0,0 +1,42 @@
+"""
+Per-subject feature windows for training.
+Kept free of TensorFlow so build_dataset's spawned workers only import
+NumPy/SciPy before extracting features.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+from stress_detection.data.wesad_loader import WESADLoader
+from stress_detection.data.feature_engineering import (
+    resample_to_4hz, compute_ibi, map_wesad_labels, create_windows,
+)
+
+
+def subject_features(data_dir: str, subj: str, resample_methods: Dict[str, str],
+                     window_size: int, step: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Load one subject and return its (X, y) windows."""
+    d = WESADLoader(data_dir).load_subject(subj)
+
+    bvp  = resample_to_4hz(d['BVP'], 64, resample_methods['BVP'])
+    eda  = d['EDA']
+    temp = d['TEMP']
+    acc  = resample_to_4hz(d['ACC'], 32, resample_methods['ACC'])
+    # EDA and TEMP are already at 4 Hz in WESAD wrist recordings
+    ibi  = compute_ibi(bvp)
+
+    labels = map_wesad_labels(d['labels'], eda, ibi)
+
+    n = min(len(bvp), len(eda), len(temp), len(acc), len(ibi), len(labels))
+    features = np.stack([bvp[:n], eda[:n], temp[:n], acc[:n], ibi[:n]], axis=1)
+    return create_windows(features, labels[:n], window_size, step)
+
+
+def subject_job(job):
+    """Process-pool entry point: (subj, X, y, error)."""
+    data_dir, subj, resample_methods, window_size, step = job
+    try:
+        X, y = subject_features(data_dir, subj, resample_methods, window_size, step)
+        return subj, np.ascontiguousarray(X), y, None
+    except Exception as e:
+        return subj, None, None, str(e)
@@ -1,34 +1,151 @@
 import os
+import json
 import pickle
+import argparse
+from collections.abc import Mapping
 from typing import Dict, List, Optional
 import numpy as np
 
+CHANNELS = ('BVP', 'EDA', 'TEMP', 'ACC', 'labels')
+COLUMNAR_DIR = 'wrist_npy'  # per-subject folder written by convert_subject()
+
+
+def _wrist_arrays(raw: Dict) -> Dict[str, np.ndarray]:
+    wrist = raw['signal']['wrist']
+    return {
+        'BVP':    wrist['BVP'].flatten().astype(np.float32),
+        'EDA':    wrist['EDA'].flatten().astype(np.float32),
+        'TEMP':   wrist['TEMP'].flatten().astype(np.float32),
+        'ACC':    np.linalg.norm(wrist['ACC'], axis=1).astype(np.float32),
+        'labels': raw['label'].flatten().astype(np.int32),
+    }
+
+
+class LazySubject(Mapping):
+    """
+    Subject record backed by per-channel .npy files.
+    Each channel is memory-mapped read-only on first access, so only the
+    pages a caller touches are read from disk.
+    """
+
+    def __init__(self, subject_id: str, directory: str):
+        self.subject_id = subject_id
+        self.directory = directory
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, key):
+        if key == 'subject':
+            return self.subject_id
+        if key not in CHANNELS:
+            raise KeyError(key)
+        if key not in self._arrays:
+            self._arrays[key] = np.load(os.path.join(self.directory, f"{key}.npy"), mmap_mode='r')
+        return self._arrays[key]
+
+    def __iter__(self):
+        return iter(('subject',) + CHANNELS)
+
+    def __len__(self):
+        return len(CHANNELS) + 1
+
 
 class WESADLoader:
-    """Loads wrist sensor signals from WESAD .pkl files."""
+    """
+    Loads wrist sensor signals from WESAD .pkl files.
+    Subjects converted with convert_subject()/convert_all() are read from
+    their columnar copy instead, without unpickling the chest signals.
+    """
 
     def __init__(self, data_dir: str):
         self.data_dir = data_dir
 
+    def pkl_path(self, subject_id: str) -> str:
+        return os.path.join(self.data_dir, subject_id, f"{subject_id}.pkl")
+
+    def columnar_path(self, subject_id: str) -> str:
+        return os.path.join(self.data_dir, subject_id, COLUMNAR_DIR)
+
+    def source_path(self, subject_id: str) -> str:
+        """File whose size/mtime identify the subject's data (the pickle if present)."""
+        pkl = self.pkl_path(subject_id)
+        if os.path.isfile(pkl):
+            return pkl
+        return os.path.join(self.columnar_path(subject_id), 'meta.json')
+
     def available_subjects(self) -> List[str]:
         subjects = []
         for name in sorted(os.listdir(self.data_dir)):
-            pkl = os.path.join(self.data_dir, name, f"{name}.pkl")
-            if os.path.isfile(pkl):
+            if os.path.isfile(self.pkl_path(name)) or self.is_converted(name):
                 subjects.append(name)
         return subjects
 
-    def load_subject(self, subject_id: str, pkl_path: Optional[str] = None) -> Dict:
+    def is_converted(self, subject_id: str) -> bool:
+        """True if a columnar copy exists and matches the pickle (when it is still there)."""
+        meta_path = os.path.join(self.columnar_path(subject_id), 'meta.json')
+        if not os.path.isfile(meta_path):
+            return False
+        pkl = self.pkl_path(subject_id)
+        if not os.path.isfile(pkl):
+            return True
+        with open(meta_path) as f:
+            meta = json.load(f)
+        st = os.stat(pkl)
+        return meta.get('size') == st.st_size and meta.get('mtime_ns') == st.st_mtime_ns
+
+    def load_subject(self, subject_id: str, pkl_path: Optional[str] = None) -> Mapping:
         if pkl_path is None:
-            pkl_path = os.path.join(self.data_dir, subject_id, f"{subject_id}.pkl")
+            if self.is_converted(subject_id):
+                return LazySubject(subject_id, self.columnar_path(subject_id))
+            pkl_path = self.pkl_path(subject_id)
         with open(pkl_path, 'rb') as f:
             raw = pickle.load(f, encoding='latin1')
-        wrist = raw['signal']['wrist']
-        return {
-            'subject': subject_id,
-            'BVP':    wrist['BVP'].flatten().astype(np.float32),
-            'EDA':    wrist['EDA'].flatten().astype(np.float32),
-            'TEMP':   wrist['TEMP'].flatten().astype(np.float32),
-            'ACC':    np.linalg.norm(wrist['ACC'], axis=1).astype(np.float32),
-            'labels': raw['label'].flatten().astype(np.int32),
-        }
+        return {'subject': subject_id, **_wrist_arrays(raw)}
+
+    def convert_subject(self, subject_id: str) -> str:
+        """
+        One-time conversion of a subject pickle to one .npy per wrist channel.
+        Arrays are stored exactly as load_subject returns them (ACC as its
+        magnitude, labels as int32); chest signals are dropped.
+        """
+        pkl = self.pkl_path(subject_id)
+        with open(pkl, 'rb') as f:
+            raw = pickle.load(f, encoding='latin1')
+        arrays = _wrist_arrays(raw)
+        del raw
+
+        out_dir = self.columnar_path(subject_id)
+        os.makedirs(out_dir, exist_ok=True)
+        for name, arr in arrays.items():
+            np.save(os.path.join(out_dir, f"{name}.npy"), arr)
+        st = os.stat(pkl)
+        # meta.json is written last: its presence marks a complete conversion
+        with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+            json.dump({
+                'subject': subject_id, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                'samples': {name: len(arr) for name, arr in arrays.items()},
+            }, f, indent=2)
+        return out_dir
+
+    def convert_all(self, force: bool = False) -> List[str]:
+        """Convert every subject that has no up-to-date columnar copy."""
+        converted = []
+        for subj in self.available_subjects():
+            if os.path.isfile(self.pkl_path(subj)) and (force or not self.is_converted(subj)):
+                self.convert_subject(subj)
+                converted.append(subj)
+        return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert WESAD pickles to per-channel .npy files")
+    parser.add_argument('data_dir', help="WESAD directory containing S*/S*.pkl")
+    parser.add_argument('--force', action='store_true', help="Reconvert up-to-date subjects too")
+    args = parser.parse_args()
+
+    loader = WESADLoader(args.data_dir)
+    for subj in loader.convert_all(args.force):
+        print(f"  {subj} -> {loader.columnar_path(subj)}")
+
+
+if __name__ == '__main__':
+    main()
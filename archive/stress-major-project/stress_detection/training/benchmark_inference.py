@@ -0,0 +1,199 @@
+"""
+Inference latency benchmark for the driver stress model.
+Usage: python -m stress_detection.training.benchmark_inference [--random-weights]
+Times Keras __call__ (eager and in tf.function), Keras predict and the TFLite
+interpreter at several thread counts over a range of batch sizes, after a
+warmup, and writes p50/p90/p99 latency and throughput to
+stress_detection/models/stress_latency.json for commit-to-commit comparison.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+DEFAULT_OUTPUT = os.path.join(MODELS_DIR, 'stress_latency.json')
+BATCH_SIZES = (1, 8, 64)
+TFLITE_THREADS = (1, 2, 4)
+PERCENTILES = (50, 90, 99)
+
+
+def pin_threads(threads: int) -> bool:
+    """
+    Fix TF and BLAS thread counts; False if TF had already started.
+    numpy is loaded by now, so BLAS is limited through threadpoolctl; the
+    environment variables only reach child processes.
+    """
+    from threadpoolctl import threadpool_limits  # installed with scikit-learn
+    threadpool_limits(limits=threads)
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        return True
+    except RuntimeError:
+        return False
+
+
+def time_calls(fn: Callable[[], object], warmup: int = 10, iterations: int = 100,
+               min_seconds: float = 0.0) -> np.ndarray:
+    """Per-call wall times in ns after `warmup` untimed calls."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < iterations or time.perf_counter() - start < min_seconds:
+        t0 = time.perf_counter_ns()
+        fn()
+        times.append(time.perf_counter_ns() - t0)
+    return np.array(times, dtype=np.int64)
+
+
+def summarize(times_ns: np.ndarray, batch_size: int) -> Dict:
+    """Latency percentiles (ms) and throughput (windows/s)."""
+    ms = times_ns / 1e6
+    summary = {f'p{q}_ms': round(float(np.percentile(ms, q)), 4) for q in PERCENTILES}
+    summary.update({
+        'mean_ms': round(float(ms.mean()), 4),
+        'max_ms': round(float(ms.max()), 4),
+        'calls': int(len(ms)),
+        'throughput_per_s': round(batch_size * 1e3 / float(np.median(ms)), 1),
+    })
+    return summary
+
+
+def tflite_runner(path: str, x: np.ndarray, threads: int) -> Callable[[], np.ndarray]:
+    """Interpreter resized to x's batch; the returned call runs one invoke()."""
+    import tensorflow as tf
+    interpreter = tf.lite.Interpreter(model_path=path, num_threads=threads)
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+    interpreter.resize_tensor_input(input_index, list(x.shape))
+    interpreter.allocate_tensors()
+
+    def run():
+        interpreter.set_tensor(input_index, x)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)
+    return run
+
+
+def run_suite(keras_model=None, tflite_path: Optional[str] = None,
+              batch_sizes: Sequence[int] = BATCH_SIZES,
+              tflite_threads: Sequence[int] = TFLITE_THREADS,
+              warmup: int = 10, iterations: int = 100, min_seconds: float = 0.0,
+              window_shape: Sequence[int] = (30, 5), seed: int = 0) -> List[Dict]:
+    """Benchmark each available backend at each batch size on random normalized windows."""
+    import tensorflow as tf
+    rng = np.random.default_rng(seed)
+    results = []
+
+    def add(name, batch_size, threads, fn):
+        row = {'name': name, 'batch_size': batch_size, 'threads': threads,
+               **summarize(time_calls(fn, warmup, iterations, min_seconds), batch_size)}
+        results.append(row)
+        print(f"  {name:<15} batch={batch_size:<3} threads={str(threads):<4} "
+              f"p50={row['p50_ms']:8.3f} ms  p99={row['p99_ms']:8.3f} ms  {row['throughput_per_s']:9.1f}/s")
+
+    for batch_size in batch_sizes:
+        x = rng.standard_normal((batch_size, *window_shape)).astype(np.float32)
+        if keras_model is not None:
+            tensor = tf.constant(x)
+            graph_call = tf.function(lambda t: keras_model(t, training=False))
+            add('keras_call', batch_size, None, lambda: keras_model(tensor, training=False))
+            add('keras_function', batch_size, None, lambda: graph_call(tensor))
+            add('keras_predict', batch_size, None,
+                lambda: keras_model.predict(x, batch_size=batch_size, verbose=0))
+        if tflite_path is not None:
+            for threads in tflite_threads:
+                add('tflite', batch_size, threads, tflite_runner(tflite_path, x, threads))
+    return results
+
+
+def find_result(results: List[Dict], name: str, batch_size: int = 1,
+                threads: Optional[int] = None) -> Optional[Dict]:
+    """First result row for a case, or None if it was not run."""
+    for row in results:
+        if row['name'] == name and row['batch_size'] == batch_size and (
+                threads is None or row['threads'] == threads):
+            return row
+    return None
+
+
+def write_report(path: str, results: List[Dict], config: Dict) -> Dict:
+    """Write results with the environment they were measured in."""
+    import tensorflow as tf
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    report = {
+        'environment': {
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'tensorflow': tf.__version__,
+            'cpu_count': os.cpu_count(),
+            'tf_intra_op_threads': tf.config.threading.get_intra_op_parallelism_threads(),
+        },
+        'config': config,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stress model inference latency")
+    parser.add_argument('--random-weights', action='store_true',
+                        help="Build and export an untrained model instead of using models/stress_model.tflite")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(BATCH_SIZES))
+    parser.add_argument('--tflite-threads', type=int, nargs='+', default=list(TFLITE_THREADS))
+    parser.add_argument('--tf-threads', type=int, default=1, help="TF intra-op threads (0 = TF default)")
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--min-seconds', type=float, default=0.0)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    if args.tf_threads:
+        pin_threads(args.tf_threads)
+    from stress_detection.training.stress_model import StressClassificationModel
+    from stress_detection.training.train_stress_model import export_tflite
+
+    print("=== Driver Stress Detection — Inference Latency ===\n")
+    config = {k: getattr(args, k) for k in
+              ('random_weights', 'batch_sizes', 'tflite_threads', 'tf_threads',
+               'warmup', 'iterations', 'min_seconds')}
+    with tempfile.TemporaryDirectory() as tmp:
+        keras_model = None
+        tflite_path = os.path.join(MODELS_DIR, 'stress_model.tflite')
+        if args.random_weights:
+            # Latency does not depend on the weight values, so no WESAD data is needed
+            keras_model = StressClassificationModel().build_model()
+            tflite_path = os.path.join(tmp, 'stress_model.tflite')
+            export_tflite(keras_model, tflite_path)
+        elif not os.path.isfile(tflite_path):
+            parser.error(f"{tflite_path} not found; train first or pass --random-weights")
+        results = run_suite(keras_model, tflite_path, args.batch_sizes, args.tflite_threads,
+                            args.warmup, args.iterations, args.min_seconds)
+    write_report(args.output, results, config)
+    print(f"\nSaved: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Subject-level cross-validation for the driver stress model.
+Usage: python -m stress_detection.training.cross_validate [--folds K] [--workers N]
+Trains one StressClassificationModel per fold (leave-one-subject-out by
+default) in parallel worker processes and writes per-class F1 with
+confidence intervals to stress_detection/models/stress_cv_metrics.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from scipy import stats
+from sklearn.model_selection import GroupKFold, LeaveOneGroupOut
+from sklearn.metrics import f1_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from stress_detection.data.wesad_loader import WESADLoader
+from stress_detection.data.feature_engineering import normalize_features
+from stress_detection.training.train_stress_model import (
+    DATA_DIR, MODELS_DIR, CACHE_DIR, EPOCHS, BATCH_SIZE, CLASS_NAMES,
+    CHANNEL_RESAMPLING, build_dataset,
+)
+
+CONFIDENCE = 0.95
+
+
+def fold_splits(groups: np.ndarray, n_folds: Optional[int] = None) -> List:
+    """(train_idx, test_idx) per fold: leave-one-subject-out, or GroupKFold(n_folds)."""
+    splitter = LeaveOneGroupOut() if n_folds is None else GroupKFold(n_splits=n_folds)
+    dummy = np.zeros(len(groups))
+    return list(splitter.split(dummy, groups=groups))
+
+
+def _configure_threads(threads: Optional[int]) -> None:
+    """Pin TF (and BLAS) threads for this process; must run before TF executes anything."""
+    if not threads:
+        return
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:
+        pass  # runtime already initialized in this process (serial run after TF use)
+
+
+def _fold_job(job) -> Dict:
+    """
+    Worker entry point: train and evaluate one fold.
+    X/y are memory-mapped from .npy files, so workers share the page cache
+    instead of each receiving a pickled copy of the dataset.
+    """
+    fold, x_path, y_path, train_idx, test_idx, epochs, batch_size, seed = job
+    import tensorflow as tf
+    from stress_detection.training.stress_model import StressClassificationModel
+
+    X = np.load(x_path, mmap_mode='r')
+    y = np.load(y_path, mmap_mode='r')
+    X_train_norm, means, stds = normalize_features(X[train_idx])
+    X_test_norm, _, _ = normalize_features(X[test_idx], means=means, stds=stds)
+    y_train, y_test = np.asarray(y[train_idx]), np.asarray(y[test_idx])
+
+    tf.keras.utils.set_random_seed(seed + fold)
+    sm = StressClassificationModel()
+    sm.compile()
+    # Same schedule as train_stress_model.main so fold scores are comparable
+    callbacks = [
+        tf.keras.callbacks.EarlyStopping(patience=10, restore_best_weights=True,
+                                         monitor='val_accuracy'),
+        tf.keras.callbacks.ReduceLROnPlateau(patience=5, factor=0.5, verbose=0),
+    ]
+    t0 = time.perf_counter()
+    history = sm.model.fit(
+        X_train_norm, tf.keras.utils.to_categorical(y_train, len(CLASS_NAMES)),
+        validation_split=0.15, epochs=epochs, batch_size=batch_size,
+        callbacks=callbacks, verbose=0,
+    )
+    y_pred = np.argmax(sm.model.predict(X_test_norm, verbose=0), axis=1)
+    return {
+        'fold': fold,
+        'test_idx': np.asarray(test_idx),
+        'y_pred': y_pred.astype(np.int32),
+        'epochs_run': len(history.history['loss']),
+        'train_seconds': time.perf_counter() - t0,
+    }
+
+
+def _mean_ci(values: np.ndarray, confidence: float = CONFIDENCE) -> Dict:
+    """Mean with a Student-t interval over folds; NaN folds (class absent) are skipped."""
+    values = values[~np.isnan(values)]
+    n = len(values)
+    if n == 0:
+        return {'mean': None, 'std': None, 'ci_low': None, 'ci_high': None, 'n_folds': 0}
+    mean = float(values.mean())
+    std = float(values.std(ddof=1)) if n > 1 else 0.0
+    half = float(stats.t.ppf((1 + confidence) / 2, n - 1) * std / np.sqrt(n)) if n > 1 else 0.0
+    return {'mean': mean, 'std': std, 'ci_low': mean - half, 'ci_high': mean + half, 'n_folds': n}
+
+
+def aggregate_folds(y: np.ndarray, groups: np.ndarray, folds: List[Dict],
+                    confidence: float = CONFIDENCE) -> Dict:
+    """
+    Per-class and macro F1 across folds.
+    Each fold's per-class F1 counts only when the class occurs in that
+    fold's test subjects; a class that is only predicted there (F1 of 0 by
+    construction) is left out. 'pooled' is the F1 of all out-of-fold
+    predictions together.
+    """
+    labels = list(range(len(CLASS_NAMES)))
+    per_fold = np.full((len(folds), len(labels)), np.nan)
+    macro = np.full(len(folds), np.nan)
+    y_oof = np.full(len(y), -1, dtype=np.int32)
+    fold_rows = []
+    for i, fold in enumerate(folds):
+        y_true = y[fold['test_idx']]
+        y_pred = fold['y_pred']
+        y_oof[fold['test_idx']] = y_pred
+        present = [c for c in labels if np.any(y_true == c)]
+        f1 = f1_score(y_true, y_pred, labels=labels, average=None, zero_division=0)
+        per_fold[i, present] = f1[present]
+        macro[i] = f1[present].mean()
+        fold_rows.append({
+            'fold': fold['fold'],
+            'test_subjects': sorted(int(g) for g in np.unique(groups[fold['test_idx']])),
+            'n_test': int(len(y_true)),
+            'accuracy': float(np.mean(y_true == y_pred)),
+            'f1_macro': float(macro[i]),
+            'epochs_run': fold['epochs_run'],
+            'train_seconds': round(fold['train_seconds'], 1),
+        })
+
+    covered = y_oof >= 0
+    pooled = f1_score(y[covered], y_oof[covered], labels=labels, average=None, zero_division=0)
+    return {
+        'confidence': confidence,
+        'f1_macro': _mean_ci(macro, confidence),
+        'per_class': {name: {**_mean_ci(per_fold[:, c], confidence), 'pooled': float(pooled[c])}
+                      for c, name in enumerate(CLASS_NAMES)},
+        'pooled_f1_macro': float(pooled.mean()),
+        'folds': fold_rows,
+    }
+
+
+def cross_validate(X: np.ndarray, y: np.ndarray, groups: np.ndarray,
+                   n_folds: Optional[int] = None, workers: Optional[int] = None,
+                   threads: Optional[int] = None, epochs: int = EPOCHS,
+                   batch_size: int = BATCH_SIZE, seed: int = 42) -> Dict:
+    """
+    Train every fold and return aggregate_folds() output.
+    Folds run in `workers` spawned processes (workers=1 runs them here), each
+    limited to `threads` TF threads; by default the CPUs are split evenly.
+    """
+    splits = fold_splits(groups, n_folds)
+    cpus = os.cpu_count() or 1
+    workers = workers or min(len(splits), cpus)
+    threads = threads or max(1, cpus // workers)
+    print(f"  {len(splits)} fold(s) on {workers} worker(s) x {threads} thread(s)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        x_path, y_path = os.path.join(tmp, 'X.npy'), os.path.join(tmp, 'y.npy')
+        np.save(x_path, np.ascontiguousarray(X, dtype=np.float32))
+        np.save(y_path, np.asarray(y, dtype=np.int32))
+        jobs = [(i, x_path, y_path, tr, te, epochs, batch_size, seed)
+                for i, (tr, te) in enumerate(splits)]
+        folds = []
+        if workers == 1:
+            _configure_threads(threads)
+            for job in jobs:
+                folds.append(_fold_job(job))
+                print(f"  fold {job[0]} done")
+        else:
+            # spawn, not fork: TF's runtime threads do not survive fork()
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                     initializer=_configure_threads, initargs=(threads,)) as pool:
+                for fold in pool.map(_fold_job, jobs):
+                    folds.append(fold)
+                    print(f"  fold {fold['fold']} done")
+    return aggregate_folds(np.asarray(y), np.asarray(groups), folds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Subject-level cross-validation of the stress model")
+    parser.add_argument('--folds', type=int, default=None,
+                        help="GroupKFold splits (default: leave-one-subject-out)")
+    parser.add_argument('--workers', type=int, default=None, help="Parallel fold processes")
+    parser.add_argument('--threads', type=int, default=None, help="TF threads per worker")
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and do not write the feature cache")
+    parser.add_argument('--resample', action='append', default=[], metavar='CHANNEL=METHOD',
+                        help="Resampling per channel, e.g. --resample BVP=poly (methods: fft, poly)")
+    parser.add_argument('--output', default=os.path.join(MODELS_DIR, 'stress_cv_metrics.json'))
+    args = parser.parse_args()
+    resample_methods = dict(item.split('=', 1) for item in args.resample)
+    unknown = set(resample_methods) - set(CHANNEL_RESAMPLING)
+    if unknown:
+        parser.error(f"--resample channels must be in {sorted(CHANNEL_RESAMPLING)}, got {sorted(unknown)}")
+
+    print("=== Driver Stress Detection — Cross-Validation ===\n")
+    loader = WESADLoader(DATA_DIR)
+    print("Building dataset...")
+    X, y, groups = build_dataset(loader, None if args.no_cache else CACHE_DIR,
+                                 resample_methods=resample_methods)
+    print(f"\nTotal: {len(X)} windows from {len(np.unique(groups))} subjects\n")
+
+    results = cross_validate(X, y, groups, args.folds, args.workers, args.threads, args.epochs)
+
+    pct = int(results['confidence'] * 100)
+    f1 = results['f1_macro']
+    print(f"\nMacro F1: {f1['mean']:.3f}  ({pct}% CI {f1['ci_low']:.3f}-{f1['ci_high']:.3f})")
+    for name, c in results['per_class'].items():
+        if c['mean'] is None:
+            print(f"  {name:<9} not present in any fold")
+            continue
+        print(f"  {name:<9} F1 {c['mean']:.3f}  ({pct}% CI {c['ci_low']:.3f}-{c['ci_high']:.3f}, "
+              f"{c['n_folds']} folds)  pooled {c['pooled']:.3f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,11 +6,15 @@ from tensorflow.keras import layers, Model
 from typing import Optional
 
 
-class TemporalSumLayer(layers.Layer):
-    """TFLite-compatible sum across timestep axis (replaces Lambda)."""
+class AttentionPooling(layers.Layer):
+    """
+    Attention-weighted sum over timesteps: [seq [B, T, F], weights [B, T]] -> [B, F].
+    A single batched matmul (TFLite BATCH_MATMUL); no [B, T, F] repeated weights.
+    """
 
     def call(self, inputs):
-        return tf.reduce_sum(inputs, axis=1)
+        sequence, weights = inputs
+        return tf.squeeze(tf.matmul(tf.expand_dims(weights, 1), sequence), axis=1)
 
     def get_config(self):
         return super().get_config()
@@ -54,10 +58,7 @@ class StressClassificationModel:
         attn = layers.Dense(1, activation='tanh')(x)
         attn = layers.Flatten()(attn)
         attn = layers.Activation('softmax')(attn)
-        attn = layers.RepeatVector(self.lstm_units * 2)(attn)
-        attn = layers.Permute([2, 1])(attn)
-        x = layers.Multiply()([x, attn])
-        x = TemporalSumLayer()(x)
+        x = AttentionPooling()([x, attn])
 
         x = layers.Dense(64, activation='relu')(x)
         x = layers.Dropout(self.dropout_rate)(x)
@@ -6,7 +6,12 @@ Outputs: stress_detection/models/stress_model.tflite + stress_metrics.json
 import os
 import sys
 import json
-import time
+import hashlib
+import tempfile
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
 import numpy as np
 import tensorflow as tf
 from sklearn.model_selection import GroupShuffleSplit
@@ -15,45 +20,92 @@ from sklearn.metrics import classification_report, confusion_matrix
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from stress_detection.data.wesad_loader import WESADLoader
-from stress_detection.data.feature_engineering import (
-    resample_to_4hz, compute_ibi, map_wesad_labels,
-    create_windows, normalize_features,
-)
+from stress_detection.data.feature_engineering import normalize_features
+from stress_detection.data.subject_windows import subject_job
 from stress_detection.training.stress_model import StressClassificationModel
+from stress_detection.training import benchmark_inference
 
 DATA_DIR   = os.path.join(os.path.dirname(__file__), '..', 'data', 'WESAD')
 MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+CACHE_DIR  = os.path.join(os.path.dirname(__file__), '..', 'data', 'feature_cache')
 WINDOW_SIZE = 30
 STEP        = 15
 EPOCHS      = 60
 BATCH_SIZE  = 32
 CLASS_NAMES = ['Calm', 'Mild', 'Moderate', 'Critical']
+FEATURE_VERSION = 1  # bump when feature_engineering output changes
+# Resampling per channel: 'fft' (scipy.signal.resample) or 'poly' (resample_poly)
+CHANNEL_RESAMPLING = {'BVP': 'fft', 'ACC': 'fft'}
 
 
-def build_dataset(loader: WESADLoader):
-    """Return (X, y, groups) where groups is a per-window subject index."""
-    X_all, y_all, g_all = [], [], []
-    for subj_idx, subj in enumerate(loader.available_subjects()):
-        print(f"  Loading {subj}...", end=' ')
-        try:
-            d = loader.load_subject(subj)
-        except Exception as e:
-            print(f"SKIP ({e})")
-            continue
+def feature_cache_path(cache_dir: str, source_path: str, subj: str,
+                       resample_methods: Optional[Dict[str, str]] = None) -> str:
+    """
+    Cache file for one subject's windows.
+    Keyed by the source file's size and mtime (the pickle, or the columnar
+    copy's meta.json once the pickle is gone) plus the feature parameters, so a
+    changed recording or new WINDOW_SIZE/STEP/FEATURE_VERSION/resampling misses.
+    """
+    st = os.stat(source_path)
+    key = json.dumps({
+        'source': os.path.abspath(source_path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+        'window': WINDOW_SIZE, 'step': STEP, 'version': FEATURE_VERSION,
+        'resample': {**CHANNEL_RESAMPLING, **(resample_methods or {})},
+    }, sort_keys=True)
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{subj}_{digest}.npz")
 
-        bvp  = resample_to_4hz(d['BVP'], 64)
-        eda  = d['EDA']
-        temp = d['TEMP']
-        acc  = resample_to_4hz(d['ACC'], 32)
-        # EDA and TEMP are already at 4 Hz in WESAD wrist recordings
-        ibi  = compute_ibi(bvp)
 
-        labels = map_wesad_labels(d['labels'], eda, ibi)
+def build_dataset(loader: WESADLoader, cache_dir: Optional[str] = CACHE_DIR,
+                  workers: Optional[int] = None,
+                  resample_methods: Optional[Dict[str, str]] = None):
+    """
+    Return (X, y, groups) where groups is a per-window subject index.
+    Subjects with cached windows skip the pickle load entirely; the rest are
+    processed in a process pool (workers=1 runs them in this process) and
+    written to the cache. cache_dir=None disables caching.
+    resample_methods overrides CHANNEL_RESAMPLING per channel, e.g. {'BVP': 'poly'}.
+    """
+    subjects = loader.available_subjects()
+    results, cache_paths, misses = {}, {}, []
+    for subj in subjects:
+        if cache_dir is not None:
+            cache_paths[subj] = feature_cache_path(
+                cache_dir, loader.source_path(subj), subj, resample_methods
+            )
+            if os.path.isfile(cache_paths[subj]):
+                with np.load(cache_paths[subj]) as cached:
+                    results[subj] = (cached['X'], cached['y'], None)
+                continue
+        misses.append(subj)
 
-        n = min(len(bvp), len(eda), len(temp), len(acc), len(ibi), len(labels))
-        features = np.stack([bvp[:n], eda[:n], temp[:n], acc[:n], ibi[:n]], axis=1)
+    if misses:
+        methods = {**CHANNEL_RESAMPLING, **(resample_methods or {})}
+        jobs = [(loader.data_dir, subj, methods, WINDOW_SIZE, STEP) for subj in misses]
+        workers = workers or min(len(jobs), os.cpu_count() or 1)
+        print(f"  Processing {len(misses)} subject(s) with {workers} worker(s)...")
+        if workers == 1:
+            done = [subject_job(job) for job in jobs]
+        else:
+            # spawn, not fork: TF's runtime threads do not survive fork(). The job
+            # lives in a TF-free module, so workers do not import TensorFlow
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                done = list(pool.map(subject_job, jobs))
+        for subj, X, y, error in done:
+            results[subj] = (X, y, error)
+            if error is None and cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                np.savez(cache_paths[subj], X=X, y=y)
 
-        X, y = create_windows(features, labels[:n], WINDOW_SIZE, STEP)
+    X_all, y_all, g_all = [], [], []
+    for subj_idx, subj in enumerate(subjects):
+        X, y, error = results[subj]
+        cached = "(cached) " if subj not in misses else ""
+        print(f"  {subj} {cached}", end='')
+        if error is not None:
+            print(f"SKIP ({error})")
+            continue
         if len(X) == 0:
             print("no windows")
             continue
@@ -69,13 +121,46 @@ def build_dataset(loader: WESADLoader):
     return np.concatenate(X_all), np.concatenate(y_all), np.concatenate(g_all)
 
 
+def export_tflite(model, path: str) -> int:
+    """Convert a Keras stress model to a dynamic-range TFLite file; returns its size in bytes."""
+    # Via SavedModel: from_concrete_functions aborts in the MLIR converter on the BiLSTM in TF 2.16
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        model.export(saved_model_dir)
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        # BiLSTM TensorListReserve ops require SELECT_TF_OPS in TF 2.16
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS,
+            tf.lite.OpsSet.SELECT_TF_OPS,
+        ]
+        converter._experimental_lower_tensor_list_ops = False
+        tflite_bytes = converter.convert()
+    with open(path, 'wb') as f:
+        f.write(tflite_bytes)
+    return len(tflite_bytes)
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Train the driver stress model on WESAD")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Processes for uncached subjects (default: one per CPU)")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and do not write the feature cache")
+    parser.add_argument('--resample', action='append', default=[], metavar='CHANNEL=METHOD',
+                        help="Resampling per channel, e.g. --resample BVP=poly (methods: fft, poly)")
+    args = parser.parse_args()
+    resample_methods = dict(item.split('=', 1) for item in args.resample)
+    unknown = set(resample_methods) - set(CHANNEL_RESAMPLING)
+    if unknown:
+        parser.error(f"--resample channels must be in {sorted(CHANNEL_RESAMPLING)}, got {sorted(unknown)}")
+
     os.makedirs(MODELS_DIR, exist_ok=True)
     print("=== Driver Stress Detection — Training ===\n")
 
     loader = WESADLoader(DATA_DIR)
     print("Building dataset...")
-    X, y, groups = build_dataset(loader)
+    X, y, groups = build_dataset(
+        loader, None if args.no_cache else CACHE_DIR, args.workers, resample_methods
+    )
     print(f"\nTotal: {len(X)} windows | class distribution: {np.bincount(y, minlength=4)}\n")
 
     # Subject-aware split: hold out ~20% of subjects so no subject leaks
@@ -122,12 +207,24 @@ def main():
     ))
     cm = confusion_matrix(y_test, y_pred, labels=labels).tolist()
 
-    # Inference latency (100 samples average)
-    sample = X_test_norm[:1]
-    t0 = time.perf_counter()
-    for _ in range(100):
-        sm.model.predict(sample, verbose=0)
-    keras_latency_ms = (time.perf_counter() - t0) / 100 * 1000
+    tflite_path = os.path.join(MODELS_DIR, 'stress_model.tflite')
+    size_kb = export_tflite(sm.model, tflite_path) / 1024
+    print(f"\nTFLite saved: {tflite_path} ({size_kb:.1f} KB)")
+
+    # Warm, percentile latency of Keras and TFLite (replaces a 100x predict() average,
+    # which mostly measured predict's per-call setup)
+    print("\nBenchmarking inference latency...")
+    latency_config = {'batch_sizes': [1, 32], 'tflite_threads': [1, 2, 4], 'warmup': 10, 'iterations': 100}
+    latency = benchmark_inference.run_suite(sm.model, tflite_path, **latency_config)
+    # Training has already started TF, so threads cannot be pinned here (tf_threads=0 is the
+    # TF default, as in the CLI); run benchmark_inference for pinned numbers
+    benchmark_inference.write_report(benchmark_inference.DEFAULT_OUTPUT, latency,
+                                     dict(latency_config, tf_threads=0))
+    # keras_latency_ms keeps its meaning (mean of predict() on one window, now warmed up);
+    # the graph-mode call a serving signature runs is reported separately
+    keras_latency_ms = benchmark_inference.find_result(latency, 'keras_predict')['mean_ms']
+    keras_graph_p50_ms = benchmark_inference.find_result(latency, 'keras_function')['p50_ms']
+    tflite_latency_ms = benchmark_inference.find_result(latency, 'tflite', threads=1)['p50_ms']
 
     metrics = {
         'accuracy':        report_dict['accuracy'],
@@ -135,33 +232,17 @@ def main():
         'per_class':       {k: v for k, v in report_dict.items() if k in CLASS_NAMES},
         'confusion_matrix': cm,
         'keras_latency_ms': round(keras_latency_ms, 2),
+        'keras_graph_p50_ms': round(keras_graph_p50_ms, 2),
+        'tflite_latency_ms': round(tflite_latency_ms, 2),
+        'tflite_size_kb':  round(size_kb, 1),
         'train_history':   {k: [float(v) for v in vs]
                             for k, vs in history.history.items()},
     }
     with open(os.path.join(MODELS_DIR, 'stress_metrics.json'), 'w') as f:
         json.dump(metrics, f, indent=2)
-
-    @tf.function(input_signature=[
-        tf.TensorSpec(shape=[None, WINDOW_SIZE, 5], dtype=tf.float32)
-    ])
-    def serving_fn(x):
-        return sm.model(x, training=False)
-
-    converter = tf.lite.TFLiteConverter.from_concrete_functions(
-        [serving_fn.get_concrete_function()], sm.model
-    )
-    converter.optimizations = [tf.lite.Optimize.DEFAULT]
-    converter.target_spec.supported_ops = [
-        tf.lite.OpsSet.TFLITE_BUILTINS,
-        tf.lite.OpsSet.SELECT_TF_OPS,
-    ]
-    tflite_bytes = converter.convert()
-    tflite_path = os.path.join(MODELS_DIR, 'stress_model.tflite')
-    with open(tflite_path, 'wb') as f:
-        f.write(tflite_bytes)
-    size_kb = len(tflite_bytes) / 1024
-    print(f"\nTFLite saved: {tflite_path} ({size_kb:.1f} KB)")
-    print(f"Inference latency (Keras): {keras_latency_ms:.1f} ms")
+    print(f"Inference latency (Keras predict, mean): {keras_latency_ms:.1f} ms | "
+          f"p50 (Keras graph): {keras_graph_p50_ms:.2f} ms | "
+          f"(TFLite, 1 thread): {tflite_latency_ms:.2f} ms")
 
     # Quality gates (macro F1 relaxed to 0.70 — Critical class is rare with <15 subjects)
     assert report_dict['accuracy'] > 0.80, \
@@ -0,0 +1,36 @@
+import pickle
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def make_wesad_pkl():
+    """
+    Builder for WESAD-shaped .pkl files: make(data_dir, subject, minutes, label)
+    writes data_dir/<subject>/<subject>.pkl and returns its path. label=None
+    draws random WESAD labels (0-4); an int fills the whole recording.
+    """
+    def make(data_dir, subject='S2', minutes=1, label=None):
+        rng = np.random.default_rng(len(subject))
+        n_label = 700 * 60 * minutes
+        labels = (rng.integers(0, 5, n_label) if label is None
+                  else np.full(n_label, label)).astype(np.int32)
+        data = {
+            'signal': {
+                'wrist': {
+                    'BVP':  rng.standard_normal((64 * 60 * minutes, 1)).astype(np.float32),
+                    'EDA':  rng.random((4 * 60 * minutes, 1)).astype(np.float32),
+                    'TEMP': rng.random((4 * 60 * minutes, 1)).astype(np.float32),
+                    'ACC':  rng.standard_normal((32 * 60 * minutes, 3)).astype(np.float32),
+                }
+            },
+            'label': labels,
+            'subject': subject,
+        }
+        subdir = data_dir / subject
+        subdir.mkdir()
+        pkl_path = subdir / f"{subject}.pkl"
+        with open(pkl_path, 'wb') as f:
+            pickle.dump(data, f)
+        return str(pkl_path)
+    return make
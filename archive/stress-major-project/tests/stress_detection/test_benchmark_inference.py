@@ -0,0 +1,57 @@
+import json
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.slow  # imports TensorFlow
+
+from stress_detection.training.benchmark_inference import (
+    find_result,
+    pin_threads,
+    run_suite,
+    summarize,
+    write_report,
+)
+from stress_detection.training.stress_model import StressClassificationModel
+from stress_detection.training.train_stress_model import export_tflite
+
+
+def test_summarize_percentiles_and_throughput():
+    times_ns = np.arange(1, 101, dtype=np.int64) * 1_000_000  # 1..100 ms
+    s = summarize(times_ns, batch_size=10)
+    assert s['p50_ms'] == pytest.approx(50.5)
+    assert s['p99_ms'] == pytest.approx(99.01)
+    assert s['max_ms'] == 100.0
+    assert s['calls'] == 100
+    assert s['throughput_per_s'] == pytest.approx(10 * 1000 / 50.5, rel=1e-3)
+
+
+def test_pin_threads_limits_loaded_blas(monkeypatch):
+    from threadpoolctl import threadpool_info, threadpool_limits
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        monkeypatch.delenv(var, raising=False)
+    original = {p['internal_api']: p['num_threads'] for p in threadpool_info()}
+    try:
+        pin_threads(2)
+        assert {p['num_threads'] for p in threadpool_info() if p['user_api'] == 'blas'} <= {2}
+    finally:
+        threadpool_limits(limits=original)
+
+
+def test_suite_covers_keras_and_tflite(tmp_path):
+    model = StressClassificationModel().build_model()
+    tflite_path = str(tmp_path / 'stress_model.tflite')
+    assert export_tflite(model, tflite_path) > 0
+
+    results = run_suite(model, tflite_path, batch_sizes=[1, 4], tflite_threads=[1, 2],
+                        warmup=1, iterations=3)
+    names = {(r['name'], r['batch_size'], r['threads']) for r in results}
+    assert ('keras_call', 4, None) in names
+    assert ('keras_predict', 1, None) in names
+    assert ('tflite', 4, 2) in names
+    assert find_result(results, 'tflite', batch_size=1, threads=1)['calls'] == 3
+
+    out = tmp_path / 'latency.json'
+    write_report(str(out), results, {'iterations': 3})
+    report = json.loads(out.read_text())
+    assert report['results'] == results
+    assert 'tensorflow' in report['environment']
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.slow  # imports TensorFlow
+
+from stress_detection.training.cross_validate import (
+    aggregate_folds,
+    cross_validate,
+    fold_splits,
+)
+
+
+class TestFoldSplits:
+    def test_loso_holds_out_each_subject_once(self):
+        groups = np.repeat([0, 1, 2, 3], 5)
+        splits = fold_splits(groups)
+        assert len(splits) == 4
+        for train_idx, test_idx in splits:
+            assert len(np.unique(groups[test_idx])) == 1
+            assert not set(groups[train_idx]) & set(groups[test_idx])
+        held_out = np.concatenate([test for _, test in splits])
+        np.testing.assert_array_equal(np.sort(held_out), np.arange(len(groups)))
+
+    def test_group_kfold(self):
+        groups = np.repeat(np.arange(6), 4)
+        splits = fold_splits(groups, n_folds=3)
+        assert len(splits) == 3
+        for train_idx, test_idx in splits:
+            assert not set(groups[train_idx]) & set(groups[test_idx])
+
+
+class TestAggregateFolds:
+    def test_absent_class_skipped_and_ci_contains_mean(self):
+        y = np.array([0, 0, 1, 1, 0, 0, 2, 2])
+        groups = np.repeat([0, 1], 4)
+        folds = [
+            {'fold': 0, 'test_idx': np.arange(4), 'y_pred': np.array([0, 0, 1, 0]),
+             'epochs_run': 1, 'train_seconds': 0.0},
+            {'fold': 1, 'test_idx': np.arange(4, 8), 'y_pred': np.array([0, 0, 2, 2]),
+             'epochs_run': 1, 'train_seconds': 0.0},
+        ]
+        result = aggregate_folds(y, groups, folds)
+        calm = result['per_class']['Calm']
+        assert calm['n_folds'] == 2
+        assert calm['ci_low'] <= calm['mean'] <= calm['ci_high']
+        assert result['per_class']['Mild']['n_folds'] == 1
+        assert result['per_class']['Moderate']['mean'] == pytest.approx(1.0)
+        assert result['per_class']['Critical']['mean'] is None
+        assert [f['test_subjects'] for f in result['folds']] == [[0], [1]]
+
+    def test_class_only_predicted_is_not_counted(self):
+        y = np.array([0, 0, 1, 1, 0, 0, 1, 1])
+        groups = np.repeat([0, 1], 4)
+        folds = [
+            {'fold': 0, 'test_idx': np.arange(4), 'y_pred': np.array([0, 0, 1, 1]),
+             'epochs_run': 1, 'train_seconds': 0.0},
+            {'fold': 1, 'test_idx': np.arange(4, 8), 'y_pred': np.array([0, 3, 1, 1]),
+             'epochs_run': 1, 'train_seconds': 0.0},
+        ]
+        result = aggregate_folds(y, groups, folds)
+        assert result['per_class']['Critical']['n_folds'] == 0
+        assert result['per_class']['Calm']['n_folds'] == 2
+
+
+def test_cross_validate_serial_smoke():
+    rng = np.random.default_rng(0)
+    groups = np.repeat([0, 1, 2], 20)
+    y = rng.integers(0, 4, len(groups)).astype(np.int32)
+    X = rng.standard_normal((len(groups), 30, 5)).astype(np.float32)
+    result = cross_validate(X, y, groups, workers=1, threads=1, epochs=1, batch_size=16)
+    assert len(result['folds']) == 3
+    assert set(result['per_class']) == {'Calm', 'Mild', 'Moderate', 'Critical'}
+    assert 0.0 <= result['pooled_f1_macro'] <= 1.0
@@ -1,12 +1,19 @@
 import numpy as np
 import pytest
+from scipy import signal as scipy_signal
 from stress_detection.data.feature_engineering import (
+    PolyphaseResampler,
     resample_to_4hz,
     compute_ibi,
     map_wesad_labels,
     create_windows,
     normalize_features,
 )
+from stress_detection.data.benchmark_features import (
+    compute_ibi_loop,
+    map_wesad_labels_loop,
+    create_windows_loop,
+)
 
 
 class TestResample:
@@ -25,6 +32,28 @@ class TestResample:
         out = resample_to_4hz(sig, source_hz=32)
         assert out.shape == (40,)
 
+    @pytest.mark.parametrize('source_hz', [64, 32])
+    def test_poly_same_length_as_fft(self, source_hz):
+        sig = np.random.randn(source_hz * 60 + 5).astype(np.float32)
+        fft = resample_to_4hz(sig, source_hz)
+        for chunk_size in (None, 1000):
+            out = resample_to_4hz(sig, source_hz, method='poly', chunk_size=chunk_size)
+            assert out.shape == fft.shape and out.dtype == np.float32
+
+    @pytest.mark.parametrize('source_hz,chunk_size', [(64, 1000), (32, 64), (700, 175 * 40)])
+    def test_chunked_poly_matches_single_pass(self, source_hz, chunk_size):
+        sig = np.random.default_rng(source_hz).standard_normal(source_hz * 120 + 3)
+        expected = scipy_signal.resample_poly(sig, 4, source_hz)
+        resampler = PolyphaseResampler(4, source_hz, chunk_size)
+        # Uneven feed sizes, as from a live stream
+        parts = [resampler.process(sig[i:i + 333]) for i in range(0, len(sig), 333)]
+        out = np.concatenate(parts + [resampler.flush()])
+        np.testing.assert_allclose(out, expected, atol=1e-9)
+
+    def test_unknown_method_rejected(self):
+        with pytest.raises(ValueError):
+            resample_to_4hz(np.zeros(64, dtype=np.float32), 64, method='linear')
+
 
 class TestComputeIBI:
     def test_output_same_length_as_input(self):
@@ -37,6 +66,20 @@ class TestComputeIBI:
         ibi = compute_ibi(bvp)
         assert np.all(ibi > 0)
 
+    @pytest.mark.parametrize('seed', range(5))
+    def test_matches_loop_implementation(self, seed):
+        bvp = np.random.default_rng(seed).standard_normal(2000).astype(np.float32)
+        np.testing.assert_array_equal(compute_ibi(bvp), compute_ibi_loop(bvp))
+
+    @pytest.mark.parametrize('bvp', [
+        np.zeros(20, dtype=np.float32),                                   # no peaks
+        np.array([0, 0, 1, 0, 0, 0], dtype=np.float32),                   # one peak
+        np.array([0, 1, 0, 0, 0, 1, 0], dtype=np.float32),                # two peaks
+        np.array([], dtype=np.float32),
+    ])
+    def test_matches_loop_on_edge_cases(self, bvp):
+        np.testing.assert_array_equal(compute_ibi(bvp), compute_ibi_loop(bvp))
+
 
 class TestMapWesadLabels:
     def test_baseline_maps_to_calm(self):
@@ -81,6 +124,26 @@ class TestMapWesadLabels:
         assert np.sum(valid == 2) == 25, "Expected 25 moderate samples"
         assert np.sum(valid == 3) == 7, "Expected 7 critical samples"
 
+    def test_ties_break_toward_lower_label(self):
+        # 87 baseline + 87 stress + 1 undefined: baseline/stress tie → baseline wins
+        slot = np.array([2] * 87 + [1] * 87 + [0], dtype=np.int32)
+        labels = np.concatenate([slot, slot[::-1]])
+        eda = np.ones(2, dtype=np.float32)
+        ibi = np.full(2, 800.0, dtype=np.float32)
+        np.testing.assert_array_equal(map_wesad_labels(labels, eda, ibi), [0, 0])
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_matches_loop_implementation(self, seed):
+        rng = np.random.default_rng(seed)
+        # Short label runs so slots mix classes, plus out-of-range values that get clipped
+        labels = np.repeat(rng.integers(-1, 6, 400), rng.integers(20, 200, 400)).astype(np.int32)
+        n_4hz = len(labels) // 175
+        eda = rng.random(n_4hz).astype(np.float32)
+        ibi = rng.uniform(400, 1000, n_4hz).astype(np.float32)
+        np.testing.assert_array_equal(
+            map_wesad_labels(labels, eda, ibi), map_wesad_labels_loop(labels, eda, ibi)
+        )
+
 
 class TestCreateWindows:
     def test_output_shape(self):
@@ -102,6 +165,29 @@ class TestCreateWindows:
         )
         assert len(X_clean) < len(X_all)
 
+    @pytest.mark.parametrize('window_size,step', [(30, 15), (30, 30), (10, 7), (5, 1)])
+    def test_matches_loop_implementation(self, window_size, step):
+        rng = np.random.default_rng(window_size * 100 + step)
+        features = rng.standard_normal((500, 5)).astype(np.float32)
+        labels = np.repeat(rng.integers(-1, 4, 50), 10).astype(np.int32)
+        X, y = create_windows(features, labels, window_size, step)
+        X_ref, y_ref = create_windows_loop(features, labels, window_size, step)
+        np.testing.assert_array_equal(X, X_ref)
+        np.testing.assert_array_equal(y, y_ref)
+
+    def test_short_or_fully_undefined_input_is_empty(self):
+        features = np.random.randn(20, 5).astype(np.float32)
+        X, y = create_windows(features, np.zeros(20, dtype=np.int32), window_size=30)
+        assert len(X) == 0 and len(y) == 0
+        X, y = create_windows(features, np.full(20, -1, dtype=np.int32), window_size=10, step=5)
+        assert len(X) == 0 and len(y) == 0
+
+    def test_windows_are_views_when_none_discarded(self):
+        features = np.random.randn(200, 5).astype(np.float32)
+        X, _ = create_windows(features, np.zeros(200, dtype=np.int32), window_size=30, step=15)
+        assert np.shares_memory(X, features)
+        np.testing.assert_array_equal(X[1], features[15:45])
+
 
 class TestNormalizeFeatures:
     def test_output_shape_preserved(self):
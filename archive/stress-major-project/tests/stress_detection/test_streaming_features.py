@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from scipy import signal as scipy_signal
+from stress_detection.data.feature_engineering import (
+    resample_to_4hz,
+    compute_ibi,
+    create_windows,
+    normalize_features,
+)
+from stress_detection.data.streaming_features import (
+    StreamingFeatureExtractor,
+    StreamingPeakDetector,
+)
+
+
+def recording(seconds, seed=0):
+    """Wrist-shaped signals with a ~70 bpm pulse in BVP."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(64 * seconds) / 64.0
+    bvp = (np.sin(2 * np.pi * 1.15 * t) + 0.3 * rng.standard_normal(len(t))).astype(np.float32)
+    eda = rng.random(4 * seconds).astype(np.float32)
+    temp = (32 + rng.random(4 * seconds)).astype(np.float32)
+    acc = rng.standard_normal((32 * seconds, 3)).astype(np.float32)
+    return bvp, eda, temp, acc
+
+
+def stream(extractor, bvp, eda, temp, acc, chunk_seconds):
+    windows = []
+    for i in range(0, len(eda), 4 * chunk_seconds):
+        j = i + 4 * chunk_seconds
+        windows.append(extractor.push(bvp=bvp[16 * i:16 * j], eda=eda[i:j],
+                                      temp=temp[i:j], acc=acc[8 * i:8 * j]))
+    return np.concatenate(windows)
+
+
+class TestStreamingPeakDetector:
+    @pytest.mark.parametrize('chunk', [1, 7, 1000])
+    def test_matches_find_peaks(self, chunk):
+        x = np.round(np.random.default_rng(1).standard_normal(2000), 1)  # rounding creates flat tops
+        detector = StreamingPeakDetector()
+        peaks = []
+        for i in range(0, len(x), chunk):
+            peaks += detector.push(x[i:i + chunk])
+        expected, _ = scipy_signal.find_peaks(x, distance=2)
+        np.testing.assert_array_equal(peaks, expected)
+
+
+class TestStreamingFeatureExtractor:
+    @pytest.mark.parametrize('chunk_seconds', [1, 13])
+    def test_matches_batch_windows(self, chunk_seconds):
+        bvp, eda, temp, acc = recording(300)
+        means, stds = np.zeros(5, np.float32), np.ones(5, np.float32)
+        extractor = StreamingFeatureExtractor(means, stds, chunk_size=256)
+        got = stream(extractor, bvp, eda, temp, acc, chunk_seconds)
+
+        bvp4 = resample_to_4hz(bvp, 64, method='poly')
+        acc4 = resample_to_4hz(np.linalg.norm(acc, axis=1), 32, method='poly')
+        features = np.stack([bvp4, eda, temp, acc4, compute_ibi(bvp4)], axis=1)
+        X, _ = create_windows(features, np.zeros(len(features), np.int32))
+        X, _, _ = normalize_features(X, means, stds)
+
+        assert got.shape[1:] == (30, 5)
+        # The resampler holds back its filter overlap, so the stream trails the batch
+        assert len(X) - 4 <= len(got) <= len(X)
+        np.testing.assert_allclose(got, X[:len(got)], rtol=1e-5, atol=1e-4)
+
+    def test_normalizes_and_emits_every_step(self):
+        bvp, eda, temp, acc = recording(120)
+        means = np.arange(5, dtype=np.float32)
+        stds = np.full(5, 2.0, dtype=np.float32)
+        raw = StreamingFeatureExtractor(np.zeros(5), np.ones(5), step=10)
+        norm = StreamingFeatureExtractor(means, stds, step=10)
+        a = stream(raw, bvp, eda, temp, acc, 5)
+        b = stream(norm, bvp, eda, temp, acc, 5)
+        np.testing.assert_allclose(b, (a - means) / stds, rtol=1e-6, atol=1e-6)
+        assert len(a) == (raw.frames - 30) // 10 + 1
+
+    def test_memory_bounded(self):
+        extractor = StreamingFeatureExtractor(np.zeros(5), np.ones(5), chunk_size=256)
+        bvp, eda, temp, acc = recording(60)
+        sizes = []
+        for _ in range(20):  # 20 minutes of one-second chunks
+            stream(extractor, bvp, eda, temp, acc, 1)
+            sizes.append((len(extractor._recent_peaks),
+                          max(len(q) for q in extractor._pending.values()),
+                          len(extractor._bvp_resampler._buffer)))
+        # State after 20 minutes is no larger than after the first few
+        early = np.max(sizes[:3], axis=0)
+        assert np.all(np.max(sizes[3:], axis=0) <= early)
+
+    def test_ibi_falls_back_without_peaks(self):
+        extractor = StreamingFeatureExtractor(np.zeros(5), np.ones(5))
+        n = 60
+        windows = extractor.push(bvp=np.zeros(64 * n), eda=np.zeros(4 * n),
+                                 temp=np.zeros(4 * n), acc=np.zeros(32 * n))
+        assert len(windows) > 0
+        np.testing.assert_array_equal(windows[..., 4], 800.0)
@@ -1,7 +1,7 @@
 import numpy as np
 import pytest
 import tensorflow as tf
-from stress_detection.training.stress_model import StressClassificationModel
+from stress_detection.training.stress_model import AttentionPooling, StressClassificationModel
 
 pytestmark = pytest.mark.slow
 
@@ -48,3 +48,19 @@ class TestStressClassificationModel:
         size_kb = len(tflite_bytes) / 1024
         # SELECT_TF_OPS flex delegate adds ~25 KB overhead; effective weight limit is ~25 KB
         assert size_kb < 80, f"TFLite model is {size_kb:.1f} KB (limit: 80 KB)"
+
+
+class TestAttentionPooling:
+    def test_matches_repeat_multiply_sum(self):
+        rng = np.random.default_rng(0)
+        seq = rng.standard_normal((4, 30, 128)).astype(np.float32)
+        weights = tf.nn.softmax(rng.standard_normal((4, 30)).astype(np.float32)).numpy()
+        expected = (seq * weights[:, :, None]).sum(axis=1)
+        out = AttentionPooling()([tf.constant(seq), tf.constant(weights)]).numpy()
+        np.testing.assert_allclose(out, expected, rtol=1e-5, atol=1e-5)
+
+    def test_model_has_no_repeated_attention_tensor(self):
+        m = StressClassificationModel().build_model()
+        kinds = {type(layer).__name__ for layer in m.layers}
+        assert 'AttentionPooling' in kinds
+        assert not kinds & {'RepeatVector', 'Permute', 'Multiply'}
@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import pytest
+
+pytestmark = pytest.mark.slow  # imports TensorFlow
+
+from stress_detection.data import subject_windows
+from stress_detection.data.wesad_loader import WESADLoader
+from stress_detection.training import train_stress_model
+from stress_detection.training.train_stress_model import build_dataset, feature_cache_path
+
+
+class TestBuildDataset:
+    def test_cache_hit_matches_fresh_build(self, tmp_path, monkeypatch, make_wesad_pkl):
+        data_dir, cache_dir = tmp_path / 'WESAD', tmp_path / 'cache'
+        data_dir.mkdir()
+        for subj in ('S2', 'S3'):
+            make_wesad_pkl(data_dir, subj, minutes=2, label=1)
+        loader = WESADLoader(str(data_dir))
+
+        X, y, groups = build_dataset(loader, str(cache_dir), workers=1)
+        assert len(os.listdir(cache_dir)) == 2
+
+        def fail(*args, **kwargs):
+            raise AssertionError("cached subject was processed again")
+        monkeypatch.setattr(subject_windows, 'subject_features', fail)
+        X2, y2, groups2 = build_dataset(loader, str(cache_dir), workers=1)
+        np.testing.assert_array_equal(X, X2)
+        np.testing.assert_array_equal(y, y2)
+        np.testing.assert_array_equal(groups, groups2)
+
+    def test_parallel_matches_serial(self, tmp_path, make_wesad_pkl):
+        data_dir = tmp_path / 'WESAD'
+        data_dir.mkdir()
+        for subj in ('S2', 'S3', 'S4'):
+            make_wesad_pkl(data_dir, subj, minutes=2, label=1)
+        loader = WESADLoader(str(data_dir))
+        serial = build_dataset(loader, None, workers=1)
+        parallel = build_dataset(loader, None, workers=2)
+        for a, b in zip(serial, parallel):
+            np.testing.assert_array_equal(a, b)
+
+    def test_cache_key_changes_with_pickle_and_params(self, tmp_path, monkeypatch, make_wesad_pkl):
+        data_dir = tmp_path / 'WESAD'
+        data_dir.mkdir()
+        make_wesad_pkl(data_dir, 'S2', minutes=2, label=1)
+        pkl = str(data_dir / 'S2' / 'S2.pkl')
+        path = feature_cache_path(str(tmp_path), pkl, 'S2')
+
+        monkeypatch.setattr(train_stress_model, 'STEP', 10)
+        assert feature_cache_path(str(tmp_path), pkl, 'S2') != path
+        monkeypatch.undo()
+
+        st = os.stat(pkl)
+        os.utime(pkl, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        assert feature_cache_path(str(tmp_path), pkl, 'S2') != path
+
+
+def test_feature_worker_module_does_not_import_tensorflow():
+    import subprocess
+    import sys
+    import stress_detection
+    code = ("import sys; import stress_detection.data.subject_windows; "
+            "sys.exit('tensorflow' in sys.modules)")
+    root = os.path.dirname(os.path.dirname(stress_detection.__file__))
+    assert subprocess.run([sys.executable, '-c', code], cwd=root).returncode == 0
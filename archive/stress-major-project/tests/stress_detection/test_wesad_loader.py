@@ -1,3 +1,4 @@
+import os
 import pickle
 import numpy as np
 import pytest
@@ -59,3 +60,42 @@ class TestWESADLoader:
             make_fake_pkl(tmp_path, subject=s)
         loader = WESADLoader(data_dir=str(tmp_path))
         assert set(loader.available_subjects()) == {'S2', 'S5', 'S11'}
+
+
+class TestColumnarConversion:
+    def test_lazy_load_matches_pickle(self, tmp_path, make_wesad_pkl):
+        make_wesad_pkl(tmp_path)
+        loader = WESADLoader(data_dir=str(tmp_path))
+        expected = loader.load_subject('S2')
+        loader.convert_subject('S2')
+        assert loader.is_converted('S2')
+        lazy = loader.load_subject('S2')
+        assert lazy['subject'] == 'S2'
+        for key in ('BVP', 'EDA', 'TEMP', 'ACC', 'labels'):
+            assert lazy[key].dtype == expected[key].dtype
+            np.testing.assert_array_equal(lazy[key], expected[key])
+
+    def test_channels_are_memory_mapped(self, tmp_path, make_wesad_pkl):
+        make_wesad_pkl(tmp_path)
+        loader = WESADLoader(data_dir=str(tmp_path))
+        loader.convert_subject('S2')
+        assert isinstance(loader.load_subject('S2')['BVP'], np.memmap)
+
+    def test_changed_pickle_falls_back_until_reconverted(self, tmp_path, make_wesad_pkl):
+        pkl_path = make_wesad_pkl(tmp_path)
+        loader = WESADLoader(data_dir=str(tmp_path))
+        loader.convert_subject('S2')
+        st = os.stat(pkl_path)
+        os.utime(pkl_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        assert not loader.is_converted('S2')
+        assert isinstance(loader.load_subject('S2'), dict)
+        assert loader.convert_all() == ['S2']
+        assert loader.is_converted('S2')
+
+    def test_converted_subject_available_without_pickle(self, tmp_path, make_wesad_pkl):
+        pkl_path = make_wesad_pkl(tmp_path)
+        loader = WESADLoader(data_dir=str(tmp_path))
+        loader.convert_subject('S2')
+        os.remove(pkl_path)
+        assert loader.available_subjects() == ['S2']
+        assert len(loader.load_subject('S2')['labels']) == 700 * 60
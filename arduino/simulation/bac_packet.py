@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+AlcoWatch BAC status packet codec
+Shared Python decoder for the 20-byte packet sent by BLESimulator.send_bac_status
+and parsed by the vehicle firmware's parseBACStatus()
+Bulk decoding for gateway logs, validation, and a fuzz/benchmark harness
+"""
+
+import argparse
+import json
+import math
+import random
+import struct
+import time
+from typing import Iterator, Tuple
+
+import numpy as np
+
+# Bytes 0-7 timestamp (ms), 8-11 BAC float, 12 alert, 13 confidence, 14 flags, 15-19 MAC
+# Single bytes are unsigned, as the firmware stores them in `byte` fields
+BAC_STATUS_STRUCT = struct.Struct('<QfBBB5x')
+BAC_STATUS_SIZE = BAC_STATUS_STRUCT.size  # 20
+
+# Columnar view of the same layout for NumPy
+BAC_STATUS_DTYPE = np.dtype([
+    ('timestamp', '<u8'),
+    ('bac', '<f4'),
+    ('alert_level', 'u1'),
+    ('confidence', 'u1'),
+    ('flags', 'u1'),
+    ('mac', 'V5'),
+])
+
+# Flag bits of byte 14
+FLAG_WATCH_WORN = 0x01
+FLAG_SENSOR_QUALITY = 0x04
+FLAG_BATTERY_LOW = 0x08
+FLAG_KNOWN = FLAG_WATCH_WORN | FLAG_SENSOR_QUALITY | FLAG_BATTERY_LOW
+
+# Plausibility limits used by validate()
+TIMESTAMP_MIN_MS = 1_577_836_800_000  # 2020-01-01; smaller values are seconds or uptime
+TIMESTAMP_MAX_SKEW_MS = 24 * 3600 * 1000  # beyond now + 1 day
+BAC_MAX = 0.5  # g/dL, above any survivable level
+ALERT_LEVEL_MAX = 3  # CRITICAL
+CONFIDENCE_MAX = 100
+
+# Issue bits returned by validate()
+ISSUE_TIMESTAMP_RANGE = 0x001
+ISSUE_TIMESTAMP_ORDER = 0x002
+ISSUE_BAC_NAN = 0x004
+ISSUE_BAC_RANGE = 0x008
+ISSUE_RESERVED_FLAGS = 0x010
+ISSUE_FLAG_CONFLICT = 0x020
+ISSUE_ALERT_RANGE = 0x040
+ISSUE_CONFIDENCE_RANGE = 0x080
+
+ISSUE_NAMES = {
+    ISSUE_TIMESTAMP_RANGE: "timestamp_out_of_range",
+    ISSUE_TIMESTAMP_ORDER: "timestamp_went_backwards",
+    ISSUE_BAC_NAN: "bac_nan_or_inf",
+    ISSUE_BAC_RANGE: "bac_out_of_range",
+    ISSUE_RESERVED_FLAGS: "reserved_flag_bits",
+    ISSUE_FLAG_CONFLICT: "sensor_ok_but_not_worn",
+    ISSUE_ALERT_RANGE: "alert_level_out_of_range",
+    ISSUE_CONFIDENCE_RANGE: "confidence_over_100",
+}
+
+
+def encode(timestamp: int, bac_value: float, alert_level: int, confidence: int, flags: int) -> bytes:
+    """Pack one BAC status packet"""
+    return BAC_STATUS_STRUCT.pack(timestamp, bac_value, alert_level, confidence, flags)
+
+
+def encode_bac_status(timestamp: int, bac_value: float, alert_level: int, confidence: int,
+                      watch_worn: bool = True, sensor_quality: bool = True,
+                      battery_low: bool = False) -> bytes:
+    """Pack one BAC status packet from its status fields, as the smartwatch sends it"""
+    flags = 0
+    if watch_worn:
+        flags |= FLAG_WATCH_WORN
+    if sensor_quality:
+        flags |= FLAG_SENSOR_QUALITY
+    if battery_low:
+        flags |= FLAG_BATTERY_LOW
+    return encode(timestamp, bac_value, alert_level & 0xFF, confidence & 0xFF, flags)
+
+
+def decode(data) -> Tuple[int, float, int, int, int]:
+    """Decode one packet into (timestamp, bac, alert_level, confidence, flags)"""
+    return BAC_STATUS_STRUCT.unpack_from(data)
+
+
+def iter_decode(buffer) -> Iterator[Tuple[int, float, int, int, int]]:
+    """
+    Decode back-to-back packets with struct.iter_unpack
+
+    A trailing partial packet is ignored; use split_complete() to find it.
+    """
+    view = memoryview(buffer)
+    usable = len(view) - len(view) % BAC_STATUS_SIZE
+    return BAC_STATUS_STRUCT.iter_unpack(view[:usable])
+
+
+def split_complete(buffer) -> Tuple[memoryview, int]:
+    """Return (whole packets, number of trailing bytes that do not form a packet)"""
+    view = memoryview(buffer)
+    extra = len(view) % BAC_STATUS_SIZE
+    return view[:len(view) - extra], extra
+
+
+def decode_array(buffer) -> np.ndarray:
+    """Zero-copy structured-array view of back-to-back packets"""
+    complete, _ = split_complete(buffer)
+    return np.frombuffer(complete, dtype=BAC_STATUS_DTYPE)
+
+
+def validate(packets: np.ndarray, now_ms: int = None) -> np.ndarray:
+    """
+    Flag suspicious packets; returns one ISSUE_* bitmask per packet (0 = clean)
+
+    Timestamps must be epoch milliseconds between 2020 and now + 1 day and must
+    not go backwards. BAC must be finite and within 0..BAC_MAX (the firmware
+    treats NaN as under the limit and allows ignition). Flag bytes must not
+    set unknown bits, nor report good sensor quality while the watch is off.
+    """
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    ts = packets['timestamp']
+    bac = packets['bac']
+    flags = packets['flags']
+    issues = np.zeros(packets.shape, dtype=np.uint16)
+
+    issues[(ts < TIMESTAMP_MIN_MS) | (ts > now_ms + TIMESTAMP_MAX_SKEW_MS)] |= ISSUE_TIMESTAMP_RANGE
+    if ts.size > 1:
+        issues[1:][ts[1:] < ts[:-1]] |= ISSUE_TIMESTAMP_ORDER
+
+    finite = np.isfinite(bac)
+    issues[~finite] |= ISSUE_BAC_NAN
+    with np.errstate(invalid='ignore'):
+        issues[finite & ((bac < 0) | (bac > BAC_MAX))] |= ISSUE_BAC_RANGE
+
+    issues[(flags & ~np.uint8(FLAG_KNOWN)) != 0] |= ISSUE_RESERVED_FLAGS
+    issues[((flags & FLAG_WATCH_WORN) == 0) & ((flags & FLAG_SENSOR_QUALITY) != 0)] |= ISSUE_FLAG_CONFLICT
+    issues[packets['alert_level'] > ALERT_LEVEL_MAX] |= ISSUE_ALERT_RANGE
+    issues[packets['confidence'] > CONFIDENCE_MAX] |= ISSUE_CONFIDENCE_RANGE
+    return issues
+
+
+def issue_counts(issues: np.ndarray) -> dict:
+    """Number of packets with each issue, plus the clean count"""
+    counts = {name: int(((issues & bit) != 0).sum()) for bit, name in ISSUE_NAMES.items()}
+    counts['clean'] = int((issues == 0).sum())
+    return counts
+
+
+def read_packet_log(path: str) -> bytes:
+    """
+    Load a gateway packet log
+
+    Binary logs are raw back-to-back packets; text logs hold one hex-encoded
+    packet per line.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        text = raw.decode('ascii')
+    except UnicodeDecodeError:
+        return raw
+    lines = text.split()
+    try:
+        return b''.join(bytes.fromhex(line) for line in lines)
+    except ValueError:
+        return raw
+
+
+def fuzz_packets(n: int, seed: int = 0, corrupt_ratio: float = 0.2) -> bytes:
+    """
+    Generate n packets: plausible traffic with a share of mutated ones
+
+    Mutations: NaN/Inf or out-of-range BAC, random flag bytes, timestamps in
+    seconds or far future, out-of-range alert/confidence and random bytes.
+    """
+    rng = random.Random(seed)
+    out = bytearray()
+    ts = 1_700_000_000_000
+    for _ in range(n):
+        ts += rng.randint(1000, 30000)
+        bac = rng.uniform(0, 0.2)
+        flags = FLAG_WATCH_WORN | FLAG_SENSOR_QUALITY
+        packet = bytearray(encode(ts, bac, rng.randint(0, 3), rng.randint(50, 100), flags))
+        if rng.random() < corrupt_ratio:
+            kind = rng.randrange(6)
+            if kind == 0:
+                struct.pack_into('<f', packet, 8, rng.choice([math.nan, math.inf, -0.1, 3.0]))
+            elif kind == 1:
+                packet[14] = rng.randrange(256)
+            elif kind == 2:
+                struct.pack_into('<Q', packet, 0, rng.choice([ts // 1000, 0, 2 ** 63, ts - 10 ** 7]))
+            elif kind == 3:
+                packet[12] = rng.randrange(256)
+            elif kind == 4:
+                packet[13] = rng.randrange(101, 256)
+            else:
+                packet[:] = rng.randbytes(BAC_STATUS_SIZE)
+        out += packet
+    return bytes(out)
+
+
+def benchmark(buffer, repeats: int = 3) -> dict:
+    """Packets per second for tuple decoding, array decoding and validation"""
+    n = len(buffer) // BAC_STATUS_SIZE
+
+    def best(fn):
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        return round(n / min(times)) if min(times) > 0 else 0
+
+    packets = decode_array(buffer)
+    return {
+        'packets': n,
+        'iter_unpack_per_second': best(lambda: list(iter_decode(buffer))),
+        'unpack_from_loop_per_second': best(
+            lambda: [BAC_STATUS_STRUCT.unpack_from(buffer, i) for i in range(0, n * BAC_STATUS_SIZE, BAC_STATUS_SIZE)]
+        ),
+        'numpy_decode_validate_per_second': best(lambda: validate(decode_array(buffer))),
+        'validate_per_second': best(lambda: validate(packets)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode, validate and benchmark BAC status packets")
+    parser.add_argument('--log', help="Gateway packet log (raw binary or one hex packet per line)")
+    parser.add_argument('--fuzz', type=int, default=0, metavar='N',
+                        help="Fuzz N generated packets through the decoder")
+    parser.add_argument('--bench', type=int, default=0, metavar='N',
+                        help="Benchmark decoding of N packets")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = {}
+    if args.log:
+        buffer = read_packet_log(args.log)
+        complete, extra = split_complete(buffer)
+        result['log'] = {'trailing_bytes': extra, **issue_counts(validate(decode_array(complete)))}
+    if args.fuzz:
+        buffer = fuzz_packets(args.fuzz, args.seed)
+        # Both decode paths must agree on every packet
+        packets = decode_array(buffer)
+        columns = list(zip(*iter_decode(buffer)))
+        for name, values in zip(('timestamp', 'bac', 'alert_level', 'confidence', 'flags'), columns):
+            expected = np.array(values, dtype=packets[name].dtype)
+            if not np.array_equal(expected, packets[name], equal_nan=name == 'bac'):
+                raise AssertionError(f"iter_unpack and NumPy decoders disagree on {name}")
+        result['fuzz'] = issue_counts(validate(packets))
+    if args.bench:
+        result['bench'] = benchmark(fuzz_packets(args.bench, args.seed, corrupt_ratio=0.0))
+    if not result:
+        parser.error("choose at least one of --log, --fuzz, --bench")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
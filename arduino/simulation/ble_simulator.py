@@ -3,12 +3,23 @@ BLE Communication Simulator for AlcoWatch
 Simulates smartwatch BLE peripheral communicating with Arduino vehicle module
 """
 
+import argparse
 import asyncio
+import json
 import struct
 import time
-from typing import Optional
-from bleak import BleakClient, BleakScanner
-from bleak.backends.characteristic import BleakGATTCharacteristic
+from typing import TYPE_CHECKING, Optional
+
+from bac_packet import encode_bac_status
+from instrumentation import metrics, span
+
+try:
+    from bleak import BleakClient, BleakScanner
+except ImportError:  # The loopback transport works without bleak
+    BleakClient = BleakScanner = None
+
+if TYPE_CHECKING:
+    from bleak.backends.characteristic import BleakGATTCharacteristic
 
 
 class BLESimulator:
@@ -23,13 +34,41 @@ class BLESimulator:
     VEHICLE_CMD_UUID = "12345678-1234-5678-1234-56789abcdef2"
     SYSTEM_STATUS_UUID = "12345678-1234-5678-1234-56789abcdef3"
 
-    def __init__(self):
-        self.client: Optional[BleakClient] = None
+    def __init__(self, transport=None, clock=None, verbose: bool = True):
+        """
+        Args:
+            transport: BleakClient-compatible client to use instead of a real
+                BleakClient (e.g. LoopbackGATTClient); no scan is needed
+            clock: VirtualClock driving scenario timing (default: wall clock)
+            verbose: Print every packet and command
+        """
+        self.client = None
+        self.transport = transport
+        self.clock = clock
+        self.verbose = verbose
         self.is_connected = False
-        self.device_address = None
+        self.device_address = getattr(transport, 'address', None)
+        self.commands_received = 0
+
+    def log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    def now(self) -> float:
+        return self.clock.now() if self.clock else time.time()
+
+    async def sleep(self, seconds: float):
+        if self.clock:
+            await self.clock.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
 
     async def scan_for_vehicle(self, timeout: float = 10.0):
         """Scan for AlcoWatch vehicle module"""
+        if BleakScanner is None:
+            print("ERROR: bleak is not installed (pip install bleak)")
+            return None
+
         print(f"Scanning for AlcoWatch vehicle module (timeout: {timeout}s)...")
 
         devices = await BleakScanner.discover(timeout=timeout)
@@ -53,11 +92,11 @@ class BLESimulator:
             return False
 
         try:
-            print(f"Connecting to {self.device_address}...")
-            self.client = BleakClient(self.device_address)
+            self.log(f"Connecting to {self.device_address}...")
+            self.client = self.transport or BleakClient(self.device_address)
             await self.client.connect()
             self.is_connected = True
-            print("Connected successfully!")
+            self.log("Connected successfully!")
 
             # Subscribe to vehicle commands
             await self.client.start_notify(
@@ -75,7 +114,7 @@ class BLESimulator:
         if self.client and self.is_connected:
             await self.client.disconnect()
             self.is_connected = False
-            print("Disconnected")
+            self.log("Disconnected")
 
     async def send_bac_status(
         self,
@@ -102,31 +141,17 @@ class BLESimulator:
             return
 
         # Build BAC status packet (20 bytes)
-        timestamp = int(time.time() * 1000)  # milliseconds
-
-        # Flags byte
-        flags = 0
-        if watch_worn:
-            flags |= 0x01
-        if sensor_quality:
-            flags |= 0x04
-        if battery_low:
-            flags |= 0x08
-
-        # Pack data
-        data = struct.pack(
-            '<Qfbbbxxxxx',
-            timestamp,  # 8 bytes: timestamp
-            bac_value,  # 4 bytes: BAC value
-            alert_level,  # 1 byte: alert level
-            confidence,  # 1 byte: confidence
-            flags  # 1 byte: flags
-            # 5 bytes: MAC (filled with zeros for simulation)
-        )
+        timestamp = int(self.now() * 1000)  # milliseconds
+
+        # Same wire format the vehicle parses (bac_packet.BAC_STATUS_STRUCT); MAC left zero
+        with span('packet_encode'):
+            data = encode_bac_status(timestamp, bac_value, alert_level, confidence,
+                                     watch_worn, sensor_quality, battery_low)
 
         try:
-            await self.client.write_gatt_char(self.BAC_STATUS_UUID, data)
-            print(f"Sent BAC status: {bac_value:.3f} g/dL (Alert: {alert_level})")
+            with span('transport'):
+                await self.client.write_gatt_char(self.BAC_STATUS_UUID, data)
+            self.log(f"Sent BAC status: {bac_value:.3f} g/dL (Alert: {alert_level})")
         except Exception as e:
             print(f"Failed to send BAC status: {e}")
 
@@ -157,16 +182,17 @@ class BLESimulator:
 
         try:
             await self.client.write_gatt_char(self.SYSTEM_STATUS_UUID, data)
-            print(f"Sent system status (Battery: {battery_level:.1f}%)")
+            self.log(f"Sent system status (Battery: {battery_level:.1f}%)")
         except Exception as e:
             print(f"Failed to send system status: {e}")
 
-    def _vehicle_command_handler(self, characteristic: BleakGATTCharacteristic, data: bytearray):
+    def _vehicle_command_handler(self, characteristic: 'BleakGATTCharacteristic', data: bytearray):
         """Handle vehicle commands"""
         if len(data) < 1:
             return
 
         command_type = data[0]
+        self.commands_received += 1
 
         commands = {
             0x00: "ALLOW_IGNITION",
@@ -177,16 +203,16 @@ class BLESimulator:
         }
 
         command_name = commands.get(command_type, f"UNKNOWN({command_type})")
-        print(f"<< Received vehicle command: {command_name}")
+        self.log(f"<< Received vehicle command: {command_name}")
 
     async def simulate_sober_driver(self, duration: int = 60):
         """Simulate a sober driver (BAC < 0.05)"""
-        print(f"\n=== Simulating SOBER driver for {duration} seconds ===\n")
+        self.log(f"\n=== Simulating SOBER driver for {duration} seconds ===\n")
 
-        start_time = time.time()
+        start_time = self.now()
         update_count = 0
 
-        while time.time() - start_time < duration:
+        while self.now() - start_time < duration:
             bac = 0.02 + (0.01 * (update_count % 3))  # Vary slightly: 0.02-0.04
             await self.send_bac_status(
                 bac_value=bac,
@@ -197,16 +223,16 @@ class BLESimulator:
             )
 
             update_count += 1
-            await asyncio.sleep(30)  # Update every 30 seconds
+            await self.sleep(30)  # Update every 30 seconds
 
     async def simulate_intoxicated_driver(self, duration: int = 60):
         """Simulate an intoxicated driver (BAC > 0.08)"""
-        print(f"\n=== Simulating INTOXICATED driver for {duration} seconds ===\n")
+        self.log(f"\n=== Simulating INTOXICATED driver for {duration} seconds ===\n")
 
-        start_time = time.time()
+        start_time = self.now()
         update_count = 0
 
-        while time.time() - start_time < duration:
+        while self.now() - start_time < duration:
             bac = 0.10 + (0.02 * (update_count % 3))  # Vary: 0.10-0.14
             await self.send_bac_status(
                 bac_value=bac,
@@ -217,11 +243,11 @@ class BLESimulator:
             )
 
             update_count += 1
-            await asyncio.sleep(30)
+            await self.sleep(30)
 
     async def simulate_drinking_scenario(self):
         """Simulate realistic drinking scenario: sober -> intoxicated -> sobering"""
-        print("\n=== Simulating REALISTIC drinking scenario ===\n")
+        self.log("\n=== Simulating REALISTIC drinking scenario ===\n")
 
         scenarios = [
             ("Baseline (Sober)", 0.01, 0, 30),
@@ -235,10 +261,10 @@ class BLESimulator:
         ]
 
         for scenario_name, bac, alert_level, duration in scenarios:
-            print(f"\n--- {scenario_name}: BAC={bac:.2f} g/dL ---")
+            self.log(f"\n--- {scenario_name}: BAC={bac:.2f} g/dL ---")
 
-            start = time.time()
-            while time.time() - start < duration:
+            start = self.now()
+            while self.now() - start < duration:
                 await self.send_bac_status(
                     bac_value=bac,
                     alert_level=alert_level,
@@ -246,14 +272,14 @@ class BLESimulator:
                     watch_worn=True,
                     sensor_quality=True
                 )
-                await asyncio.sleep(10)
+                await self.sleep(10)
 
     async def simulate_tamper_detection(self):
         """Simulate watch removal (tamper)"""
-        print("\n=== Simulating TAMPER scenario (watch removed) ===\n")
+        self.log("\n=== Simulating TAMPER scenario (watch removed) ===\n")
 
         # Normal operation
-        print("Normal operation...")
+        self.log("Normal operation...")
         for _ in range(3):
             await self.send_bac_status(
                 bac_value=0.03,
@@ -262,10 +288,10 @@ class BLESimulator:
                 watch_worn=True,
                 sensor_quality=True
             )
-            await asyncio.sleep(10)
+            await self.sleep(10)
 
         # Watch removed
-        print("\n!!! Watch removed !!!")
+        self.log("\n!!! Watch removed !!!")
         for _ in range(5):
             await self.send_bac_status(
                 bac_value=0.03,
@@ -274,10 +300,10 @@ class BLESimulator:
                 watch_worn=False,  # Tamper detected
                 sensor_quality=False
             )
-            await asyncio.sleep(10)
+            await self.sleep(10)
 
         # Watch worn again
-        print("\nWatch worn again")
+        self.log("\nWatch worn again")
         for _ in range(3):
             await self.send_bac_status(
                 bac_value=0.03,
@@ -286,21 +312,25 @@ class BLESimulator:
                 watch_worn=True,
                 sensor_quality=True
             )
-            await asyncio.sleep(10)
+            await self.sleep(10)
 
 
 async def interactive_mode():
     """Interactive testing mode"""
-    simulator = BLESimulator()
+    from connection_manager import DEFAULT_CACHE_PATH, AddressCache, ConnectionManager
 
-    # Scan and connect
-    device = await simulator.scan_for_vehicle(timeout=10.0)
-    if not device:
+    manager = ConnectionManager(cache=AddressCache(DEFAULT_CACHE_PATH))
+
+    # Scan (or reuse a cached address) and connect
+    addresses = await manager.discover(timeout=10.0)
+    if not addresses:
         print("No device found. Make sure Arduino is running.")
         return
 
+    simulator = BLESimulator(transport=manager.client(addresses[0]))
     if not await simulator.connect():
         print("Connection failed")
+        await manager.close()
         return
 
     print("\n" + "=" * 50)
@@ -341,38 +371,109 @@ async def interactive_mode():
 
     finally:
         await simulator.disconnect()
+        await manager.close()
+
+
+async def run_all_scenarios(simulator: BLESimulator):
+    """Sober, intoxicated, tamper and drinking scenarios back to back"""
+    await simulator.simulate_sober_driver(60)
+    await simulator.sleep(5)
+
+    await simulator.simulate_intoxicated_driver(60)
+    await simulator.sleep(5)
+
+    await simulator.simulate_tamper_detection()
+    await simulator.sleep(5)
+
+    await simulator.simulate_drinking_scenario()
 
 
 async def automated_test():
-    """Automated test sequence"""
-    simulator = BLESimulator()
+    """
+    Automated test sequence on every vehicle module found
+
+    Addresses are scanned once and cached between runs; the modules are
+    tested concurrently over pooled connections that reconnect with backoff.
+    """
+    from connection_manager import DEFAULT_CACHE_PATH, AddressCache, ConnectionManager
 
-    device = await simulator.scan_for_vehicle(timeout=10.0)
-    if not device:
+    manager = ConnectionManager(cache=AddressCache(DEFAULT_CACHE_PATH))
+    addresses = await manager.discover(timeout=10.0)
+    if not addresses:
         print("No device found")
         return
 
-    if not await simulator.connect():
-        return
+    async def test_device(address):
+        simulator = BLESimulator(transport=manager.client(address))
+        try:
+            if await simulator.connect():
+                await run_all_scenarios(simulator)
+        finally:
+            await simulator.disconnect()
 
     try:
-        # Run all scenarios
-        await simulator.simulate_sober_driver(60)
-        await asyncio.sleep(5)
+        await asyncio.gather(*(test_device(a) for a in addresses))
+    finally:
+        print(json.dumps(manager.stats(), indent=2))
+        await manager.close()
 
-        await simulator.simulate_intoxicated_driver(60)
-        await asyncio.sleep(5)
 
-        await simulator.simulate_tamper_detection()
-        await asyncio.sleep(5)
+async def loopback_benchmark(repeats: int = 1, verbose: bool = False) -> dict:
+    """
+    Replay every scenario over the in-process loopback transport
 
-        await simulator.simulate_drinking_scenario()
+    Scenario timing runs on a VirtualClock, so the 10-30 s update intervals
+    cost no real time and packets flow at full CPU speed. Returns the loopback
+    latency/throughput stats.
+    """
+    from loopback_transport import LoopbackGATTClient
+    from run_simulation import VirtualClock
 
-    finally:
-        await simulator.disconnect()
+    clock = VirtualClock(start=0.0)
+    transport = LoopbackGATTClient(clock=clock)
+    simulator = BLESimulator(transport=transport, clock=clock, verbose=verbose)
+
+    async def session():
+        if not await simulator.connect():
+            return
+        try:
+            for _ in range(repeats):
+                await simulator.simulate_sober_driver(60)
+                await simulator.simulate_intoxicated_driver(60)
+                await simulator.simulate_tamper_detection()
+                await simulator.simulate_drinking_scenario()
+        finally:
+            await simulator.disconnect()
+
+    await clock.run(session())
+    stats = transport.stats()
+    stats['simulated_seconds'] = clock.now()
+    stats['commands_received'] = simulator.commands_received
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AlcoWatch BLE simulator")
+    parser.add_argument('--loopback', action='store_true',
+                        help="Replay all scenarios against the in-process firmware port "
+                             "(no Bluetooth adapter) and print latency/throughput JSON")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Scenario passes in loopback mode (default: 1)")
+    parser.add_argument('--verbose', action='store_true',
+                        help="Print every packet in loopback mode")
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help="Write per-stage latency histograms (packet_encode, transport) to PATH")
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.loopback:
+        print(json.dumps(asyncio.run(loopback_benchmark(args.repeat, args.verbose)), indent=2))
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        raise SystemExit(0)
+
     print("AlcoWatch BLE Simulator")
     print("=" * 50)
     print("\nMode:")
@@ -0,0 +1,280 @@
+"""
+BLE connection manager for AlcoWatch bench rigs
+Caches discovered vehicle module addresses, keeps one client per module,
+reconnects with exponential backoff and serializes writes per device
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.alcowatch_ble_devices.json")
+
+
+class DeviceUnavailable(ConnectionError):
+    """Raised when a device cannot be reached after all reconnect attempts"""
+
+
+class AddressCache:
+    """Discovered device addresses with last-seen times, optionally persisted as JSON"""
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.devices: Dict[str, dict] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.devices = json.load(f)
+            except (OSError, ValueError):
+                self.devices = {}
+
+    def add(self, address: str, name: str = ""):
+        self.devices[address] = {'name': name, 'last_seen': time.time()}
+
+    def addresses(self) -> List[str]:
+        """Addresses seen within the TTL"""
+        cutoff = time.time() - self.ttl
+        return [a for a, info in self.devices.items() if info['last_seen'] >= cutoff]
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, 'w') as f:
+            json.dump(self.devices, f, indent=2)
+
+
+def _notify_key(char_specifier) -> str:
+    """UUID string of a characteristic specifier, like bleak accepts"""
+    return str(getattr(char_specifier, 'uuid', char_specifier)).lower()
+
+
+class _DeviceLink:
+    """Client, write queue, worker task and notify subscriptions of one vehicle module"""
+
+    def __init__(self, address: str):
+        self.address = address
+        self.client = None
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.worker: Optional[asyncio.Task] = None
+        self.lock = asyncio.Lock()  # One connect attempt at a time
+        # Re-issued after every reconnect: a new connection has no subscriptions
+        self.subscriptions: Dict[str, Tuple[object, Callable, dict]] = {}
+        self.connect_attempts = 0
+        self.writes = 0
+        self.failed_writes = 0
+
+
+class ConnectionManager:
+    """
+    Pool of BLE clients for several vehicle modules
+
+    client_factory(address) builds a BleakClient-compatible client (BleakClient
+    by default, LoopbackGATTClient for tests). Writes to a device go through
+    its own queue and worker, so each connection has one write in flight while
+    different devices are written concurrently. A failed connect or write
+    reconnects with exponential backoff and jitter before giving up; notify
+    subscriptions made through start_notify() are restored on every reconnect.
+    """
+
+    def __init__(
+        self,
+        client_factory: Optional[Callable] = None,
+        cache: Optional[AddressCache] = None,
+        name_filter: str = "AlcoWatch",
+        max_attempts: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        sleep=asyncio.sleep,
+    ):
+        if client_factory is None:
+            from bleak import BleakClient
+            client_factory = BleakClient
+        self.client_factory = client_factory
+        self.cache = cache or AddressCache()
+        self.name_filter = name_filter
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._links: Dict[str, _DeviceLink] = {}
+
+    async def discover(self, timeout: float = 10.0, rescan: bool = False) -> List[str]:
+        """Return vehicle module addresses, scanning only if the cache is empty or rescan=True"""
+        cached = self.cache.addresses()
+        if cached and not rescan:
+            return cached
+
+        from bleak import BleakScanner
+        print(f"Scanning for AlcoWatch vehicle modules (timeout: {timeout}s)...")
+        devices = await BleakScanner.discover(timeout=timeout)
+        for device in devices:
+            if self.name_filter in (device.name or ""):
+                print(f"Found AlcoWatch device: {device.name} ({device.address})")
+                self.cache.add(device.address, device.name)
+        self.cache.save()
+        return self.cache.addresses()
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (0-based), with 50-100% jitter"""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _link(self, address: str) -> _DeviceLink:
+        link = self._links.get(address)
+        if link is None:
+            link = self._links[address] = _DeviceLink(address)
+        return link
+
+    async def connect(self, address: str):
+        """Connected client for address, (re)connecting with backoff if needed"""
+        link = self._link(address)
+        async with link.lock:
+            if link.client is not None and link.client.is_connected:
+                return link.client
+
+            last_error = None
+            for attempt in range(self.max_attempts):
+                if attempt:
+                    await self.sleep(self.backoff_delay(attempt - 1))
+                try:
+                    if link.client is None:
+                        link.client = self.client_factory(address)
+                    link.connect_attempts += 1
+                    await link.client.connect()
+                    for char_specifier, callback, kwargs in link.subscriptions.values():
+                        await link.client.start_notify(char_specifier, callback, **kwargs)
+                    self.cache.add(address, self.cache.devices.get(address, {}).get('name', ""))
+                    if link.worker is None:
+                        link.worker = asyncio.create_task(self._write_worker(link))
+                    return link.client
+                except Exception as e:  # bleak raises BleakError, OSError, TimeoutError...
+                    last_error = e
+            raise DeviceUnavailable(
+                f"Could not connect to {address} after {self.max_attempts} attempts: {last_error}"
+            )
+
+    async def write(self, address: str, char_specifier, data, response: bool = False):
+        """Queue a GATT write for address and wait until it has been sent"""
+        link = self._link(address)
+        if link.worker is None:
+            await self.connect(address)
+        done = asyncio.get_running_loop().create_future()
+        link.queue.put_nowait((char_specifier, bytes(data), response, done))
+        await done
+
+    async def write_all(self, char_specifier, data, response: bool = False):
+        """Send the same write to every pooled device concurrently"""
+        results = await asyncio.gather(
+            *(self.write(a, char_specifier, data, response) for a in list(self._links)),
+            return_exceptions=True,
+        )
+        return dict(zip(list(self._links), results))
+
+    async def _write_worker(self, link: _DeviceLink):
+        """Send queued writes in order"""
+        while True:
+            char_specifier, data, response, done = await link.queue.get()
+            try:
+                await self._send(link, char_specifier, data, response)
+                link.writes += 1
+                if not done.done():
+                    done.set_result(None)
+            except Exception as e:
+                link.failed_writes += 1
+                if not done.done():
+                    done.set_exception(e)
+            finally:
+                link.queue.task_done()
+
+    async def _send(self, link: _DeviceLink, char_specifier, data, response):
+        """One write; on failure reconnect (with backoff) and retry once"""
+        try:
+            if not link.client.is_connected:
+                await self.connect(link.address)
+            await link.client.write_gatt_char(char_specifier, data, response=response)
+        except DeviceUnavailable:
+            raise
+        except Exception:
+            await self.connect(link.address)
+            await link.client.write_gatt_char(char_specifier, data, response=response)
+
+    async def start_notify(self, address: str, char_specifier, callback, **kwargs):
+        """Subscribe to a characteristic and keep the subscription across reconnects"""
+        client = await self.connect(address)
+        await client.start_notify(char_specifier, callback, **kwargs)
+        self._link(address).subscriptions[_notify_key(char_specifier)] = (char_specifier, callback, kwargs)
+
+    async def stop_notify(self, address: str, char_specifier):
+        self._link(address).subscriptions.pop(_notify_key(char_specifier), None)
+        client = await self.connect(address)
+        await client.stop_notify(char_specifier)
+
+    def client(self, address: str) -> 'ManagedClient':
+        """BleakClient-like handle for BLESimulator(transport=...)"""
+        return ManagedClient(self, address)
+
+    def stats(self) -> dict:
+        return {
+            address: {
+                'connected': bool(link.client and link.client.is_connected),
+                'writes': link.writes,
+                'failed_writes': link.failed_writes,
+                'connect_attempts': link.connect_attempts,
+                'queued': link.queue.qsize(),
+            }
+            for address, link in self._links.items()
+        }
+
+    async def close(self):
+        """Flush queues, stop workers and disconnect every client"""
+        for link in self._links.values():
+            if link.worker is not None:
+                await link.queue.join()
+                link.worker.cancel()
+                try:
+                    await link.worker
+                except asyncio.CancelledError:
+                    pass
+                link.worker = None
+            if link.client is not None and link.client.is_connected:
+                await link.client.disconnect()
+        self.cache.save()
+
+
+class ManagedClient:
+    """
+    Per-device view of a ConnectionManager with the BleakClient calls used by BLESimulator
+
+    Writes go through the device queue; disconnect() leaves the pooled
+    connection open for the next scenario (ConnectionManager.close() ends it).
+    """
+
+    def __init__(self, manager: ConnectionManager, address: str):
+        self.manager = manager
+        self.address = address
+
+    @property
+    def is_connected(self) -> bool:
+        link = self.manager._links.get(self.address)
+        return bool(link and link.client and link.client.is_connected)
+
+    async def connect(self, **kwargs) -> bool:
+        await self.manager.connect(self.address)
+        return True
+
+    async def disconnect(self) -> bool:
+        await self.manager._link(self.address).queue.join()
+        return True
+
+    async def write_gatt_char(self, char_specifier, data, response: bool = False):
+        await self.manager.write(self.address, char_specifier, data, response)
+
+    async def start_notify(self, char_specifier, callback, **kwargs):
+        await self.manager.start_notify(self.address, char_specifier, callback, **kwargs)
+
+    async def stop_notify(self, char_specifier):
+        await self.manager.stop_notify(self.address, char_specifier)
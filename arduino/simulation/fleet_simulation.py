@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+AlcoWatch Fleet Simulator
+Runs thousands of smartwatch/vehicle pairs concurrently on a simulated clock
+and reports throughput and decision-latency statistics for backend sizing
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation import percentile
+from run_simulation import (
+    SCENARIOS, UPDATE_INTERVAL, SmartwatchSimulator, VehicleSimulator, VirtualClock,
+    run_simulation_scenario,
+)
+
+logger = logging.getLogger("alcowatch.fleet")
+
+
+def parse_mix(text):
+    """Parse a scenario mix like "1=0.5,2=0.3,3=0.2" into {scenario: weight}"""
+    if not text:
+        return {key: 1.0 for key in SCENARIOS}
+    mix = {}
+    for part in text.split(','):
+        key, _, weight = part.partition('=')
+        key = key.strip()
+        if key not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{key}' (choose from {', '.join(SCENARIOS)})")
+        mix[key] = float(weight) if weight else 1.0
+    return mix
+
+
+async def run_pair(pair_id, scenario_key, clock, start_offset, latencies):
+    """Drive one watch-vehicle pair through a scenario without console output"""
+    vehicle = VehicleSimulator(clock, verbose=False)
+    smartwatch = SmartwatchSimulator()
+    scenario_name, scenario_data = SCENARIOS[scenario_key]
+
+    # Stagger pairs so updates do not all land on the same instant
+    await clock.sleep(start_offset)
+
+    counts = await run_simulation_scenario(scenario_name, scenario_data, vehicle, smartwatch, latencies)
+
+    summary = {
+        'pair': pair_id,
+        'scenario': scenario_key,
+        **counts,
+        'final_state': vehicle.ignition_state,
+    }
+    logger.debug(json.dumps(summary))
+    return summary
+
+
+async def simulate_fleet(first_pair, n_pairs, mix, seed, speedup=None):
+    """Run n_pairs pairs as concurrent tasks on one VirtualClock"""
+    random.seed(seed)  # SmartwatchSimulator draws from the module-level RNG
+    rng = random.Random(seed)
+    keys = list(mix)
+    weights = [mix[k] for k in keys]
+
+    clock = VirtualClock(speedup=speedup, start=0.0)
+    latencies = []
+    coros = [
+        run_pair(
+            first_pair + i,
+            rng.choices(keys, weights)[0],
+            clock,
+            rng.randrange(UPDATE_INTERVAL),
+            latencies,
+        )
+        for i in range(n_pairs)
+    ]
+    wall_start = time.perf_counter()
+    pairs = await clock.run(*coros)
+    return {
+        'pairs': pairs,
+        'latencies': latencies,
+        'simulated_seconds': clock.now(),
+        'wall_seconds': time.perf_counter() - wall_start,
+    }
+
+
+def _worker(job):
+    """Process-pool entry point: simulate one shard of the fleet"""
+    first_pair, n_pairs, mix, seed, speedup = job
+    return asyncio.run(simulate_fleet(first_pair, n_pairs, mix, seed, speedup))
+
+
+def run_fleet(n_pairs, mix, seed=42, workers=1, speedup=None):
+    """Simulate the fleet, sharded over worker processes when workers > 1"""
+    shards = max(1, min(workers, n_pairs))
+    sizes = [n_pairs // shards + (i < n_pairs % shards) for i in range(shards)]
+    jobs = []
+    first = 0
+    for i, size in enumerate(sizes):
+        jobs.append((first, size, mix, seed + i, speedup))
+        first += size
+
+    wall_start = time.perf_counter()
+    if shards == 1:
+        results = [_worker(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=shards) as pool:
+            results = list(pool.map(_worker, jobs))
+    wall_seconds = time.perf_counter() - wall_start
+
+    return summarize(results, wall_seconds)
+
+
+def summarize(results, wall_seconds):
+    """Aggregate shard results into fleet throughput and latency statistics"""
+    pairs = [p for r in results for p in r['pairs']]
+    latencies = sorted(v for r in results for v in r['latencies'])
+    simulated_seconds = max(r['simulated_seconds'] for r in results)
+    updates = sum(p['updates'] for p in pairs)
+    blocked = sum(p['blocked'] for p in pairs)
+
+    per_scenario = {}
+    for p in pairs:
+        entry = per_scenario.setdefault(p['scenario'], {
+            'name': SCENARIOS[p['scenario']][0], 'pairs': 0, 'updates': 0, 'blocked': 0,
+        })
+        entry['pairs'] += 1
+        entry['updates'] += p['updates']
+        entry['blocked'] += p['blocked']
+
+    return {
+        'pairs': len(pairs),
+        'updates': updates,
+        'simulated_seconds': simulated_seconds,
+        'wall_seconds': round(wall_seconds, 4),
+        'updates_per_wall_second': round(updates / wall_seconds, 1) if wall_seconds else 0.0,
+        # What the telemetry backend would ingest in real time
+        'backend_messages_per_second': round(updates / simulated_seconds, 2) if simulated_seconds else 0.0,
+        'blocked_ratio': round(blocked / updates, 4) if updates else 0.0,
+        'decision_latency_us': {
+            'p50': round(percentile(latencies, 50) * 1e6, 2),
+            'p90': round(percentile(latencies, 90) * 1e6, 2),
+            'p99': round(percentile(latencies, 99) * 1e6, 2),
+            'max': round(latencies[-1] * 1e6, 2) if latencies else 0.0,
+        },
+        'scenarios': dict(sorted(per_scenario.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AlcoWatch fleet simulator")
+    parser.add_argument('--pairs', type=int, default=1000, help="Watch-vehicle pairs (default: 1000)")
+    parser.add_argument('--mix', default='',
+                        help='Scenario weights, e.g. "1=0.6,2=0.2,3=0.2" (default: equal)')
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes (default: 1)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--speedup', type=float, default=None,
+                        help="Simulated seconds per real second (default: as fast as possible)")
+    parser.add_argument('--log-level', default='WARNING',
+                        help="DEBUG logs one JSON line per finished pair")
+    parser.add_argument('--output', help="Also write the summary JSON to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(message)s')
+    logger.setLevel(args.log_level.upper())
+
+    stats = run_fleet(args.pairs, parse_mix(args.mix), args.seed, args.workers, args.speedup)
+    text = json.dumps(stats, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Latency instrumentation for the AlcoWatch simulators
+Spans and timers per pipeline stage, recorded into HDR-style histograms
+(log-linear buckets, within 1/64 of the true value) and exported as JSON with
+p50/p90/p99/max per stage and a check against the latency budgets in
+docs/SYSTEM_SUMMARY.md
+"""
+
+import asyncio
+import functools
+import json
+import math
+import time
+from typing import Dict, Optional
+
+# Budgets from docs/SYSTEM_SUMMARY.md (Performance Targets > Latency), in ms
+DEFAULT_BUDGETS_MS = {
+    'estimate_bac': 50.0,  # BAC inference < 50ms
+    'transport': 100.0,  # BLE transmission < 100ms
+    'vehicle_decision': 1000.0,  # Ignition response < 1 second
+    'end_to_end': 2000.0,  # End-to-end latency < 2 seconds
+}
+
+SUB_BUCKET_BITS = 7  # 128 sub-buckets: values kept to within 1/64
+_SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+_HALF_COUNT = _SUB_BUCKET_COUNT >> 1
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (q in 0-100)"""
+    if not sorted_values:
+        return 0.0
+    # q * n first: q / 100 * n rounds 99.9% of 5000 up to rank 4996
+    rank = math.ceil(q * len(sorted_values) / 100)
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of nanosecond values
+
+    Values below 128 ns are exact; above that each power of two is split into
+    64 linear sub-buckets, so memory stays bounded however many values are
+    recorded. Percentiles report the highest value of the matching bucket.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def bucket_index(value: int) -> int:
+        if value < _SUB_BUCKET_COUNT:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return _HALF_COUNT * shift + (value >> shift)
+
+    @staticmethod
+    def bucket_upper(index: int) -> int:
+        """Highest value that maps to bucket `index`"""
+        if index < _SUB_BUCKET_COUNT:
+            return index
+        shift = index // _HALF_COUNT - 1
+        sub = index - _HALF_COUNT * shift
+        return ((sub + 1) << shift) - 1
+
+    def record(self, value_ns: int):
+        value_ns = max(0, int(value_ns))
+        index = self.bucket_index(value_ns)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value_ns
+        if self.min is None or value_ns < self.min:
+            self.min = value_ns
+        if value_ns > self.max:
+            self.max = value_ns
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> int:
+        """Value at percentile q (0-100), in ns"""
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(q * self.count / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self.bucket_upper(index), self.max)
+        return self.max
+
+    def summary(self, buckets: bool = False) -> dict:
+        """Statistics in µs; with buckets=True also [upper_us, count] pairs"""
+        out = {
+            'count': self.count,
+            'mean_us': round(self.total / self.count / 1000, 3) if self.count else 0.0,
+            'min_us': round((self.min or 0) / 1000, 3),
+            'p50_us': round(self.percentile(50) / 1000, 3),
+            'p90_us': round(self.percentile(90) / 1000, 3),
+            'p99_us': round(self.percentile(99) / 1000, 3),
+            'max_us': round(self.max / 1000, 3),
+        }
+        if buckets:
+            out['buckets'] = [
+                [round(self.bucket_upper(i) / 1000, 3), self.counts[i]] for i in sorted(self.counts)
+            ]
+        return out
+
+
+class _Span:
+    __slots__ = ('registry', 'name', 'start')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.record_ns(self.name, time.perf_counter_ns() - self.start)
+        return False
+
+
+class Instrumentation:
+    """Named stage histograms; use span() around code or timed() on functions"""
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.enabled = True
+
+    def record_ns(self, name: str, value_ns: int):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(value_ns)
+
+    def span(self, name: str) -> _Span:
+        """Context manager timing its body into stage `name`"""
+        return _Span(self, name)
+
+    def reset(self):
+        self.histograms.clear()
+
+    def report(self, budgets_ms: Optional[Dict[str, float]] = None, buckets: bool = False) -> dict:
+        """
+        Per-stage statistics plus budget verdicts
+
+        A stage meets its budget when its maximum observed latency is within
+        it; stages without samples are reported as not measured.
+        """
+        budgets_ms = DEFAULT_BUDGETS_MS if budgets_ms is None else budgets_ms
+        stages = {name: h.summary(buckets) for name, h in sorted(self.histograms.items())}
+        verdicts = {}
+        for name, budget in budgets_ms.items():
+            stage = stages.get(name)
+            if stage is None:
+                verdicts[name] = {'budget_ms': budget, 'measured': False}
+                continue
+            verdicts[name] = {
+                'budget_ms': budget,
+                'measured': True,
+                'max_ms': round(stage['max_us'] / 1000, 3),
+                'p99_ms': round(stage['p99_us'] / 1000, 3),
+                'within_budget': stage['max_us'] <= budget * 1000,
+            }
+        return {
+            'stages': stages,
+            'budgets': verdicts,
+            'all_within_budget': all(v.get('within_budget', True) for v in verdicts.values()),
+        }
+
+    def write_json(self, path: str, budgets_ms: Optional[Dict[str, float]] = None, buckets: bool = True) -> dict:
+        report = self.report(budgets_ms, buckets)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        return report
+
+    def format_table(self) -> str:
+        """Plain-text p50/p99/max table, one line per stage"""
+        lines = [f"{'stage':<20} {'count':>8} {'p50 µs':>10} {'p99 µs':>10} {'max µs':>10}"]
+        for name, h in sorted(self.histograms.items()):
+            s = h.summary()
+            lines.append(f"{name:<20} {s['count']:>8} {s['p50_us']:>10.1f} {s['p99_us']:>10.1f} {s['max_us']:>10.1f}")
+        return '\n'.join(lines)
+
+
+# Process-wide registry used by span() and timed()
+metrics = Instrumentation()
+
+
+def span(name: str) -> _Span:
+    """Time a block into the process-wide registry"""
+    return metrics.span(name)
+
+
+def timed(name: str):
+    """Decorator timing every call (sync or async) into the process-wide registry"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with metrics.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,187 @@
+"""
+Loopback BLE transport for AlcoWatch
+In-process stand-in for BleakClient: GATT writes go straight to a Python port
+of the vehicle firmware and its vehicle commands come back as notifications
+Lets BLESimulator scenarios run and be benchmarked without a Bluetooth adapter
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+from instrumentation import percentile
+from vehicle_firmware import (
+    BAC_STATUS_UUID,
+    COMMAND_NAMES,
+    SYSTEM_STATUS_UUID,
+    VEHICLE_CMD_UUID,
+    IgnitionState,
+    VehicleFirmware,
+    encode_vehicle_command,
+)
+
+
+class LoopbackCharacteristic:
+    """Minimal BleakGATTCharacteristic replacement passed to notify callbacks"""
+
+    def __init__(self, uuid: str):
+        self.uuid = uuid
+
+    def __repr__(self):
+        return f"LoopbackCharacteristic({self.uuid})"
+
+
+def _uuid(char_specifier) -> str:
+    """Accept a UUID string or a characteristic object, like bleak does"""
+    return str(getattr(char_specifier, 'uuid', char_specifier)).lower()
+
+
+class LoopbackGATTClient:
+    """
+    BleakClient-compatible transport backed by VehicleFirmware
+
+    Writes are queued and handled by a delivery task, so a write returns before
+    the firmware has processed it, as with write-without-response over the air;
+    pass response=True to wait for the firmware. Every BAC status packet is
+    timed from write_gatt_char() until the firmware has made its decision.
+
+    The firmware loop() (connection and BAC-update timeouts) runs on the
+    client's clock before each delivered packet and before disconnecting, so
+    a gap longer than BAC_UPDATE_TIMEOUT drops to CONNECTION_LOST as on the
+    vehicle; those transitions are counted in stats()['timeouts'].
+    """
+
+    WRITABLE = (BAC_STATUS_UUID, SYSTEM_STATUS_UUID, VEHICLE_CMD_UUID)
+
+    def __init__(self, firmware: VehicleFirmware = None, clock=None, address: str = "LOOPBACK"):
+        self.address = address
+        self.clock = clock
+        self.firmware = firmware or VehicleFirmware(
+            clock=clock.now if clock else time.monotonic
+        )
+        self.firmware.send_command = self._send_vehicle_command
+
+        self._connected = False
+        self._queue = None
+        self._delivery_task = None
+        self._notify_callbacks = {}
+
+        self.latencies_ns = []
+        self.packets = 0
+        self.bytes_written = 0
+        self.commands_sent = Counter()
+        self.timeouts = 0
+        self._first_write_ns = None
+        self._last_done_ns = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def connect(self, **kwargs) -> bool:
+        self._queue = asyncio.Queue()
+        self._delivery_task = asyncio.create_task(self._deliver())
+        self._connected = True
+        self.firmware.on_connected()
+        return True
+
+    async def disconnect(self) -> bool:
+        if not self._connected:
+            return True
+        await self._queue.join()  # Drain pending writes first
+        self.run_firmware_loop()
+        self._delivery_task.cancel()
+        try:
+            await self._delivery_task
+        except asyncio.CancelledError:
+            pass
+        self._connected = False
+        self._notify_callbacks.clear()  # Subscriptions end with the connection, as in bleak
+        self.firmware.on_disconnected()
+        return True
+
+    async def write_gatt_char(self, char_specifier, data, response: bool = False):
+        if not self._connected:
+            raise ConnectionError("Loopback transport is not connected")
+        uuid = _uuid(char_specifier)
+        if uuid not in self.WRITABLE:
+            raise ValueError(f"Characteristic {uuid} is not writable")
+
+        t_sent = time.perf_counter_ns()
+        if self._first_write_ns is None:
+            self._first_write_ns = t_sent
+        done = asyncio.get_running_loop().create_future() if response else None
+        self._queue.put_nowait((uuid, bytes(data), t_sent, done))
+        if done is not None:
+            await done
+        else:
+            await asyncio.sleep(0)  # Let the delivery task run, like the radio would
+
+    async def start_notify(self, char_specifier, callback, **kwargs):
+        self._notify_callbacks[_uuid(char_specifier)] = callback
+
+    async def stop_notify(self, char_specifier):
+        self._notify_callbacks.pop(_uuid(char_specifier), None)
+
+    def run_firmware_loop(self):
+        """One firmware loop() pass at the current clock time"""
+        was_lost = self.firmware.ignition_state is IgnitionState.CONNECTION_LOST
+        self.firmware.loop()
+        if not was_lost and self.firmware.ignition_state is IgnitionState.CONNECTION_LOST:
+            self.timeouts += 1
+
+    async def _deliver(self):
+        """Hand queued writes to the firmware's characteristic handlers"""
+        while True:
+            uuid, data, t_sent, done = await self._queue.get()
+            try:
+                # The firmware loop() runs between BLE.poll() calls; with a
+                # virtual clock this is where time has advanced since the last packet
+                self.run_firmware_loop()
+                # Only the BAC status characteristic has a written handler
+                if uuid == BAC_STATUS_UUID and self.firmware.on_bac_status_written(data):
+                    t_done = time.perf_counter_ns()
+                    self.latencies_ns.append(t_done - t_sent)
+                    self._last_done_ns = t_done
+                self.packets += 1
+                self.bytes_written += len(data)
+            finally:
+                self._queue.task_done()
+                if done is not None and not done.done():
+                    done.set_result(None)
+
+    def _send_vehicle_command(self, command_type: int):
+        """Firmware -> smartwatch path (sendVehicleCommand)"""
+        self.commands_sent[command_type] += 1
+        callback = self._notify_callbacks.get(VEHICLE_CMD_UUID)
+        if callback:
+            # millis() / 1000 like sendVehicleCommand(): seconds since boot
+            data = encode_vehicle_command(command_type, self.firmware.millis() // 1000)
+            callback(LoopbackCharacteristic(VEHICLE_CMD_UUID), bytearray(data))
+
+    def stats(self) -> dict:
+        """End-to-end latency (µs) and throughput of BAC status packets"""
+        latencies = sorted(self.latencies_ns)
+        elapsed_ns = (
+            self._last_done_ns - self._first_write_ns
+            if latencies else 0
+        )
+
+        def pct(q):
+            return round(percentile(latencies, q) / 1000, 2)
+
+        return {
+            'packets': self.packets,
+            'bac_packets': len(latencies),
+            'invalid_packets': self.firmware.invalid_packets,
+            'timeouts': self.timeouts,
+            'bytes_written': self.bytes_written,
+            'commands_sent': {
+                COMMAND_NAMES.get(cmd, f"UNKNOWN({cmd})"): n
+                for cmd, n in sorted(self.commands_sent.items())
+            },
+            'wall_seconds': round(elapsed_ns / 1e9, 6),
+            'packets_per_second': round(len(latencies) / (elapsed_ns / 1e9), 1) if elapsed_ns else 0.0,
+            'latency_us': {'p50': pct(50), 'p99': pct(99), 'max': pct(100)},
+            'final_state': self.firmware.ignition_state.name,
+        }
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+AlcoWatch Model-Backed Smartwatch
+Runs the trained BAC model on Widmark sensor streams from AlcoholDatasetLoader,
+normalized with the saved scaler_params.json, for many watches at once
+Inference runs on the TFLite model or on a NumPy port of the Keras weights
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+
+from instrumentation import metrics, span
+from vehicle_firmware import FLAG_SENSOR_QUALITY, FLAG_WATCH_WORN, decide_batch
+
+ML_MODEL_DIR = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'ml_model')
+)
+DEFAULT_MODEL_DIR = os.path.join(ML_MODEL_DIR, 'models')
+
+# Model input order, as in AlcoholDatasetLoader.create_sequences
+FEATURE_COLUMNS = [
+    'ppg_heart_rate', 'ppg_quality', 'eda_value',
+    'skin_temperature', 'ambient_temperature', 'humidity',
+]
+SEQUENCE_LENGTH = 10
+SAMPLE_INTERVAL = 30  # seconds between samples of the synthetic sessions
+
+TFLITE_MODEL = 'bac_model.tflite'
+KERAS_MODELS = ('bac_model_full.h5', 'bac_model_best.h5')
+
+
+def _import_ml_model():
+    if ML_MODEL_DIR not in sys.path:
+        sys.path.append(ML_MODEL_DIR)
+
+
+def load_scaler_params(path: Optional[str] = None):
+    """(mean, std) arrays in FEATURE_COLUMNS order from scaler_params.json"""
+    path = path or os.path.join(DEFAULT_MODEL_DIR, 'scaler_params.json')
+    with open(path) as f:
+        params = json.load(f)
+    mean = np.array([params['mean'][c] for c in FEATURE_COLUMNS], dtype=np.float32)
+    std = np.array([params['std'][c] for c in FEATURE_COLUMNS], dtype=np.float32)
+    return mean, np.where(std == 0, 1, std).astype(np.float32)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class NumpyBACKernel:
+    """
+    NumPy forward pass of BACEstimationModel (BiLSTM + attention + dense head)
+
+    Inference only: dropout is the identity. Input projections of all
+    timesteps are computed in one matmul, so only the recurrence loops over
+    the 10 steps.
+    """
+
+    backend = 'numpy'
+
+    def __init__(self, weights: dict):
+        self.weights = {k: np.asarray(v, dtype=np.float32) for k, v in weights.items()}
+
+    @classmethod
+    def from_keras(cls, model) -> 'NumpyBACKernel':
+        """Copy the weights of a built Keras BACEstimationModel"""
+        from tensorflow.keras import layers
+
+        weights = {}
+        for layer in model.layers:
+            if isinstance(layer, layers.Bidirectional):
+                (weights['fw_kernel'], weights['fw_recurrent'], weights['fw_bias'],
+                 weights['bw_kernel'], weights['bw_recurrent'], weights['bw_bias']) = layer.get_weights()
+            elif layer.name in ('attention_dense', 'dense_1', 'dense_2', 'bac_output'):
+                weights[f'{layer.name}_kernel'], weights[f'{layer.name}_bias'] = layer.get_weights()
+        missing = {'fw_kernel', 'attention_dense_kernel', 'bac_output_kernel'} - set(weights)
+        if missing:
+            raise ValueError(f"Model is not a BACEstimationModel (missing {', '.join(sorted(missing))})")
+        return cls(weights)
+
+    @classmethod
+    def from_h5(cls, path: str) -> 'NumpyBACKernel':
+        _import_ml_model()
+        from tensorflow import keras
+        from training.bac_estimation_model import CUSTOM_OBJECTS
+
+        model = keras.models.load_model(path, custom_objects=CUSTOM_OBJECTS, compile=False)
+        return cls.from_keras(model)
+
+    def _lstm(self, x, prefix, reverse=False):
+        w = self.weights
+        units = w[f'{prefix}_recurrent'].shape[0]
+        projected = x @ w[f'{prefix}_kernel'] + w[f'{prefix}_bias']  # [batch, steps, 4*units]
+        h = np.zeros((x.shape[0], units), dtype=np.float32)
+        c = np.zeros_like(h)
+        out = np.empty((x.shape[0], x.shape[1], units), dtype=np.float32)
+        steps = range(x.shape[1] - 1, -1, -1) if reverse else range(x.shape[1])
+        for t in steps:
+            z = projected[:, t] + h @ w[f'{prefix}_recurrent']
+            i, f, g, o = np.split(z, 4, axis=1)  # Keras gate order
+            c = _sigmoid(f) * c + _sigmoid(i) * np.tanh(g)
+            h = _sigmoid(o) * np.tanh(c)
+            out[:, t] = h
+        return out
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """BAC for normalized windows [batch, 10, 6] -> [batch]"""
+        w = self.weights
+        x = np.asarray(x, dtype=np.float32)
+        seq = np.concatenate([self._lstm(x, 'fw'), self._lstm(x, 'bw', reverse=True)], axis=2)
+
+        scores = np.tanh(seq @ w['attention_dense_kernel'] + w['attention_dense_bias'])[..., 0]
+        scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        attention = scores / scores.sum(axis=1, keepdims=True)
+        pooled = np.einsum('bt,btf->bf', attention, seq)
+
+        hidden = np.maximum(pooled @ w['dense_1_kernel'] + w['dense_1_bias'], 0)
+        hidden = np.maximum(hidden @ w['dense_2_kernel'] + w['dense_2_bias'], 0)
+        return (hidden @ w['bac_output_kernel'] + w['bac_output_bias'])[:, 0]
+
+
+class TFLiteBACModel:
+    """tf.lite.Interpreter with the input resized to the batch being run"""
+
+    backend = 'tflite'
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        import tensorflow as tf
+
+        self.interpreter = tf.lite.Interpreter(model_path=path, num_threads=num_threads)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = None
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        if x.shape[0] != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, list(x.shape))
+            self.interpreter.allocate_tensors()
+            self.batch_size = x.shape[0]
+        self.interpreter.set_tensor(self.input_index, x)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index)[:, 0]
+
+
+def load_bac_model(backend: str = 'auto', model_dir: str = DEFAULT_MODEL_DIR,
+                   num_threads: Optional[int] = None):
+    """
+    Load the trained BAC model for batch inference
+
+    backend='auto' prefers the TFLite model and falls back to the NumPy kernel
+    on the Keras weights. The repository ships no trained model; run
+    ml_model/training/train_model.py to produce one.
+    """
+    tflite_path = os.path.join(model_dir, TFLITE_MODEL)
+    if backend in ('auto', 'tflite') and os.path.exists(tflite_path):
+        return TFLiteBACModel(tflite_path, num_threads)
+    if backend in ('auto', 'numpy'):
+        for name in KERAS_MODELS:
+            path = os.path.join(model_dir, name)
+            if os.path.exists(path):
+                return NumpyBACKernel.from_h5(path)
+    wanted = {'auto': [TFLITE_MODEL, *KERAS_MODELS], 'tflite': [TFLITE_MODEL], 'numpy': list(KERAS_MODELS)}
+    if backend not in wanted:
+        raise ValueError(f"Unknown backend '{backend}' (choose auto, tflite or numpy)")
+    raise FileNotFoundError(
+        f"No trained BAC model in {model_dir} (looked for {', '.join(wanted[backend])}); "
+        f"train one with ml_model/training/train_model.py"
+    )
+
+
+class WidmarkWatchFleet:
+    """
+    Sensor streams of many simulated watches, windowed for batch inference
+
+    Each watch replays one AlcoholDatasetLoader session from a random offset,
+    one 30 s sample per step, wrapping around at the end of the session. At
+    step t every watch has a window of its last 10 normalized samples; the
+    ground truth is the session BAC at the next sample, as in training.
+    """
+
+    def __init__(self, n_watches: int, n_subjects: int = 10, seed: int = 0,
+                 scaler_path: Optional[str] = None, noise_level: float = 0.05):
+        _import_ml_model()
+        import tempfile
+        from data.dataset_loader import AlcoholDatasetLoader
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            loader = AlcoholDatasetLoader(data_dir=data_dir)
+            df = loader.create_synthetic_dataset(n_subjects=n_subjects, noise_level=noise_level)
+
+        sessions = [s.sort_values('timestamp') for _, s in df.groupby('session_id', sort=True)]
+        sessions = [s for s in sessions if len(s) > SEQUENCE_LENGTH]
+        self.lengths = np.array([len(s) for s in sessions])
+        longest = self.lengths.max()
+
+        # Padded [session, sample, feature] arrays; padding is never indexed
+        self.raw = np.zeros((len(sessions), longest, len(FEATURE_COLUMNS)), dtype=np.float32)
+        self.bac_true = np.zeros((len(sessions), longest), dtype=np.float32)
+        for i, s in enumerate(sessions):
+            self.raw[i, :len(s)] = s[FEATURE_COLUMNS].to_numpy(np.float32)
+            self.bac_true[i, :len(s)] = s['bac_true'].to_numpy(np.float32)
+        mean, std = load_scaler_params(scaler_path)
+        self.features = (self.raw - mean) / std
+
+        rng = np.random.default_rng(seed)
+        self.n_watches = n_watches
+        self.session = rng.integers(len(sessions), size=n_watches)
+        self.offset = rng.integers(1 << 30, size=n_watches)
+        self._window = np.arange(-SEQUENCE_LENGTH, 0)
+
+    def positions(self, step: int, watches=slice(None)) -> np.ndarray:
+        """Index of the sample each watch estimates at this step"""
+        usable = self.lengths[self.session[watches]] - SEQUENCE_LENGTH
+        return SEQUENCE_LENGTH + (self.offset[watches] + step) % usable
+
+    def windows(self, step: int, watches=slice(None)) -> np.ndarray:
+        """Normalized model input [watches, 10, 6]"""
+        sessions = self.session[watches]
+        idx = self.positions(step, watches)[:, None] + self._window
+        return self.features[sessions[:, None], idx]
+
+    def sensors(self, step: int, watches=slice(None)) -> np.ndarray:
+        """Latest raw sensor sample [watches, 6] (last sample of the window)"""
+        return self.raw[self.session[watches], self.positions(step, watches) - 1]
+
+    def truth(self, step: int, watches=slice(None)) -> np.ndarray:
+        return self.bac_true[self.session[watches], self.positions(step, watches)]
+
+
+def error_metrics(pred: np.ndarray, true: np.ndarray, limit: float = 0.08) -> dict:
+    """Regression errors plus the over-limit calls the vehicle would act on"""
+    err = pred - true
+    return {
+        'mae': round(float(np.abs(err).mean()), 5),
+        'rmse': round(float(np.sqrt((err ** 2).mean())), 5),
+        'bias': round(float(err.mean()), 5),
+        'false_over_limit': int(((pred > limit) & (true <= limit)).sum()),
+        'missed_over_limit': int(((pred <= limit) & (true > limit)).sum()),
+        'classification_accuracy': round(float(((pred > limit) == (true > limit)).mean()), 4),
+    }
+
+
+def run_load_test(model, fleet: WidmarkWatchFleet, steps: int, batch_size: int = 256) -> dict:
+    """
+    Estimate BAC for every watch at every step, batch_size watches per call
+
+    Each batch is timed into the 'estimate_bac' stage; the predictions go
+    through the vehicle decision rules so false blocks are counted as the
+    firmware would make them.
+    """
+    n = fleet.n_watches
+    preds = np.empty((steps, n), dtype=np.float32)
+    truth = np.empty((steps, n), dtype=np.float32)
+    wall_start = time.perf_counter()
+    for step in range(steps):
+        for start in range(0, n, batch_size):
+            watches = slice(start, min(n, start + batch_size))
+            x = fleet.windows(step, watches)
+            with span('estimate_bac'):
+                preds[step, watches] = model.predict(x)
+            truth[step, watches] = fleet.truth(step, watches)
+    wall_seconds = time.perf_counter() - wall_start
+
+    # Packets ordered by time then watch, one every SAMPLE_INTERVAL per watch
+    times_ms = np.repeat(np.arange(steps, dtype=np.int64) * SAMPLE_INTERVAL * 1000, n)
+    decisions = decide_batch(
+        times_ms, preds.ravel(), np.full(preds.size, FLAG_WATCH_WORN | FLAG_SENSOR_QUALITY),
+        vehicle_ids=np.tile(np.arange(n), steps), true_bac=truth.ravel(),
+    )
+    batch = metrics.histograms['estimate_bac'].summary()
+    return {
+        'backend': model.backend,
+        'watches': n,
+        'steps': steps,
+        'batch_size': batch_size,
+        'predictions': int(preds.size),
+        'wall_seconds': round(wall_seconds, 4),
+        'predictions_per_second': round(preds.size / wall_seconds, 1) if wall_seconds else 0.0,
+        'batch_latency_us': {k: batch[k] for k in ('count', 'p50_us', 'p99_us', 'max_us')},
+        'errors': error_metrics(preds.ravel().astype(np.float64), truth.ravel().astype(np.float64)),
+        'vehicle': decisions.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch BAC inference load test on Widmark sensor streams")
+    parser.add_argument('--watches', type=int, default=1000, help="Simulated watches (default: 1000)")
+    parser.add_argument('--steps', type=int, default=20, help="30 s samples per watch (default: 20)")
+    parser.add_argument('--batch-size', type=int, default=256, help="Watches per inference call (default: 256)")
+    parser.add_argument('--backend', choices=['auto', 'tflite', 'numpy'], default='auto')
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    parser.add_argument('--threads', type=int, default=None, help="TFLite interpreter threads")
+    parser.add_argument('--subjects', type=int, default=10, help="Synthetic subjects to draw sessions from")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Also write the results JSON to this file")
+    args = parser.parse_args()
+
+    model = load_bac_model(args.backend, args.model_dir, args.threads)
+    fleet = WidmarkWatchFleet(args.watches, args.subjects, args.seed,
+                              os.path.join(args.model_dir, 'scaler_params.json'))
+    stats = run_load_test(model, fleet, args.steps, args.batch_size)
+
+    text = json.dumps(stats, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == "__main__":
+    main()
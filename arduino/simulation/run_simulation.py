@@ -4,11 +4,17 @@ AlcoWatch Complete System Simulator
 Runs full end-to-end simulation without any hardware
 """
 
+import argparse
 import asyncio
+import heapq
+import itertools
 import time
 import sys
 from datetime import datetime
 
+from instrumentation import metrics, span, timed
+from vehicle_firmware import IgnitionState, VehicleFirmware, encode_bac_status
+
 # Color codes for terminal output
 class Colors:
     HEADER = '\033[95m'
@@ -20,45 +26,124 @@ class Colors:
     END = '\033[0m'
     BOLD = '\033[1m'
 
+class VirtualClock:
+    """
+    Discrete-event clock for headless runs
+
+    Scenario coroutines started through run() call `await clock.sleep(s)`
+    instead of asyncio.sleep. Once every one of them is asleep, simulated time
+    jumps straight to the earliest wake-up. With a speedup factor the jump also
+    waits the scaled real interval (60 = one simulated minute per second);
+    speedup=None runs as fast as possible.
+    """
+
+    def __init__(self, speedup=None, start=None):
+        self.speedup = speedup
+        self._now = time.time() if start is None else start
+        self._waiters = []  # heap of (wake_time, seq, future)
+        self._seq = itertools.count()
+        self._active = 0
+
+    def now(self):
+        """Current simulated time in seconds since the epoch"""
+        return self._now
+
+    async def sleep(self, seconds):
+        """Suspend the calling task for `seconds` of simulated time"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (self._now + max(0.0, seconds), next(self._seq), future))
+        await self._advance()
+        await future
+
+    async def run(self, *coros):
+        """Run coroutines concurrently on this clock and return their results"""
+        self._active += len(coros)
+        return await asyncio.gather(*(self._participant(c) for c in coros))
+
+    async def _participant(self, coro):
+        try:
+            return await coro
+        finally:
+            self._active -= 1
+            await self._advance()
+
+    async def _advance(self):
+        # Only the last task to go to sleep moves time forward
+        if not self._waiters or len(self._waiters) < self._active:
+            return
+        wake_time = self._waiters[0][0]
+        if self.speedup:
+            await asyncio.sleep((wake_time - self._now) / self.speedup)
+        self._now = wake_time
+        while self._waiters and self._waiters[0][0] <= wake_time:
+            _, _, future = heapq.heappop(self._waiters)
+            future.set_result(None)
+
+
 class VehicleSimulator:
     """Simulates Arduino vehicle control logic"""
 
-    def __init__(self):
-        self.ignition_state = "BLOCKED"
+    def __init__(self, clock=None, verbose=True):
         self.last_bac_update = None
-        self.override_active = False
-
+        self.clock = clock
+        self.verbose = verbose
+        # Decisions come from the firmware port; this class only renders them
+        self.firmware = VehicleFirmware(clock=self.now)
+        self.firmware.on_connected()
+
+    @property
+    def ignition_state(self):
+        """ALLOWED while the ignition relay is on, otherwise BLOCKED"""
+        return "ALLOWED" if self.firmware.ignition_enabled else "BLOCKED"
+
+    @property
+    def override_active(self):
+        """True while the firmware's emergency override holds the ignition on"""
+        return self.firmware.ignition_state == IgnitionState.OVERRIDE_ACTIVE
+
+    def log(self, message):
+        """Print vehicle output unless running quietly (fleet mode)"""
+        if self.verbose:
+            print(message)
+
+    def now(self):
+        """Wall-clock time, or simulated time when driven by a VirtualClock"""
+        return self.clock.now() if self.clock else time.time()
+
+    @timed('process_bac_update')
     def process_bac_update(self, bac_value, watch_worn, timestamp):
         """Process BAC update and decide ignition state"""
-        self.last_bac_update = time.time()
+        self.last_bac_update = self.now()
 
-        print(f"\n{Colors.CYAN}[VEHICLE MODULE]{Colors.END}")
-        print(f"  Received BAC: {Colors.BOLD}{bac_value:.3f} g/dL{Colors.END}")
-        print(f"  Watch worn: {watch_worn}")
-        print(f"  Timestamp: {datetime.fromtimestamp(timestamp/1000).strftime('%H:%M:%S')}")
+        self.log(f"\n{Colors.CYAN}[VEHICLE MODULE]{Colors.END}")
+        self.log(f"  Received BAC: {Colors.BOLD}{bac_value:.3f} g/dL{Colors.END}")
+        self.log(f"  Watch worn: {watch_worn}")
+        self.log(f"  Timestamp: {datetime.fromtimestamp(timestamp/1000).strftime('%H:%M:%S')}")
+
+        # Same packet the smartwatch sends, decided by the firmware logic
+        warnings = self.firmware.warnings
+        with span('packet_encode'):
+            packet = encode_bac_status(timestamp, bac_value, 0, 0, watch_worn)
+        with span('vehicle_decision'):
+            self.firmware.on_bac_status_written(packet)
 
-        # Decision logic
         if not watch_worn:
-            self.ignition_state = "BLOCKED"
             self.set_led("RED")
-            print(f"  {Colors.RED}⚠️  TAMPER DETECTED - Watch removed{Colors.END}")
-            print(f"  {Colors.RED}🔒 IGNITION: BLOCKED{Colors.END}")
-        elif bac_value > 0.08:
-            self.ignition_state = "BLOCKED"
+            self.log(f"  {Colors.RED}⚠️  TAMPER DETECTED - Watch removed{Colors.END}")
+            self.log(f"  {Colors.RED}🔒 IGNITION: BLOCKED{Colors.END}")
+        elif self.ignition_state == "BLOCKED":
             self.set_led("RED")
             self.sound_alarm()
-            print(f"  {Colors.RED}🚨 ALERT: BAC over legal limit (0.08 g/dL){Colors.END}")
-            print(f"  {Colors.RED}🔒 IGNITION: BLOCKED{Colors.END}")
-        elif bac_value > 0.06:
-            self.ignition_state = "ALLOWED"
+            self.log(f"  {Colors.RED}🚨 ALERT: BAC over legal limit (0.08 g/dL){Colors.END}")
+            self.log(f"  {Colors.RED}🔒 IGNITION: BLOCKED{Colors.END}")
+        elif self.firmware.warnings != warnings:
             self.set_led("GREEN")
-            print(f"  {Colors.YELLOW}⚠️  WARNING: BAC approaching limit{Colors.END}")
-            print(f"  {Colors.GREEN}✓ IGNITION: ALLOWED (with warning){Colors.END}")
+            self.log(f"  {Colors.YELLOW}⚠️  WARNING: BAC approaching limit{Colors.END}")
+            self.log(f"  {Colors.GREEN}✓ IGNITION: ALLOWED (with warning){Colors.END}")
         else:
-            self.ignition_state = "ALLOWED"
             self.set_led("GREEN")
-            print(f"  {Colors.GREEN}✓ BAC within safe limits{Colors.END}")
-            print(f"  {Colors.GREEN}✓ IGNITION: ALLOWED{Colors.END}")
+            self.log(f"  {Colors.GREEN}✓ BAC within safe limits{Colors.END}")
+            self.log(f"  {Colors.GREEN}✓ IGNITION: ALLOWED{Colors.END}")
 
     def set_led(self, color):
         """Simulate LED status"""
@@ -67,30 +152,51 @@ class VehicleSimulator:
             "GREEN": "🟢",
             "BLUE": "🔵"
         }
-        print(f"  LED: {led_symbols.get(color, '⚪')} {color}")
+        self.log(f"  LED: {led_symbols.get(color, '⚪')} {color}")
 
     def sound_alarm(self):
         """Simulate buzzer alarm"""
-        print(f"  🔊 BUZZER: ♪♪♪ Alarm sounding")
+        self.log(f"  🔊 BUZZER: ♪♪♪ Alarm sounding")
 
     def check_timeout(self):
         """Check for BAC update timeout"""
         if self.last_bac_update:
-            elapsed = time.time() - self.last_bac_update
-            if elapsed > 60:
-                self.ignition_state = "BLOCKED"
-                print(f"{Colors.RED}⚠️  CONNECTION TIMEOUT - No BAC update for 60s{Colors.END}")
-                print(f"{Colors.RED}🔒 IGNITION: AUTO-BLOCKED{Colors.END}")
+            was_lost = self.firmware.ignition_state == IgnitionState.CONNECTION_LOST
+            self.firmware.check_bac_timeout()
+            if self.firmware.ignition_state == IgnitionState.CONNECTION_LOST and not was_lost:
+                self.log(f"{Colors.RED}⚠️  CONNECTION TIMEOUT - No BAC update for 60s{Colors.END}")
+                self.log(f"{Colors.RED}🔒 IGNITION: AUTO-BLOCKED{Colors.END}")
 
 
 class SmartwatchSimulator:
-    """Simulates Wear OS smartwatch with sensors and AI model"""
+    """
+    Simulates Wear OS smartwatch with sensors and AI model
+
+    With a WidmarkWatchFleet (model_smartwatch.py) and a loaded BAC model the
+    watch replays that fleet's first sensor stream and runs the real model;
+    the scenario BAC is then only used for display.
+    """
 
-    def __init__(self):
+    def __init__(self, fleet=None, model=None):
         self.sensor_buffer = []
+        self.fleet = fleet
+        self.model = model
+        self.step = 0
 
+    @timed('collect_sensors')
     def collect_sensors(self):
         """Simulate sensor data collection"""
+        if self.fleet is not None:
+            hr, quality, eda, temp, ambient, humidity = self.fleet.sensors(self.step, slice(0, 1))[0].tolist()
+            return {
+                'ppg_hr': hr,
+                'ppg_quality': quality,
+                'eda': eda,
+                'temp': temp,
+                'ambient_temp': ambient,
+                'humidity': humidity
+            }
+
         import random
 
         # Simulate PPG (heart rate)
@@ -110,8 +216,22 @@ class SmartwatchSimulator:
             'humidity': 50.0
         }
 
+    @timed('estimate_bac')
     def estimate_bac(self, scenario_bac):
         """Simulate TFLite AI model inference"""
+        if self.model is not None:
+            watch = slice(0, 1)
+            estimated_bac = max(0.0, float(self.model.predict(self.fleet.windows(self.step, watch))[0]))
+            bac_true = float(self.fleet.truth(self.step, watch)[0])
+            quality = float(self.fleet.sensors(self.step, watch)[0, 1])
+            self.step += 1
+            return {
+                'bac': estimated_bac,
+                'bac_true': bac_true,
+                'confidence': quality,
+                'alert_level': self.get_alert_level(estimated_bac)
+            }
+
         # Add small random variation to simulate real model
         import random
         variation = random.uniform(-0.005, 0.005)
@@ -135,21 +255,75 @@ class SmartwatchSimulator:
             return 3  # CRITICAL
 
 
-async def run_simulation_scenario(scenario_name, scenario_data, vehicle, smartwatch):
-    """Run a single test scenario"""
-
-    print(f"\n{Colors.HEADER}{'='*70}{Colors.END}")
-    print(f"{Colors.HEADER}{Colors.BOLD}  SCENARIO: {scenario_name}{Colors.END}")
-    print(f"{Colors.HEADER}{'='*70}{Colors.END}")
+# Test scenarios: (name, [(step name, BAC g/dL, watch worn, duration s), ...])
+SCENARIOS = {
+    "1": ("Sober Driver Test", [
+        ("Baseline - Normal activity", 0.02, True, 30),
+        ("After exercise", 0.015, True, 20),
+        ("Resting", 0.01, True, 20),
+    ]),
+
+    "2": ("Intoxicated Driver Test", [
+        ("Initial state - Sober", 0.02, True, 20),
+        ("After 1 drink", 0.05, True, 20),
+        ("After 2 drinks", 0.09, True, 30),
+        ("Peak intoxication", 0.12, True, 20),
+    ]),
+
+    "3": ("Tamper Detection Test", [
+        ("Normal operation", 0.03, True, 20),
+        ("Watch removed (TAMPER)", 0.03, False, 30),
+        ("Watch worn again", 0.03, True, 20),
+    ]),
+
+    "4": ("Realistic Drinking Scenario", [
+        ("Baseline - Sober", 0.01, True, 15),
+        ("One drink consumed", 0.04, True, 15),
+        ("Two drinks consumed", 0.07, True, 15),
+        ("Three drinks - Over limit!", 0.10, True, 20),
+        ("Peak intoxication", 0.12, True, 15),
+        ("Metabolizing", 0.09, True, 15),
+        ("Sobering up", 0.06, True, 15),
+    ]),
+
+    "5": ("Safety Edge Cases", [
+        ("Normal - Safe", 0.03, True, 15),
+        ("Approaching limit", 0.075, True, 20),
+        ("Just over limit", 0.085, True, 20),
+        ("Critical level", 0.15, True, 20),
+    ]),
+}
+
+
+UPDATE_INTERVAL = 10  # seconds between BAC updates
+
+
+async def run_simulation_scenario(scenario_name, scenario_data, vehicle, smartwatch, latencies=None):
+    """
+    Run a single test scenario and return its update and blocked-update counts
+
+    Console output follows vehicle.verbose (off for fleet runs); when a
+    latencies list is given, each update's watch-to-decision time in seconds
+    is appended to it.
+    """
+    log = vehicle.log
+    log(f"\n{Colors.HEADER}{'='*70}{Colors.END}")
+    log(f"{Colors.HEADER}{Colors.BOLD}  SCENARIO: {scenario_name}{Colors.END}")
+    log(f"{Colors.HEADER}{'='*70}{Colors.END}")
+
+    sleep = vehicle.clock.sleep if vehicle.clock else asyncio.sleep
+    updates = blocked = 0
 
     for step_name, step_bac, watch_worn, duration in scenario_data:
-        print(f"\n{Colors.BLUE}► {step_name}{Colors.END}")
-        print(f"  Duration: {duration} seconds")
+        log(f"\n{Colors.BLUE}► {step_name}{Colors.END}")
+        log(f"  Duration: {duration} seconds")
 
-        start_time = time.time()
+        start_time = vehicle.now()
         update_count = 0
 
-        while time.time() - start_time < duration:
+        while vehicle.now() - start_time < duration:
+            cycle_start = time.perf_counter_ns()
+
             # Smartwatch: Collect sensors
             sensor_data = smartwatch.collect_sensors()
 
@@ -157,30 +331,85 @@ async def run_simulation_scenario(scenario_name, scenario_data, vehicle, smartwa
             bac_estimate = smartwatch.estimate_bac(step_bac)
 
             # Smartwatch: BLE transmission
-            print(f"\n{Colors.CYAN}[SMARTWATCH]{Colors.END}")
-            print(f"  Sensors: HR={sensor_data['ppg_hr']:.1f} bpm, "
-                  f"EDA={sensor_data['eda']:.2f} µS, Temp={sensor_data['temp']:.1f}°C")
-            print(f"  AI Model: BAC={bac_estimate['bac']:.3f} g/dL "
-                  f"(confidence: {bac_estimate['confidence']:.1%})")
-            print(f"  Alert Level: {['SAFE', 'WARNING', 'DANGER', 'CRITICAL'][bac_estimate['alert_level']]}")
+            if vehicle.verbose:
+                print(f"\n{Colors.CYAN}[SMARTWATCH]{Colors.END}")
+                print(f"  Sensors: HR={sensor_data['ppg_hr']:.1f} bpm, "
+                      f"EDA={sensor_data['eda']:.2f} µS, Temp={sensor_data['temp']:.1f}°C")
+                print(f"  AI Model: BAC={bac_estimate['bac']:.3f} g/dL "
+                      f"(confidence: {bac_estimate['confidence']:.1%})")
+                if 'bac_true' in bac_estimate:
+                    print(f"  Widmark BAC: {bac_estimate['bac_true']:.3f} g/dL "
+                          f"(error {bac_estimate['bac'] - bac_estimate['bac_true']:+.3f})")
+                print(f"  Alert Level: {['SAFE', 'WARNING', 'DANGER', 'CRITICAL'][bac_estimate['alert_level']]}")
 
             # Vehicle: Process BAC update
             vehicle.process_bac_update(
                 bac_estimate['bac'],
                 watch_worn,
-                int(time.time() * 1000)
+                int(vehicle.now() * 1000)
             )
+            cycle_ns = time.perf_counter_ns() - cycle_start
+            metrics.record_ns('end_to_end', cycle_ns)
+            if latencies is not None:
+                latencies.append(cycle_ns / 1e9)
 
             update_count += 1
+            blocked += vehicle.ignition_state == "BLOCKED"
 
             # Wait before next update (simulating 10-second intervals)
-            await asyncio.sleep(10)
+            await sleep(UPDATE_INTERVAL)
+            vehicle.check_timeout()
 
-        print(f"\n{Colors.BLUE}✓ Step complete: {update_count} BAC updates sent{Colors.END}")
+        updates += update_count
+        log(f"\n{Colors.BLUE}✓ Step complete: {update_count} BAC updates sent{Colors.END}")
 
+    return {'updates': updates, 'blocked': blocked}
 
-async def main():
+
+async def run_scenario(scenario_name, scenario_data, vehicle, smartwatch):
+    """Run a scenario in real time, or on the vehicle's virtual clock if it has one"""
+    coro = run_simulation_scenario(scenario_name, scenario_data, vehicle, smartwatch)
+    if vehicle.clock:
+        await vehicle.clock.run(coro)
+    else:
+        await coro
+
+
+def parse_args(argv=None):
+    """Command-line options; without --scenario the simulator runs interactively"""
+    parser = argparse.ArgumentParser(description="AlcoWatch complete system simulator")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS) + ['all'],
+                        help="Run this scenario headless (no prompts) on a simulated clock")
+    parser.add_argument('--speedup', type=float, default=1.0,
+                        help="Simulated seconds per real second in headless mode (default: 1)")
+    parser.add_argument('--fast', action='store_true',
+                        help="Headless mode as fast as possible (ignores --speedup)")
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help="Write per-stage latency histograms and budget verdicts to PATH")
+    parser.add_argument('--enforce-budgets', action='store_true',
+                        help="Exit with status 2 if any stage exceeds its latency budget")
+    parser.add_argument('--model', choices=['auto', 'tflite', 'numpy'],
+                        help="Run the trained BAC model on Widmark sensor streams instead of "
+                             "the scenario BAC plus noise (needs a model in ml_model/models)")
+    return parser.parse_args(argv)
+
+
+def report_metrics(args):
+    """Print the stage latency table; write/enforce budgets when requested"""
+    print(f"\n{Colors.CYAN}Stage latency:{Colors.END}")
+    print(metrics.format_table())
+    report = metrics.write_json(args.metrics_json) if args.metrics_json else metrics.report()
+    for stage, verdict in report['budgets'].items():
+        if verdict['measured'] and not verdict['within_budget']:
+            print(f"{Colors.RED}✗ {stage}: max {verdict['max_ms']} ms exceeds "
+                  f"budget {verdict['budget_ms']} ms{Colors.END}")
+    return report['all_within_budget']
+
+
+async def main(args=None):
     """Main simulation program"""
+    if args is None:
+        args = parse_args([])
 
     print(f"{Colors.HEADER}{Colors.BOLD}")
     print("=" * 70)
@@ -198,56 +427,31 @@ async def main():
     print()
 
     # Initialize simulators
-    vehicle = VehicleSimulator()
-    smartwatch = SmartwatchSimulator()
-
-    # Define test scenarios
-    scenarios = {
-        "1": ("Sober Driver Test", [
-            ("Baseline - Normal activity", 0.02, True, 30),
-            ("After exercise", 0.015, True, 20),
-            ("Resting", 0.01, True, 20),
-        ]),
-
-        "2": ("Intoxicated Driver Test", [
-            ("Initial state - Sober", 0.02, True, 20),
-            ("After 1 drink", 0.05, True, 20),
-            ("After 2 drinks", 0.09, True, 30),
-            ("Peak intoxication", 0.12, True, 20),
-        ]),
-
-        "3": ("Tamper Detection Test", [
-            ("Normal operation", 0.03, True, 20),
-            ("Watch removed (TAMPER)", 0.03, False, 30),
-            ("Watch worn again", 0.03, True, 20),
-        ]),
-
-        "4": ("Realistic Drinking Scenario", [
-            ("Baseline - Sober", 0.01, True, 15),
-            ("One drink consumed", 0.04, True, 15),
-            ("Two drinks consumed", 0.07, True, 15),
-            ("Three drinks - Over limit!", 0.10, True, 20),
-            ("Peak intoxication", 0.12, True, 15),
-            ("Metabolizing", 0.09, True, 15),
-            ("Sobering up", 0.06, True, 15),
-        ]),
-
-        "5": ("Safety Edge Cases", [
-            ("Normal - Safe", 0.03, True, 15),
-            ("Approaching limit", 0.075, True, 20),
-            ("Just over limit", 0.085, True, 20),
-            ("Critical level", 0.15, True, 20),
-        ]),
-    }
-
-    # Menu
-    print(f"{Colors.BOLD}Select Test Scenario:{Colors.END}\n")
-    for key, (name, _) in scenarios.items():
-        print(f"  {key}. {name}")
-    print(f"  6. Run ALL scenarios (demo mode)")
-    print(f"  q. Quit")
-
-    choice = input(f"\n{Colors.BOLD}Enter choice (1-6 or q): {Colors.END}").strip().lower()
+    clock = None
+    if args.scenario:
+        # Headless: simulated time, no prompts
+        clock = VirtualClock(speedup=None if args.fast else args.speedup)
+    vehicle = VehicleSimulator(clock)
+    if args.model:
+        from model_smartwatch import WidmarkWatchFleet, load_bac_model
+        smartwatch = SmartwatchSimulator(WidmarkWatchFleet(1), load_bac_model(args.model))
+    else:
+        smartwatch = SmartwatchSimulator()
+    scenarios = SCENARIOS
+
+    if clock:
+        choice = '6' if args.scenario == 'all' else args.scenario
+        print(f"Headless run: scenario {args.scenario}, "
+              f"speed-up {'max' if clock.speedup is None else f'{clock.speedup:g}x'}")
+    else:
+        # Menu
+        print(f"{Colors.BOLD}Select Test Scenario:{Colors.END}\n")
+        for key, (name, _) in scenarios.items():
+            print(f"  {key}. {name}")
+        print(f"  6. Run ALL scenarios (demo mode)")
+        print(f"  q. Quit")
+
+        choice = input(f"\n{Colors.BOLD}Enter choice (1-6 or q): {Colors.END}").strip().lower()
 
     if choice == 'q':
         print("\nExiting simulator.")
@@ -257,15 +461,15 @@ async def main():
         # Run all scenarios
         for key in sorted(scenarios.keys()):
             scenario_name, scenario_data = scenarios[key]
-            await run_simulation_scenario(scenario_name, scenario_data, vehicle, smartwatch)
+            await run_scenario(scenario_name, scenario_data, vehicle, smartwatch)
 
-            if key != '5':  # Not the last one
+            if key != '5' and not clock:  # Not the last one
                 print(f"\n{Colors.YELLOW}Press Enter to continue to next scenario...{Colors.END}")
                 input()
 
     elif choice in scenarios:
         scenario_name, scenario_data = scenarios[choice]
-        await run_simulation_scenario(scenario_name, scenario_data, vehicle, smartwatch)
+        await run_scenario(scenario_name, scenario_data, vehicle, smartwatch)
 
     else:
         print(f"{Colors.RED}Invalid choice{Colors.END}")
@@ -285,7 +489,7 @@ async def main():
     print(f"\n{Colors.CYAN}Final Vehicle State:{Colors.END}")
     print(f"  Ignition: {Colors.BOLD}{vehicle.ignition_state}{Colors.END}")
     if vehicle.last_bac_update:
-        elapsed = time.time() - vehicle.last_bac_update
+        elapsed = vehicle.now() - vehicle.last_bac_update
         print(f"  Last BAC update: {elapsed:.1f} seconds ago")
 
     print(f"\n{Colors.YELLOW}Next Steps:{Colors.END}")
@@ -296,11 +500,16 @@ async def main():
 
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(main(args))
+        if args.metrics_json or args.enforce_budgets:
+            if not report_metrics(args) and args.enforce_budgets:
+                sys.exit(2)
     except KeyboardInterrupt:
         print(f"\n\n{Colors.YELLOW}Simulation interrupted by user{Colors.END}")
     except Exception as e:
         print(f"\n{Colors.RED}Error: {e}{Colors.END}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
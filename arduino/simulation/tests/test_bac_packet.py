@@ -0,0 +1,150 @@
+import asyncio
+import math
+import os
+import struct
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import bac_packet
+from bac_packet import (
+    BAC_STATUS_SIZE,
+    FLAG_SENSOR_QUALITY,
+    FLAG_WATCH_WORN,
+    ISSUE_ALERT_RANGE,
+    ISSUE_BAC_NAN,
+    ISSUE_BAC_RANGE,
+    ISSUE_CONFIDENCE_RANGE,
+    ISSUE_FLAG_CONFLICT,
+    ISSUE_RESERVED_FLAGS,
+    ISSUE_TIMESTAMP_ORDER,
+    ISSUE_TIMESTAMP_RANGE,
+    decode,
+    decode_array,
+    encode,
+    encode_bac_status,
+    fuzz_packets,
+    iter_decode,
+    split_complete,
+    validate,
+)
+from ble_simulator import BLESimulator
+from vehicle_firmware import parse_bac_status
+
+NOW_MS = 1_700_000_000_000
+
+
+class CaptureTransport:
+    """BleakClient stand-in that records writes"""
+
+    address = "CAPTURE"
+    is_connected = True
+
+    def __init__(self):
+        self.writes = []
+
+    async def connect(self, **kwargs):
+        return True
+
+    async def start_notify(self, char_specifier, callback, **kwargs):
+        pass
+
+    async def write_gatt_char(self, char_specifier, data, response=False):
+        self.writes.append(bytes(data))
+
+
+class FixedClock:
+    def now(self):
+        return NOW_MS / 1000
+
+
+class TestEncoding:
+    def test_round_trip(self):
+        data = encode_bac_status(NOW_MS, 0.085, 2, 93, watch_worn=True, sensor_quality=False,
+                                 battery_low=True)
+        assert len(data) == BAC_STATUS_SIZE
+        timestamp, bac, alert, confidence, flags = decode(data)
+        assert (timestamp, alert, confidence) == (NOW_MS, 2, 93)
+        assert bac == pytest.approx(0.085)
+        assert flags == FLAG_WATCH_WORN | bac_packet.FLAG_BATTERY_LOW
+        status = parse_bac_status(data)
+        assert status.watch_worn and status.battery_low and not status.sensor_quality_ok
+
+    def test_single_bytes_are_unsigned(self):
+        # The old signed '<Qfbbb' packing rejected confidence bytes above 127
+        data = encode_bac_status(NOW_MS, 0.0, 255, 200)
+        assert decode(data)[2:4] == (255, 200)
+
+    def test_simulator_sends_the_shared_format(self):
+        transport = CaptureTransport()
+        simulator = BLESimulator(transport=transport, clock=FixedClock(), verbose=False)
+
+        async def send():
+            assert await simulator.connect()
+            await simulator.send_bac_status(0.05, 1, 95, watch_worn=True, sensor_quality=True)
+
+        asyncio.run(send())
+        assert transport.writes == [encode_bac_status(NOW_MS, 0.05, 1, 95, True, True, False)]
+
+    def test_array_and_tuple_decoders_agree(self):
+        packets = [encode(NOW_MS + i, 0.01 * i, i % 4, 90, FLAG_WATCH_WORN) for i in range(10)]
+        buffer = b''.join(packets) + b'\x00' * 7
+        complete, extra = split_complete(buffer)
+        assert (len(complete), extra) == (10 * BAC_STATUS_SIZE, 7)
+        array = decode_array(buffer)
+        tuples = list(iter_decode(buffer))
+        assert len(array) == len(tuples) == 10
+        np.testing.assert_array_equal(array['timestamp'], [t[0] for t in tuples])
+        np.testing.assert_array_equal(array['bac'], np.array([t[1] for t in tuples], dtype=np.float32))
+
+
+class TestValidate:
+    def test_clean_packets(self):
+        buffer = b''.join(encode(NOW_MS + 1000 * i, 0.02, 0, 90, FLAG_WATCH_WORN | FLAG_SENSOR_QUALITY)
+                          for i in range(5))
+        assert not validate(decode_array(buffer), now_ms=NOW_MS).any()
+
+    @pytest.mark.parametrize('fields, issue', [
+        ((NOW_MS // 1000, 0.02, 0, 90, FLAG_WATCH_WORN), ISSUE_TIMESTAMP_RANGE),
+        ((NOW_MS, math.nan, 0, 90, FLAG_WATCH_WORN), ISSUE_BAC_NAN),
+        ((NOW_MS, 0.9, 0, 90, FLAG_WATCH_WORN), ISSUE_BAC_RANGE),
+        ((NOW_MS, 0.02, 0, 90, 0x80 | FLAG_WATCH_WORN), ISSUE_RESERVED_FLAGS),
+        ((NOW_MS, 0.02, 0, 90, FLAG_SENSOR_QUALITY), ISSUE_FLAG_CONFLICT),
+        ((NOW_MS, 0.02, 7, 90, FLAG_WATCH_WORN), ISSUE_ALERT_RANGE),
+        ((NOW_MS, 0.02, 0, 150, FLAG_WATCH_WORN), ISSUE_CONFIDENCE_RANGE),
+    ])
+    def test_each_issue(self, fields, issue):
+        assert validate(decode_array(encode(*fields)), now_ms=NOW_MS)[0] == issue
+
+    def test_timestamp_order(self):
+        buffer = encode(NOW_MS, 0.02, 0, 90, FLAG_WATCH_WORN) + encode(NOW_MS - 1, 0.02, 0, 90, FLAG_WATCH_WORN)
+        assert list(validate(decode_array(buffer), now_ms=NOW_MS)) == [0, ISSUE_TIMESTAMP_ORDER]
+
+
+class TestFuzz:
+    @pytest.mark.parametrize('seed', range(3))
+    def test_decoders_agree_and_firmware_parses_every_packet(self, seed):
+        buffer = fuzz_packets(500, seed=seed, corrupt_ratio=0.5)
+        array = decode_array(buffer)
+        columns = list(zip(*iter_decode(buffer)))
+        for name, values in zip(('timestamp', 'bac', 'alert_level', 'confidence', 'flags'), columns):
+            expected = np.array(values, dtype=array[name].dtype)
+            np.testing.assert_array_equal(array[name], expected)
+        for offset in range(0, len(buffer), BAC_STATUS_SIZE):
+            status = parse_bac_status(buffer[offset:offset + BAC_STATUS_SIZE])
+            assert 0 <= status.alert_level <= 255 and 0 <= status.confidence <= 255
+
+    def test_uncorrupted_traffic_is_clean(self):
+        buffer = fuzz_packets(200, seed=1, corrupt_ratio=0.0)
+        assert not validate(decode_array(buffer), now_ms=NOW_MS + 10 ** 10).any()
+
+    def test_corruptions_are_flagged(self):
+        issues = validate(decode_array(fuzz_packets(1000, seed=2, corrupt_ratio=0.3)), now_ms=NOW_MS + 10 ** 10)
+        assert 0 < (issues != 0).sum() < 1000
+
+    def test_mutated_float_keeps_packet_size(self):
+        packet = bytearray(encode(NOW_MS, 0.02, 0, 90, FLAG_WATCH_WORN))
+        struct.pack_into('<f', packet, 8, math.inf)
+        assert validate(decode_array(bytes(packet)), now_ms=NOW_MS)[0] == ISSUE_BAC_NAN
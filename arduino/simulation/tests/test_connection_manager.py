@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from connection_manager import AddressCache, ConnectionManager
+from loopback_transport import LoopbackGATTClient
+from vehicle_firmware import BAC_STATUS_UUID, VEHICLE_CMD_UUID, encode_bac_status
+
+
+async def no_sleep(_):
+    pass
+
+
+def make_manager():
+    return ConnectionManager(client_factory=lambda address: LoopbackGATTClient(address=address),
+                             cache=AddressCache(), sleep=no_sleep)
+
+
+class TestNotifyAcrossReconnect:
+    def test_subscription_restored_after_reconnect(self):
+        async def run():
+            manager = make_manager()
+            client = manager.client('AA')
+            received = []
+            await client.connect()
+            await client.start_notify(VEHICLE_CMD_UUID, lambda char, data: received.append(bytes(data)))
+
+            await manager._links['AA'].client.disconnect()  # link drops
+            await client.write_gatt_char(BAC_STATUS_UUID, encode_bac_status(0, 0.12, 2, 90), response=True)
+            await manager.close()
+            return received, manager.stats()['AA']
+
+        received, stats = asyncio.run(run())
+        assert stats['connect_attempts'] == 2
+        assert received  # block-ignition command arrived over the new connection
+
+    def test_stop_notify_is_not_restored(self):
+        async def run():
+            manager = make_manager()
+            client = manager.client('AA')
+            received = []
+            await client.connect()
+            await client.start_notify(VEHICLE_CMD_UUID, lambda char, data: received.append(bytes(data)))
+            await client.stop_notify(VEHICLE_CMD_UUID)
+            await manager._links['AA'].client.disconnect()
+            await client.write_gatt_char(BAC_STATUS_UUID, encode_bac_status(0, 0.12, 2, 90), response=True)
+            await manager.close()
+            return received
+
+        assert asyncio.run(run()) == []
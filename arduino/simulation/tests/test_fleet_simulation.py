@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fleet_simulation import parse_mix, run_fleet
+from instrumentation import percentile
+
+
+class TestPercentile:
+    def test_nearest_rank_rounds_up(self):
+        # rank = ceil(q/100 * n): 2.5 -> 3rd value, 0.4 -> 1st value
+        assert percentile([1, 2, 3, 4], 62.5) == 3
+        assert percentile([1, 2, 3, 4], 10) == 1
+
+    def test_bounds(self):
+        values = list(range(1, 11))
+        assert percentile(values, 0) == 1
+        assert percentile(values, 90) == 9
+        assert percentile(values, 100) == 10
+        assert percentile([], 50) == 0.0
+
+
+def test_fleet_runs_scenarios_quietly(capsys):
+    stats = run_fleet(6, parse_mix(''), seed=1)
+    assert stats['pairs'] == 6
+    assert sum(s['pairs'] for s in stats['scenarios'].values()) == 6
+    assert stats['updates'] > 0
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,99 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from instrumentation import Instrumentation, LatencyHistogram, percentile
+
+QUANTILES = [0, 1, 25, 50, 90, 99, 99.9, 100]
+
+
+def histogram_of(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+class TestBuckets:
+    def test_every_value_is_within_a_64th_of_its_bucket_upper_bound(self):
+        rng = np.random.default_rng(0)
+        values = np.concatenate([np.arange(2048), rng.integers(0, 10 ** 12, 20000)])
+        for value in map(int, values):
+            upper = LatencyHistogram.bucket_upper(LatencyHistogram.bucket_index(value))
+            assert value <= upper <= value + value / 64, value
+
+    def test_small_values_are_exact(self):
+        for value in range(128):
+            assert LatencyHistogram.bucket_upper(LatencyHistogram.bucket_index(value)) == value
+
+    def test_buckets_are_contiguous(self):
+        index = LatencyHistogram.bucket_index
+        upper = LatencyHistogram.bucket_upper
+        for i in range(index(10 ** 9)):
+            assert index(upper(i)) == i
+            assert index(upper(i) + 1) == i + 1
+
+
+class TestPercentile:
+    def test_nearest_rank(self):
+        values = [1000, 2000, 3000, 4000, 5000]
+        assert [percentile(values, q) for q in (0, 20, 21, 50, 99, 100)] == [1000, 1000, 2000, 3000, 5000, 5000]
+        assert percentile([], 50) == 0.0
+        assert percentile(list(range(1, 5001)), 99.9) == 4995
+
+    @pytest.mark.parametrize('seed', range(3))
+    def test_histogram_matches_exact_within_bucket_error(self, seed):
+        rng = np.random.default_rng(seed)
+        # Latency-like: a log-normal body around 50 µs with a long tail
+        values = rng.lognormal(np.log(50_000), 1.0, 5000).astype(np.int64).tolist()
+        histogram = histogram_of(values)
+        exact = sorted(values)
+        for q in QUANTILES:
+            expected = percentile(exact, q)
+            assert expected <= histogram.percentile(q) <= expected * (1 + 1 / 64), q
+        assert histogram.percentile(100) == max(values)
+
+    def test_summary_is_in_microseconds(self):
+        summary = histogram_of([1000, 2000, 3000]).summary(buckets=True)
+        assert (summary['count'], summary['min_us'], summary['max_us'], summary['mean_us']) == (3, 1.0, 3.0, 2.0)
+        assert [count for _, count in summary['buckets']] == [1, 1, 1]
+        assert LatencyHistogram().summary()['p99_us'] == 0.0
+
+    def test_merge_equals_recording_everything(self):
+        rng = np.random.default_rng(3)
+        a, b = rng.integers(0, 10 ** 7, (2, 1000)).tolist()
+        merged = histogram_of(a)
+        merged.merge(histogram_of(b))
+        assert merged.summary(buckets=True) == histogram_of(a + b).summary(buckets=True)
+
+
+class TestBudgets:
+    def test_verdicts(self):
+        metrics = Instrumentation()
+        for value_ms in (10, 20, 49):
+            metrics.record_ns('estimate_bac', value_ms * 1_000_000)
+        metrics.record_ns('transport', 150 * 1_000_000)
+        report = metrics.report({'estimate_bac': 50.0, 'transport': 100.0, 'end_to_end': 2000.0})
+        budgets = report['budgets']
+        assert budgets['estimate_bac']['within_budget'] and budgets['estimate_bac']['max_ms'] == 49.0
+        assert not budgets['transport']['within_budget']
+        assert budgets['end_to_end'] == {'budget_ms': 2000.0, 'measured': False}
+        assert not report['all_within_budget']
+
+    def test_unmeasured_stages_do_not_fail(self):
+        metrics = Instrumentation()
+        metrics.record_ns('estimate_bac', 1_000_000)
+        assert metrics.report()['all_within_budget']
+
+    def test_disabled_records_nothing(self):
+        metrics = Instrumentation()
+        metrics.enabled = False
+        with metrics.span('estimate_bac'):
+            pass
+        metrics.enabled = True
+        with metrics.span('estimate_bac'):
+            pass
+        assert metrics.histograms['estimate_bac'].count == 1
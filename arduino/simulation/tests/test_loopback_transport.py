@@ -0,0 +1,48 @@
+import asyncio
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from loopback_transport import LoopbackGATTClient
+from trace_replay import TraceRecord, TraceReplayer, replay_loopback
+from vehicle_firmware import BAC_UPDATE_TIMEOUT, VEHICLE_CMD_UUID
+
+
+def records(timestamps, bac=0.01):
+    return [TraceRecord(t, bac, 90, 0, True, True, False) for t in timestamps]
+
+
+class TestFirmwareLoop:
+    def test_gap_longer_than_timeout_drops_connection(self):
+        gap = BAC_UPDATE_TIMEOUT / 1000 + 30
+        stats = asyncio.run(replay_loopback(records([0, 30, 30 + gap, 60 + gap])))
+        assert stats['vehicle']['timeouts'] == 1
+
+    def test_regular_updates_never_time_out(self):
+        stats = asyncio.run(replay_loopback(records(range(0, 600, 30))))
+        assert stats['vehicle']['timeouts'] == 0
+
+
+class TestStats:
+    def test_latency_percentiles_are_nearest_rank(self):
+        client = LoopbackGATTClient()
+        client.latencies_ns = [5000, 1000, 4000, 2000, 3000]
+        client._first_write_ns, client._last_done_ns = 0, 1
+        assert client.stats()['latency_us'] == {'p50': 3.0, 'p99': 5.0, 'max': 5.0}
+
+    def test_command_timestamp_is_seconds_since_boot(self):
+        clock = TraceReplayer()
+        clock.start(1.7e9)
+        client = LoopbackGATTClient(clock=clock)
+        received = []
+
+        async def run():
+            await client.start_notify(VEHICLE_CMD_UUID, lambda char, data: received.append(bytes(data)))
+            await client.connect()  # Firmware acknowledges the connection
+            clock.start(1.7e9 + 42)
+            client.firmware.activate_emergency_override()
+
+        asyncio.run(run())
+        assert [struct.unpack_from('<I', data, 6)[0] for data in received] == [0, 42]
@@ -0,0 +1,40 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from model_smartwatch import NumpyBACKernel, _import_ml_model
+
+tf = pytest.importorskip('tensorflow')
+_import_ml_model()
+from training.bac_estimation_model import BACEstimationModel
+
+
+def randomize(model, seed):
+    """Replace every weight, biases included (Keras initializes those to constants)"""
+    rng = np.random.default_rng(seed)
+    model.set_weights([rng.normal(0, 0.3, w.shape).astype(np.float32) for w in model.get_weights()])
+
+
+class TestNumpyKernelMatchesKeras:
+    @pytest.mark.parametrize('seed', [None, 1, 2])
+    def test_predictions(self, seed):
+        tf.keras.utils.set_random_seed(0)
+        keras_model = BACEstimationModel(sequence_length=10, n_features=6).build_model()
+        if seed is not None:
+            randomize(keras_model, seed)
+        kernel = NumpyBACKernel.from_keras(keras_model)
+        rng = np.random.default_rng(seed)
+        for batch in (1, 7, 64):
+            x = rng.normal(0, 1.5, (batch, 10, 6)).astype(np.float32)
+            expected = keras_model(x, training=False).numpy()[:, 0]
+            got = kernel.predict(x)
+            assert got.shape == (batch,)
+            np.testing.assert_allclose(got, expected, rtol=1e-4, atol=1e-5)
+
+    def test_rejects_other_models(self):
+        model = tf.keras.Sequential([tf.keras.Input((10, 6)), tf.keras.layers.Dense(1)])
+        with pytest.raises(ValueError, match='not a BACEstimationModel'):
+            NumpyBACKernel.from_keras(model)
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from trace_replay import TraceRecord, read_csv_trace, replay_loopback
+
+
+class TestReadCsvTrace:
+    def test_numeric_second_timestamps(self, tmp_path):
+        path = tmp_path / 'trace.csv'
+        path.write_text("timestamp,bac\n0.0,0.01\n30.0,0.09\n60.0,0.2\n")
+        records = list(read_csv_trace(str(path)))
+        assert [r.timestamp for r in records] == [0.0, 30.0, 60.0]
+        assert [r.alert_level for r in records] == [0, 2, 3]
+
+    def test_datetime_timestamps(self, tmp_path):
+        path = tmp_path / 'trace.csv'
+        path.write_text("timestamp,bac\n2024-01-01 00:00:00,0.0\n2024-01-01 00:00:30,0.0\n")
+        records = list(read_csv_trace(str(path)))
+        assert records[1].timestamp - records[0].timestamp == pytest.approx(30.0)
+
+    def test_conversion_is_per_chunk(self, tmp_path):
+        path = tmp_path / 'trace.csv'
+        rows = "".join(f"{30.0 * i},0.05\n" for i in range(5))
+        path.write_text("timestamp,bac\n" + rows)
+        records = list(read_csv_trace(str(path), chunksize=2))
+        assert [r.timestamp for r in records] == [0.0, 30.0, 60.0, 90.0, 120.0]
+
+
+class TestReplayLoopback:
+    @pytest.mark.parametrize('t0', [0.0, 100.0, 1.7e9])
+    def test_trace_start_time_does_not_time_out(self, t0):
+        records = [TraceRecord(t0 + 30.0 * i, 0.02, 90, 0, True, True, False) for i in range(20)]
+        stats = asyncio.run(replay_loopback(records))
+        assert stats['records'] == 20
+        assert stats['vehicle']['timeouts'] == 0
+
+    def test_empty_trace(self):
+        assert asyncio.run(replay_loopback([])) == {'records': 0}
+
+
+class TestFlags:
+    def test_string_flags_parsed(self, tmp_path):
+        path = tmp_path / 'trace.csv'
+        path.write_text("timestamp,bac,watch_worn,battery_low\n"
+                        "0,0.0,False,True\n30,0.0,True,false\n60,0.0,,0\n")
+        records = list(read_csv_trace(str(path)))
+        assert [r.watch_worn for r in records] == [False, True, True]
+        assert [r.battery_low for r in records] == [True, False, False]
+
+    def test_unknown_flag_string_rejected(self, tmp_path):
+        path = tmp_path / 'trace.csv'
+        path.write_text("timestamp,bac,watch_worn\n0,0.0,maybe\n")
+        with pytest.raises(ValueError):
+            list(read_csv_trace(str(path)))
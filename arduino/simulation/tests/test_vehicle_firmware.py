@@ -0,0 +1,128 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from vehicle_firmware import (
+    BAC_UPDATE_TIMEOUT,
+    FLAG_WATCH_WORN,
+    IgnitionState,
+    VehicleFirmware,
+    decide_batch,
+    encode_bac_status,
+)
+
+
+def run_firmware(times, bac, flags, overrides=()):
+    """
+    Drive one VehicleFirmware through a vehicle's packets and overrides
+
+    loop() is polled only where its outcome can change: at each packet, at the
+    first millisecond past the BAC timeout, and at each override and the
+    millisecond after it. Returns per-packet states, commands and warning
+    flags, the number of gaps that timed out and ms spent per state between
+    the first and last packet.
+    """
+    now = [int(times[0])]
+    firmware = VehicleFirmware()
+    firmware.millis = lambda: now[0]
+    sent = []
+    firmware.send_command = sent.append
+    firmware.on_connected()
+
+    packets = {int(t): i for i, t in enumerate(times)}
+    events = set(packets)
+    for start, end in zip(times[:-1], times[1:]):
+        if end > start + BAC_UPDATE_TIMEOUT + 1:
+            events.add(int(start) + BAC_UPDATE_TIMEOUT + 1)
+    for o in overrides:
+        events.update((int(o), int(o) + 1))
+    events = sorted(t for t in events if t <= times[-1])
+
+    states = np.zeros(len(times), dtype=np.int8)
+    commands = np.full(len(times), -1, dtype=np.int16)
+    warnings = np.zeros(len(times), dtype=bool)
+    state_ms = {s.name: 0 for s in IgnitionState}
+    timed_out_gaps = set()
+    gap = -1
+    for t in events:
+        state_ms[firmware.ignition_state.name] += t - now[0]
+        now[0] = t
+        if t in packets:
+            i = gap = packets[t]
+            n_sent, n_warnings = len(sent), firmware.warnings
+            # BLE.poll() runs before the loop() checks, so the packet comes first
+            assert firmware.on_bac_status_written(encode_bac_status(t, bac[i], 0, 90, flags[i]))
+            states[i] = firmware.ignition_state.value
+            commands[i] = sent[-1] if len(sent) > n_sent else -1
+            warnings[i] = firmware.warnings > n_warnings
+        firmware.loop()
+        if firmware.ignition_state is IgnitionState.CONNECTION_LOST:
+            timed_out_gaps.add(gap)
+        for _ in range(sum(o == t for o in overrides)):
+            firmware.activate_emergency_override()  # checkOverrideButton() runs last in loop()
+    return states, commands, warnings, len(timed_out_gaps), state_ms
+
+
+def random_vehicle(rng, n_packets, n_overrides):
+    """Packet times with short and over-timeout gaps (never within 1 ms of the timeout)"""
+    short = rng.integers(1, BAC_UPDATE_TIMEOUT + 1, n_packets - 1)
+    long = rng.integers(BAC_UPDATE_TIMEOUT + 2, 4 * BAC_UPDATE_TIMEOUT, n_packets - 1)
+    gaps = np.where(rng.random(n_packets - 1) < 0.2, long, short)
+    times = np.concatenate([[0], np.cumsum(gaps)]) + int(rng.integers(0, 10 ** 6))
+    bac = rng.uniform(0.0, 0.15, n_packets).astype(np.float32)
+    flags = np.where(rng.random(n_packets) < 0.9, FLAG_WATCH_WORN, 0).astype(np.uint8)
+    overrides = np.sort(rng.integers(times[0], times[-1], n_overrides))
+    return times, bac, flags, overrides
+
+
+class TestDecideBatchMatchesFirmware:
+    @pytest.mark.parametrize('seed', range(5))
+    def test_random_sequences(self, seed):
+        rng = np.random.default_rng(seed)
+        vehicles = [random_vehicle(rng, 60, 8) for _ in range(3)]
+
+        vehicle_ids = np.concatenate([np.full(len(v[0]), i) for i, v in enumerate(vehicles)])
+        order = rng.permutation(len(vehicle_ids))  # batch input need not be sorted
+        times = np.concatenate([v[0] for v in vehicles])[order]
+        bac = np.concatenate([v[1] for v in vehicles])[order]
+        flags = np.concatenate([v[2] for v in vehicles])[order]
+        override_ms = np.concatenate([v[3] for v in vehicles])
+        override_ids = np.concatenate([np.full(len(v[3]), i) for i, v in enumerate(vehicles)])
+        batch = decide_batch(times, bac, flags, vehicle_ids[order], override_ms, override_ids)
+
+        expected_timeouts = 0
+        expected_ms = {s.name: 0 for s in IgnitionState}
+        for vehicle, (v_times, v_bac, v_flags, v_overrides) in enumerate(vehicles):
+            states, commands, warnings, timeouts, state_ms = run_firmware(
+                v_times, v_bac, v_flags, v_overrides)
+            mine = vehicle_ids[order] == vehicle
+            # Packets of one vehicle keep their relative order through the permutation
+            rank = np.argsort(times[mine], kind='stable')
+            np.testing.assert_array_equal(batch.states[mine][rank], states)
+            np.testing.assert_array_equal(batch.commands[mine][rank], commands)
+            np.testing.assert_array_equal(batch.warnings[mine][rank], warnings)
+            expected_timeouts += timeouts
+            for name, ms in state_ms.items():
+                expected_ms[name] += ms
+
+        assert batch.timeouts == expected_timeouts
+        assert sum(batch.state_ms.values()) == sum(expected_ms.values())
+        # Known approximation: decide_batch starts CONNECTION_LOST exactly at the
+        # timeout, the firmware 1 ms later (millis() - last > BAC_UPDATE_TIMEOUT),
+        # and an override after the timeout lasts 0 ms instead of one loop() pass
+        tolerance = batch.timeouts + batch.overrides
+        for name in expected_ms:
+            assert abs(batch.state_ms[name] - expected_ms[name]) <= tolerance, name
+
+    def test_timeout_boundary_is_one_ms_early(self):
+        # A packet 1 ms after the timeout reaches the firmware before its check
+        times = [0, BAC_UPDATE_TIMEOUT + 1]
+        bac = np.array([0.01, 0.01], dtype=np.float32)
+        flags = [FLAG_WATCH_WORN, FLAG_WATCH_WORN]
+        batch = decide_batch(times, bac, flags)
+        _, _, _, timeouts, state_ms = run_firmware(times, bac, flags)
+        assert (batch.timeouts, batch.state_ms['CONNECTION_LOST']) == (1, 1)
+        assert (timeouts, state_ms['CONNECTION_LOST']) == (0, 0)
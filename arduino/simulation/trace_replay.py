@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+AlcoWatch Trace Replay
+Streams recorded or synthetic BAC sessions through BLESimulator.send_bac_status,
+paced by the trace timestamps with a time-warp factor
+Sources: CSV, Parquet or AlcoholDatasetLoader synthetic sessions
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import sys
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+# Same thresholds as SmartwatchSimulator.get_alert_level: SAFE < 0.05 <= WARNING < 0.08 <= DANGER < 0.15 <= CRITICAL
+ALERT_THRESHOLDS = np.array([0.05, 0.08, 0.15])
+
+DEFAULT_CONFIDENCE = 90
+SENSOR_QUALITY_MIN = 0.6  # ppg_quality below this clears the sensor-quality flag
+
+
+class TraceRecord(NamedTuple):
+    """One BAC status update of a trace"""
+    timestamp: float  # seconds
+    bac: float  # g/dL
+    confidence: int  # 0-100
+    alert_level: int
+    watch_worn: bool
+    sensor_quality: bool
+    battery_low: bool
+
+
+def _first_present(columns, names):
+    for name in names:
+        if name in columns:
+            return name
+    return None
+
+
+def _to_seconds(values) -> np.ndarray:
+    """Timestamp column (datetime-like or numeric seconds) as float seconds"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64) / 1e9
+    if values.dtype == object:
+        import pandas as pd
+        return pd.to_datetime(values).to_numpy('datetime64[ns]').astype(np.int64) / 1e9
+    return values.astype(np.float64)
+
+
+_TRUE_STRINGS = {'true', 't', 'yes', 'y', '1'}
+_FALSE_STRINGS = {'false', 'f', 'no', 'n', '0'}
+
+
+def _to_flags(values, default: bool) -> np.ndarray:
+    """Boolean flag column: bools, 0/1 numbers or strings like "True"/"false"; missing -> default"""
+    values = np.asarray(values)
+    if values.dtype == bool:
+        return values
+    if values.dtype != object:
+        numeric = values.astype(np.float64)
+        return np.where(np.isnan(numeric), default, numeric != 0)
+    flags = np.full(len(values), default, dtype=bool)
+    for i, value in enumerate(values):
+        if isinstance(value, (bool, np.bool_, int, float, np.number)):
+            if not np.isnan(value):
+                flags[i] = bool(value)
+        elif value is not None:
+            text = str(value).strip().lower()
+            if text in _TRUE_STRINGS:
+                flags[i] = True
+            elif text in _FALSE_STRINGS:
+                flags[i] = False
+            elif text:
+                raise ValueError(f"Cannot parse flag value {value!r}")
+    return flags
+
+
+def frame_records(df, timestamp_column: str = 'timestamp') -> Iterator[TraceRecord]:
+    """
+    Convert one DataFrame chunk into TraceRecords
+
+    The BAC column is the first of bac / bac_value / bac_true. Confidence comes
+    from a confidence column (0-1 or 0-100) or ppg_quality, and the flag columns
+    watch_worn / sensor_quality / battery_low are optional.
+    """
+    n = len(df)
+    columns = df.columns
+    bac_column = _first_present(columns, ('bac', 'bac_value', 'bac_true'))
+    if bac_column is None:
+        raise ValueError("Trace has no BAC column (expected bac, bac_value or bac_true)")
+    if timestamp_column not in columns:
+        raise ValueError(f"Trace has no timestamp column '{timestamp_column}'")
+
+    timestamps = _to_seconds(df[timestamp_column])
+    bac = df[bac_column].to_numpy(np.float64)
+    quality = df['ppg_quality'].to_numpy(np.float64) if 'ppg_quality' in columns else None
+
+    conf_column = _first_present(columns, ('confidence',))
+    if conf_column is not None:
+        confidence = df[conf_column].to_numpy(np.float64)
+    elif quality is not None:
+        confidence = quality
+    else:
+        confidence = np.full(n, DEFAULT_CONFIDENCE, dtype=np.float64)
+    if n and np.nanmax(confidence) <= 1.0:
+        confidence = confidence * 100
+    confidence = np.clip(np.nan_to_num(confidence), 0, 100).astype(np.int64)
+
+    alert_level = np.searchsorted(ALERT_THRESHOLDS, bac, side='right')
+
+    def flag(name, default):
+        if name in columns:
+            return _to_flags(df[name].to_numpy(), default)
+        return np.full(n, default, dtype=bool)
+
+    watch_worn = flag('watch_worn', True)
+    battery_low = flag('battery_low', False)
+    if 'sensor_quality' in columns or quality is None:
+        sensor_quality = flag('sensor_quality', True)
+    else:
+        sensor_quality = quality >= SENSOR_QUALITY_MIN
+
+    rows = zip(
+        timestamps.tolist(), bac.tolist(), confidence.tolist(), alert_level.tolist(),
+        watch_worn.tolist(), sensor_quality.tolist(), battery_low.tolist(),
+    )
+    return itertools.starmap(TraceRecord, rows)
+
+
+def read_csv_trace(path: str, chunksize: int = 10000, timestamp_column: str = 'timestamp') -> Iterator[TraceRecord]:
+    """
+    Stream a CSV trace in chunks (requires pandas)
+
+    Timestamps may be numeric seconds or datetime strings; _to_seconds picks
+    the conversion per chunk from the parsed column dtype.
+    """
+    import pandas as pd
+
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield from frame_records(chunk, timestamp_column)
+
+
+def read_parquet_trace(path: str, batch_size: int = 10000, timestamp_column: str = 'timestamp') -> Iterator[TraceRecord]:
+    """Stream a Parquet trace batch by batch (requires pyarrow)"""
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield from frame_records(batch.to_pandas(), timestamp_column)
+
+
+def synthetic_sessions(n_subjects: int = 5, sessions_per_subject: int = 5):
+    """
+    Yield (session_id, profile, records) for AlcoholDatasetLoader sessions
+
+    Uses the Widmark synthetic generator from ml_model/data (30 s samples,
+    4-8 hour sessions).
+    """
+    ml_model_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'ml_model')
+    sys.path.append(os.path.normpath(ml_model_dir))
+    from data.dataset_loader import AlcoholDatasetLoader
+
+    import tempfile
+    with tempfile.TemporaryDirectory() as data_dir:
+        loader = AlcoholDatasetLoader(data_dir=data_dir)
+        # Loader progress goes to stderr: stdout carries the results JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            df = loader.create_synthetic_dataset(n_subjects=n_subjects, sessions_per_subject=sessions_per_subject)
+
+    for session_id, session in df.groupby('session_id', sort=True):
+        yield int(session_id), session['profile'].iat[0], frame_records(session)
+
+
+class TraceReplayer:
+    """
+    Paces trace records into BLESimulator.send_bac_status
+
+    A producer task releases each record when its timestamp comes due
+    (trace seconds / time_warp; time_warp=None means no waiting) into a bounded
+    queue drained by a sender task. When the transport cannot keep up the queue
+    fills and the producer blocks instead of buffering without limit.
+
+    The replayer also acts as the clock: pass it as `clock` to BLESimulator and
+    LoopbackGATTClient so packet timestamps and firmware timing follow the trace.
+    Call start() with the first record's timestamp before building them, so the
+    firmware boots at trace time rather than at 0.
+    """
+
+    def __init__(self, time_warp: Optional[float] = None, queue_size: int = 256):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.time_warp = time_warp
+        self.queue_size = queue_size
+        self._trace_now = 0.0
+
+    def now(self) -> float:
+        """Trace timestamp of the packet being sent"""
+        return self._trace_now
+
+    def start(self, t0: float):
+        """Set the clock to the trace start before anything reads it"""
+        self._trace_now = t0
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds / self.time_warp if self.time_warp else 0)
+
+    async def replay(self, simulator, records: Iterable[TraceRecord]) -> dict:
+        """Send every record through simulator; returns pacing statistics"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        records = iter(records)
+        first = next(records, None)
+        if first is None:
+            return {'records': 0}
+
+        t0 = first.timestamp
+        self.start(t0)
+        wall_start = loop.time()
+        stats = {'records': 0, 'stalls': 0, 'max_queue_depth': 0, 'max_lag_ms': 0.0}
+
+        def due(record):
+            return wall_start + (record.timestamp - t0) / self.time_warp
+
+        async def produce():
+            for record in itertools.chain([first], records):
+                if self.time_warp:
+                    delay = due(record) - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if queue.full():
+                    stats['stalls'] += 1  # Back-pressure: sender is behind
+                await queue.put(record)
+                stats['max_queue_depth'] = max(stats['max_queue_depth'], queue.qsize())
+            await queue.put(None)
+
+        async def send():
+            while True:
+                record = await queue.get()
+                if record is None:
+                    return
+                self._trace_now = record.timestamp
+                if self.time_warp:
+                    lag = (loop.time() - due(record)) * 1000
+                    stats['max_lag_ms'] = max(stats['max_lag_ms'], lag)
+                await simulator.send_bac_status(
+                    bac_value=record.bac,
+                    alert_level=record.alert_level,
+                    confidence=record.confidence,
+                    watch_worn=record.watch_worn,
+                    sensor_quality=record.sensor_quality,
+                    battery_low=record.battery_low,
+                )
+                stats['records'] += 1
+
+        await asyncio.gather(produce(), send())
+
+        wall_seconds = loop.time() - wall_start
+        trace_seconds = self._trace_now - t0
+        stats.update({
+            'trace_seconds': round(trace_seconds, 3),
+            'wall_seconds': round(wall_seconds, 4),
+            'effective_warp': round(trace_seconds / wall_seconds, 1) if wall_seconds else 0.0,
+            'max_lag_ms': round(stats['max_lag_ms'], 3),
+        })
+        return stats
+
+
+async def replay_loopback(records: Iterable[TraceRecord], time_warp: Optional[float] = None,
+                          queue_size: int = 256) -> dict:
+    """Replay records against the in-process firmware port (no Bluetooth needed)"""
+    from ble_simulator import BLESimulator
+    from loopback_transport import LoopbackGATTClient
+
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return {'records': 0}
+    replayer = TraceReplayer(time_warp, queue_size)
+    replayer.start(first.timestamp)  # Boot the firmware at trace time
+    transport = LoopbackGATTClient(clock=replayer)
+    simulator = BLESimulator(transport=transport, clock=replayer, verbose=False)
+
+    if not await simulator.connect():
+        raise ConnectionError("Loopback connect failed")
+    try:
+        stats = await replayer.replay(simulator, itertools.chain([first], records))
+    finally:
+        await simulator.disconnect()
+    stats['vehicle'] = transport.stats()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay BAC traces against the vehicle logic")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv', help="CSV trace with a timestamp column")
+    source.add_argument('--parquet', help="Parquet trace with a timestamp column")
+    source.add_argument('--synthetic', type=int, metavar='SUBJECTS',
+                        help="Generate AlcoholDatasetLoader sessions for this many subjects")
+    parser.add_argument('--sessions', type=int, default=None,
+                        help="Replay only the first N synthetic sessions")
+    parser.add_argument('--timestamp-column', default='timestamp')
+    parser.add_argument('--time-warp', type=float, default=None,
+                        help="Trace seconds per real second (default: as fast as possible)")
+    parser.add_argument('--queue-size', type=int, default=256, help="Send queue bound (default: 256)")
+    parser.add_argument('--output', help="Also write the results JSON to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        sessions = itertools.islice(synthetic_sessions(args.synthetic), args.sessions)
+    elif args.csv:
+        sessions = [(args.csv, None, read_csv_trace(args.csv, timestamp_column=args.timestamp_column))]
+    else:
+        sessions = [(args.parquet, None, read_parquet_trace(args.parquet, timestamp_column=args.timestamp_column))]
+
+    results = []
+    for session_id, profile, records in sessions:
+        stats = asyncio.run(replay_loopback(records, args.time_warp, args.queue_size))
+        results.append({'session': session_id, 'profile': profile, **stats})
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Python port of the AlcoWatch vehicle firmware ignition logic
+Mirrors parseBACStatus / processBACData, the connection and BAC-update timeouts
+and the emergency override from
+arduino/firmware/alcowatch_vehicle_control/alcowatch_vehicle_control.ino
+so simulator packets can be checked against the real ignition logic without hardware
+decide_batch() applies the same rules to whole packet arrays with NumPy
+"""
+
+import struct
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Optional
+
+import numpy as np
+
+from bac_packet import (  # encode_bac_status is re-exported for the simulators
+    BAC_STATUS_STRUCT, FLAG_BATTERY_LOW, FLAG_SENSOR_QUALITY, FLAG_WATCH_WORN, encode_bac_status,
+)
+
+# BLE Service and Characteristic UUIDs
+SERVICE_UUID = "12345678-1234-5678-1234-56789abcdef0"
+BAC_STATUS_UUID = "12345678-1234-5678-1234-56789abcdef1"
+VEHICLE_CMD_UUID = "12345678-1234-5678-1234-56789abcdef2"
+SYSTEM_STATUS_UUID = "12345678-1234-5678-1234-56789abcdef3"
+
+# Firmware configuration (#define values)
+LEGAL_BAC_LIMIT = 0.08  # g/dL
+BAC_STATUS_LENGTH = 20  # bytes
+BAC_UPDATE_TIMEOUT = 60000  # ms
+CONNECTION_TIMEOUT = 10000  # ms
+OVERRIDE_HOLD_TIME = 5000  # ms the override button must be held
+
+# Vehicle command codes (sendVehicleCommand)
+CMD_ACKNOWLEDGED = 0x00
+CMD_BLOCK_IGNITION = 0x01
+CMD_REQUEST_VERIFICATION = 0x02
+CMD_EMERGENCY_OVERRIDE = 0x04
+
+COMMAND_NAMES = {
+    CMD_ACKNOWLEDGED: "ALLOW_IGNITION",
+    CMD_BLOCK_IGNITION: "BLOCK_IGNITION",
+    CMD_REQUEST_VERIFICATION: "REQUEST_VERIFICATION",
+    0x03: "OVERRIDE_REQUEST",
+    CMD_EMERGENCY_OVERRIDE: "EMERGENCY_OVERRIDE",
+}
+
+
+
+class IgnitionState(Enum):
+    """Firmware IgnitionState enum"""
+    IGNITION_ALLOWED = 0
+    IGNITION_BLOCKED = 1
+    WAITING_FOR_DATA = 2
+    CONNECTION_LOST = 3
+    OVERRIDE_ACTIVE = 4
+
+
+@dataclass
+class BACStatus:
+    """Firmware BACStatus struct"""
+    timestamp: int
+    bac_value: float
+    alert_level: int
+    confidence: int
+    flags: int
+    watch_worn: bool
+    sensor_quality_ok: bool
+    battery_low: bool
+
+
+def parse_bac_status(data) -> BACStatus:
+    """
+    Decode a 20-byte BAC status packet like parseBACStatus()
+
+    Bytes are read unsigned, as the firmware stores them in `byte` fields.
+    The firmware keeps the timestamp in an `unsigned long` (32-bit on the target
+    boards); the full 64-bit value is kept here.
+    """
+    timestamp, bac_value, alert_level, confidence, flags = BAC_STATUS_STRUCT.unpack_from(data)
+    return BACStatus(
+        timestamp=timestamp,
+        bac_value=bac_value,
+        alert_level=alert_level,
+        confidence=confidence,
+        flags=flags,
+        watch_worn=(flags & FLAG_WATCH_WORN) != 0,
+        sensor_quality_ok=(flags & FLAG_SENSOR_QUALITY) != 0,
+        battery_low=(flags & FLAG_BATTERY_LOW) != 0,
+    )
+
+
+class VehicleFirmware:
+    """
+    Print-free model of the vehicle module's state machine
+
+    send_command(command_type) is called wherever the firmware calls
+    sendVehicleCommand(); clock() returns seconds and drives millis(), counted
+    from construction (boot). loop() runs the periodic checks of the firmware
+    loop(): connection timeout, BAC-update timeout and override button.
+
+    Firmware quirks are kept: NaN BAC compares as not over the limit, and the
+    override stays active until the next BAC packet or timeout (the 5-minute
+    expiry in the firmware comment is not implemented there).
+    """
+
+    def __init__(self, send_command=None, clock=time.monotonic):
+        self.send_command = send_command
+        self.clock = clock
+        self._boot = clock()
+        self.ignition_state = IgnitionState.WAITING_FOR_DATA
+        self.is_connected = False
+        self.current_bac = None
+        self.last_bac_update = 0  # ms
+        self.last_connection_time = 0  # ms
+        self.override_attempts = 0
+        self.override_start_time = 0  # ms
+        self.invalid_packets = 0
+        self.alarms = 0
+        self.warnings = 0
+        self._button_press_time = 0
+        self._button_was_pressed = False
+
+    def millis(self) -> int:
+        return int((self.clock() - self._boot) * 1000)
+
+    def set_ignition_state(self, new_state: IgnitionState):
+        """setIgnitionState(): relay follows ALLOWED / OVERRIDE_ACTIVE"""
+        self.ignition_state = new_state
+
+    @property
+    def ignition_enabled(self) -> bool:
+        """Relay output (HIGH only when allowed or overridden)"""
+        return self.ignition_state in (IgnitionState.IGNITION_ALLOWED, IgnitionState.OVERRIDE_ACTIVE)
+
+    def _send(self, command_type: int):
+        if self.send_command:
+            self.send_command(command_type)
+
+    def on_connected(self):
+        """bleConnectedHandler()"""
+        self.is_connected = True
+        self.last_connection_time = self.millis()
+        self._send(CMD_ACKNOWLEDGED)
+
+    def on_disconnected(self):
+        """bleDisconnectedHandler()"""
+        self.is_connected = False
+        self.set_ignition_state(IgnitionState.CONNECTION_LOST)
+
+    def on_bac_status_written(self, data) -> bool:
+        """bacStatusWrittenHandler(): returns False if the packet was rejected"""
+        if len(data) < BAC_STATUS_LENGTH:
+            self.invalid_packets += 1
+            return False
+        self.receive(parse_bac_status(data))
+        return True
+
+    def receive(self, status: BACStatus):
+        """Store an already decoded BAC status and run processBACData()"""
+        self.current_bac = status
+        self.last_bac_update = self.millis()
+        self.process_bac_data()
+
+    def process_bac_data(self):
+        """processBACData(): decide ignition state from the latest BAC status"""
+        bac = self.current_bac
+        if not bac.watch_worn:
+            self.set_ignition_state(IgnitionState.IGNITION_BLOCKED)
+            self._send(CMD_REQUEST_VERIFICATION)
+            return
+
+        # Poor sensor quality only produces a serial warning on the firmware
+
+        if bac.bac_value > LEGAL_BAC_LIMIT:
+            self.set_ignition_state(IgnitionState.IGNITION_BLOCKED)
+            self._send(CMD_BLOCK_IGNITION)
+            self.alarms += 1
+        elif bac.bac_value > LEGAL_BAC_LIMIT * 0.75:
+            self.set_ignition_state(IgnitionState.IGNITION_ALLOWED)  # allowed with warning tone
+            self.warnings += 1
+        else:
+            self.set_ignition_state(IgnitionState.IGNITION_ALLOWED)
+
+    def loop(self, button_pressed: bool = False):
+        """One pass of the firmware loop() without BLE polling and LEDs"""
+        self.check_connection_status()
+        self.check_bac_timeout()
+        self.check_override_button(button_pressed)
+
+    def check_connection_status(self):
+        """checkConnectionStatus(): block once disconnected for CONNECTION_TIMEOUT"""
+        if self.is_connected:
+            return
+        if self.millis() - self.last_connection_time > CONNECTION_TIMEOUT:
+            if self.ignition_state not in (IgnitionState.CONNECTION_LOST, IgnitionState.WAITING_FOR_DATA):
+                self.set_ignition_state(IgnitionState.CONNECTION_LOST)
+
+    def check_bac_timeout(self):
+        """checkBACTimeout(): block when no BAC update for BAC_UPDATE_TIMEOUT"""
+        if not self.is_connected:
+            return
+        if self.millis() - self.last_bac_update > BAC_UPDATE_TIMEOUT:
+            self.set_ignition_state(IgnitionState.CONNECTION_LOST)
+
+    def check_override_button(self, button_pressed: bool):
+        """checkOverrideButton(): hold for OVERRIDE_HOLD_TIME to override"""
+        now = self.millis()
+        if button_pressed and not self._button_was_pressed:
+            self._button_press_time = now
+            self._button_was_pressed = True
+
+        if button_pressed and self._button_was_pressed and now - self._button_press_time > OVERRIDE_HOLD_TIME:
+            self.activate_emergency_override()
+            self._button_was_pressed = False
+
+        if not button_pressed:
+            self._button_was_pressed = False
+
+    def activate_emergency_override(self):
+        """activateEmergencyOverride()"""
+        self.override_attempts += 1
+        self.override_start_time = self.millis()
+        self.set_ignition_state(IgnitionState.OVERRIDE_ACTIVE)
+        self._send(CMD_EMERGENCY_OVERRIDE)
+
+
+def encode_vehicle_command(command_type: int, now_seconds: int = 0) -> bytes:
+    """12-byte vehicle command as built by sendVehicleCommand()"""
+    data = bytearray(12)
+    data[0] = command_type
+    data[1] = 0x00  # Acknowledged
+    struct.pack_into('<I', data, 6, now_seconds & 0xFFFFFFFF)
+    return bytes(data)
+
+
+# Vehicle timelines are laid end to end on one int64 axis: rank * _VEHICLE_STRIDE + ms
+_VEHICLE_STRIDE = np.int64(1) << 42  # ~139 years of milliseconds
+
+
+@dataclass
+class BatchDecisions:
+    """Result of decide_batch(), per-packet arrays in input order"""
+    states: np.ndarray  # IgnitionState value after each packet (int8)
+    commands: np.ndarray  # command sent for each packet, -1 if none (int16)
+    warnings: np.ndarray  # BAC approaching the limit (warning tone)
+    timeouts: int  # gaps longer than BAC_UPDATE_TIMEOUT
+    overrides: int  # emergency override activations
+    state_ms: Dict[str, int] = field(default_factory=dict)  # time spent per state
+    false_blocks: Optional[np.ndarray] = None  # blocked on BAC although true BAC is legal
+
+    @property
+    def blocked(self) -> np.ndarray:
+        return self.states == IgnitionState.IGNITION_BLOCKED.value
+
+    def summary(self) -> dict:
+        out = {
+            'packets': int(self.states.size),
+            'blocked': int(self.blocked.sum()),
+            'block_commands': int((self.commands == CMD_BLOCK_IGNITION).sum()),
+            'verification_requests': int((self.commands == CMD_REQUEST_VERIFICATION).sum()),
+            'warnings': int(self.warnings.sum()),
+            'timeouts': self.timeouts,
+            'overrides': self.overrides,
+            'state_ms': self.state_ms,
+        }
+        if self.false_blocks is not None:
+            out['false_blocks'] = int(self.false_blocks.sum())
+        return out
+
+
+def decide_batch(times_ms, bac_values, flags, vehicle_ids=None, override_ms=None,
+                 override_vehicle_ids=None, true_bac=None) -> BatchDecisions:
+    """
+    Run the firmware decision rules over many BAC packets at once
+
+    processBACData() depends only on the packet just received, so per-packet
+    states and commands are pure array expressions. The timeout and override
+    handling between packets is worked out from the gaps between consecutive
+    packets of the same vehicle:
+      - a gap longer than BAC_UPDATE_TIMEOUT spends its remainder in
+        CONNECTION_LOST (taken to start exactly at the timeout; the firmware
+        polls every 100 ms)
+      - an override activated (button already held 5 s) inside a gap holds
+        OVERRIDE_ACTIVE until the next packet or the timeout
+    Time is accounted from each vehicle's first to its last packet; overrides
+    before a vehicle's first packet are counted but change no state. Vehicles
+    are assumed connected throughout.
+
+    Args:
+        times_ms: Arrival time of each packet (firmware millis())
+        bac_values: Decoded BAC (float32 values, as sent over BLE)
+        flags: Flags byte of each packet
+        vehicle_ids: Vehicle of each packet (default: all one vehicle)
+        override_ms: Override activation times
+        override_vehicle_ids: Vehicle of each override (default: all one vehicle)
+        true_bac: Ground-truth BAC per packet, used to count false blocks
+    """
+    t = np.asarray(times_ms, dtype=np.int64)
+    n = t.size
+    # Compare the float32 payload as the firmware does (float promoted to double)
+    bac = np.asarray(bac_values, dtype=np.float32).astype(np.float64)
+    worn = (np.asarray(flags, dtype=np.uint8) & FLAG_WATCH_WORN) != 0
+    over = bac > LEGAL_BAC_LIMIT
+
+    states = np.where(
+        ~worn | over, IgnitionState.IGNITION_BLOCKED.value, IgnitionState.IGNITION_ALLOWED.value
+    ).astype(np.int8)
+    commands = np.full(n, -1, dtype=np.int16)
+    commands[over] = CMD_BLOCK_IGNITION
+    commands[~worn] = CMD_REQUEST_VERIFICATION
+    warnings = worn & ~over & (bac > LEGAL_BAC_LIMIT * 0.75)
+
+    false_blocks = None
+    if true_bac is not None:
+        false_blocks = worn & over & (np.asarray(true_bac, dtype=np.float64) <= LEGAL_BAC_LIMIT)
+
+    # Sort packets by (vehicle, time) onto a single axis
+    if vehicle_ids is None:
+        rank = np.zeros(n, dtype=np.int64)
+        vehicle_keys = None
+    else:
+        vehicle_keys, rank = np.unique(np.asarray(vehicle_ids), return_inverse=True)
+    key = rank.astype(np.int64) * _VEHICLE_STRIDE + t
+    order = np.argsort(key, kind='stable')
+    key_s = key[order]
+    states_s = states[order]
+
+    gap = np.zeros(n, dtype=np.int64)
+    if n > 1:
+        same_vehicle = rank[order][1:] == rank[order][:-1]
+        gap[:-1] = np.where(same_vehicle, np.diff(key_s), 0)
+    held = np.minimum(gap, BAC_UPDATE_TIMEOUT)
+    lost = gap - held
+    timeouts = int((lost > 0).sum())
+
+    override_held = np.zeros(n, dtype=np.int64)
+    overrides = 0
+    if override_ms is not None:
+        o = np.asarray(override_ms, dtype=np.int64)
+        overrides = int(o.size)
+        if override_vehicle_ids is None:
+            o_rank = np.zeros(o.size, dtype=np.int64)
+        else:
+            if vehicle_keys is None:
+                raise ValueError("override_vehicle_ids given without vehicle_ids")
+            o_rank = np.searchsorted(vehicle_keys, np.asarray(override_vehicle_ids))
+            known = (o_rank < vehicle_keys.size)
+            known[known] = vehicle_keys[o_rank[known]] == np.asarray(override_vehicle_ids)[known]
+            o, o_rank = o[known], o_rank[known]
+        o_key = np.sort(o_rank * _VEHICLE_STRIDE + o)
+        # Packet at or before each override (a packet and override in the same
+        # millisecond: BLE.poll() runs before checkOverrideButton())
+        idx = np.searchsorted(key_s, o_key, side='right') - 1
+        valid = idx >= 0
+        valid[valid] = (key_s[idx[valid]] // _VEHICLE_STRIDE) == (o_key[valid] // _VEHICLE_STRIDE)
+        idx, o_key = idx[valid], o_key[valid]
+        # Only the first override inside a gap changes the state
+        idx, first = np.unique(idx, return_index=True)
+        offset = o_key[first] - key_s[idx]
+        override_held[idx] = np.maximum(held[idx] - offset, 0)
+        held = held.copy()
+        held[idx] -= override_held[idx]
+
+    state_ms = np.bincount(states_s, weights=held, minlength=len(IgnitionState)).astype(np.int64)
+    state_ms[IgnitionState.CONNECTION_LOST.value] += lost.sum()
+    state_ms[IgnitionState.OVERRIDE_ACTIVE.value] += override_held.sum()
+
+    return BatchDecisions(
+        states=states,
+        commands=commands,
+        warnings=warnings,
+        timeouts=timeouts,
+        overrides=overrides,
+        state_ms={s.name: int(state_ms[s.value]) for s in IgnitionState},
+        false_blocks=false_blocks,
+    )
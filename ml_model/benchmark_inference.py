@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Inference latency benchmark for the BAC estimation model
+Times Keras __call__ (eager and inside tf.function), Keras predict, the
+TFLite interpreter at several thread counts and the NumPy kernel from
+arduino/simulation over a range of batch sizes. Every case is warmed up first; results (p50/p90/p99 latency and
+throughput) are written as JSON so runs can be compared commit to commit.
+
+Usage (from ml_model/):
+    python benchmark_inference.py                      # trained models in models/
+    python benchmark_inference.py --random-weights     # untrained model, no training needed
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+ML_MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+SIMULATION_DIR = os.path.normpath(os.path.join(ML_MODEL_DIR, '..', 'arduino', 'simulation'))
+DEFAULT_OUTPUT = os.path.join(ML_MODEL_DIR, 'models', 'latency_benchmark.json')
+
+# training/ and model_smartwatch.py are imported lazily, from ml_model/ and arduino/simulation/
+for _path in (ML_MODEL_DIR, SIMULATION_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+SEQUENCE_LENGTH = 10
+N_FEATURES = 6
+BATCH_SIZES = (1, 8, 64, 256)
+TFLITE_THREADS = (1, 2, 4)
+PERCENTILES = (50, 90, 99)
+
+
+def pin_threads(threads: int):
+    """
+    Fix TF op parallelism and BLAS threads for this process.
+    BLAS is limited at runtime through threadpoolctl, since numpy is already
+    loaded; the environment variables only reach child processes. The TF
+    setting only takes effect before TensorFlow has run anything; returns
+    False if the runtime was already initialized.
+    """
+    from threadpoolctl import threadpool_limits  # installed with scikit-learn
+    threadpool_limits(limits=threads)
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        return True
+    except RuntimeError:
+        return False
+
+
+def time_calls(fn: Callable[[], object], warmup: int = 10, iterations: int = 100,
+               min_seconds: float = 0.0) -> np.ndarray:
+    """Per-call wall times in ns, after `warmup` untimed calls"""
+    for _ in range(warmup):
+        fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < iterations or time.perf_counter() - start < min_seconds:
+        t0 = time.perf_counter_ns()
+        fn()
+        times.append(time.perf_counter_ns() - t0)
+    return np.array(times, dtype=np.int64)
+
+
+def summarize(times_ns: np.ndarray, batch_size: int) -> dict:
+    """Latency percentiles (ms) and throughput (samples/s) of one case"""
+    ms = times_ns / 1e6
+    summary = {f'p{q}_ms': round(float(np.percentile(ms, q)), 4) for q in PERCENTILES}
+    summary.update({
+        'mean_ms': round(float(ms.mean()), 4),
+        'min_ms': round(float(ms.min()), 4),
+        'max_ms': round(float(ms.max()), 4),
+        'calls': int(len(ms)),
+        'throughput_per_s': round(batch_size * 1e3 / float(np.median(ms)), 1),
+    })
+    return summary
+
+
+def tflite_runner(path: str, x: np.ndarray, threads: int) -> Callable[[], np.ndarray]:
+    """Interpreter sized for x; the returned call runs one invoke()"""
+    import tensorflow as tf
+
+    interpreter = tf.lite.Interpreter(model_path=path, num_threads=threads)
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+    interpreter.resize_tensor_input(input_index, list(x.shape))
+    interpreter.allocate_tensors()
+
+    def run():
+        interpreter.set_tensor(input_index, x)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)
+    return run
+
+
+def run_suite(keras_model=None, tflite_path: Optional[str] = None, numpy_kernel=None,
+              batch_sizes: Sequence[int] = BATCH_SIZES,
+              tflite_threads: Sequence[int] = TFLITE_THREADS,
+              warmup: int = 10, iterations: int = 100, min_seconds: float = 0.0,
+              input_shape: Sequence[int] = (SEQUENCE_LENGTH, N_FEATURES),
+              seed: int = 0) -> List[dict]:
+    """
+    Benchmark every available backend at every batch size.
+    Inputs are random normal windows, i.e. already in normalized units.
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+
+    def add(name, backend, batch_size, threads, fn):
+        times = time_calls(fn, warmup, iterations, min_seconds)
+        results.append({'name': name, 'backend': backend, 'batch_size': batch_size,
+                        'threads': threads, **summarize(times, batch_size)})
+        print(f"  {name:<16} batch={batch_size:<4} threads={str(threads):<4} "
+              f"p50={results[-1]['p50_ms']:8.3f} ms  p99={results[-1]['p99_ms']:8.3f} ms  "
+              f"{results[-1]['throughput_per_s']:10.1f}/s")
+
+    for batch_size in batch_sizes:
+        x = rng.standard_normal((batch_size, *input_shape)).astype(np.float32)
+        if keras_model is not None:
+            import tensorflow as tf
+            tensor = tf.constant(x)
+            add('keras_call', 'keras', batch_size, None, lambda: keras_model(tensor, training=False))
+            # Traced once during warmup; what a serving signature would run
+            graph_call = tf.function(lambda t: keras_model(t, training=False))
+            add('keras_function', 'keras', batch_size, None, lambda: graph_call(tensor))
+            add('keras_predict', 'keras', batch_size, None,
+                lambda: keras_model.predict(x, batch_size=batch_size, verbose=0))
+        if tflite_path is not None:
+            for threads in tflite_threads:
+                add('tflite', 'tflite', batch_size, threads, tflite_runner(tflite_path, x, threads))
+        if numpy_kernel is not None:
+            add('numpy_kernel', 'numpy', batch_size, None, lambda: numpy_kernel.predict(x))
+    return results
+
+
+def environment_info() -> dict:
+    """Machine and version details stored alongside the results"""
+    import tensorflow as tf
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ML_MODEL_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'tensorflow': tf.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'tf_intra_op_threads': tf.config.threading.get_intra_op_parallelism_threads(),
+        'tf_inter_op_threads': tf.config.threading.get_inter_op_parallelism_threads(),
+    }
+
+
+def write_report(path: str, results: List[dict], config: Dict) -> dict:
+    report = {'environment': environment_info(), 'config': config, 'results': results}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def numpy_kernel_for(keras_model):
+    """NumpyBACKernel on the Keras weights, from arduino/simulation/model_smartwatch.py"""
+    from model_smartwatch import NumpyBACKernel
+    return NumpyBACKernel.from_keras(keras_model)
+
+
+def load_models(model_dir: str, random_weights: bool, tmp_dir: str):
+    """(keras_model, tflite_path, numpy_kernel); any of them may be None"""
+    from tensorflow import keras
+    from training.bac_estimation_model import CUSTOM_OBJECTS, BACEstimationModel
+    from model_smartwatch import KERAS_MODELS, TFLITE_MODEL
+
+    if random_weights:
+        bac = BACEstimationModel(sequence_length=SEQUENCE_LENGTH, n_features=N_FEATURES)
+        bac.model = bac.build_model()
+        tflite_path = os.path.join(tmp_dir, TFLITE_MODEL)
+        bac.convert_to_tflite(output_path=tflite_path, quantize=True)
+        return bac.model, tflite_path, numpy_kernel_for(bac.model)
+
+    keras_model = None
+    for name in KERAS_MODELS:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            keras_model = keras.models.load_model(path, custom_objects=CUSTOM_OBJECTS, compile=False)
+            break
+    tflite_path = os.path.join(model_dir, TFLITE_MODEL)
+    if not os.path.exists(tflite_path):
+        tflite_path = None
+    if keras_model is None and tflite_path is None:
+        raise FileNotFoundError(
+            f"No trained BAC model in {model_dir}; run training/train_model.py "
+            f"or pass --random-weights"
+        )
+    kernel = numpy_kernel_for(keras_model) if keras_model is not None else None
+    return keras_model, tflite_path, kernel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BAC model inference latency")
+    parser.add_argument('--model-dir', default=os.path.join(ML_MODEL_DIR, 'models'))
+    parser.add_argument('--random-weights', action='store_true',
+                        help="Benchmark a freshly built (untrained) model instead of saved files")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(BATCH_SIZES))
+    parser.add_argument('--tflite-threads', type=int, nargs='+', default=list(TFLITE_THREADS))
+    parser.add_argument('--tf-threads', type=int, default=1,
+                        help="TF intra-op threads for the Keras cases (0 = TF default)")
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--min-seconds', type=float, default=0.0,
+                        help="Keep timing each case for at least this long")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    if args.tf_threads:
+        pin_threads(args.tf_threads)
+
+    print("=" * 70)
+    print("AlcoWatch BAC Model - Inference Latency Benchmark")
+    print("=" * 70)
+    with tempfile.TemporaryDirectory() as tmp:
+        keras_model, tflite_path, kernel = load_models(args.model_dir, args.random_weights, tmp)
+        results = run_suite(keras_model, tflite_path, kernel, args.batch_sizes, args.tflite_threads,
+                            args.warmup, args.iterations, args.min_seconds)
+    config = {key: getattr(args, key) for key in
+              ('random_weights', 'batch_sizes', 'tflite_threads', 'tf_threads',
+               'warmup', 'iterations', 'min_seconds')}
+    write_report(args.output, results, config)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,51 @@
 #!/usr/bin/env python3
 """
 Convert the existing H5 model to TFLite format
+Pass --int8 for full-integer quantization calibrated on the stratified
+windows from data/calibration_dataset.py (cached in models/calibration_set.npz)
 """
+import argparse
 import tensorflow as tf
 import os
 
+from data.calibration_dataset import (
+    DEFAULT_CACHE, build_calibration_set, load_scaler_params, representative_dataset,
+)
+from training.bac_estimation_model import CUSTOM_OBJECTS, export_tflite
+
 # Paths
 MODEL_DIR = "models"
 H5_MODEL_PATH = os.path.join(MODEL_DIR, "bac_model_best.h5")
 TFLITE_MODEL_PATH = os.path.join(MODEL_DIR, "bac_model.tflite")
+INT8_MODEL_PATH = os.path.join(MODEL_DIR, "bac_model_int8.tflite")
+
+def convert_to_int8(model, calibration_samples=500, seed=0):
+    """Full-integer TFLite model calibrated on the cached calibration set"""
+    calibration = build_calibration_set(
+        n_samples=calibration_samples, sequence_length=model.input_shape[1],
+        scaler_params=load_scaler_params(), cache_path=DEFAULT_CACHE, seed=seed,
+    )
+    print(f"Calibrating on {len(calibration['X'])} windows from {DEFAULT_CACHE}...")
+    tflite_model = export_tflite(model, INT8_MODEL_PATH,
+                                 representative_dataset=representative_dataset(calibration['X']))
+    print(f"\n✓ int8 TFLite model created successfully!")
+    print(f"  Size: {len(tflite_model) / 1024:.2f} KB")
+    print(f"  Location: {INT8_MODEL_PATH}")
+    return INT8_MODEL_PATH
 
-def convert_to_tflite():
+def convert_to_tflite(int8=False, calibration_samples=500, seed=0):
     """Convert H5 model to TFLite with quantization"""
     print(f"Loading model from {H5_MODEL_PATH}...")
 
     # Load the Keras model with unsafe mode (trusted source with Lambda layers)
-    model = tf.keras.models.load_model(H5_MODEL_PATH, safe_mode=False)
+    model = tf.keras.models.load_model(H5_MODEL_PATH, custom_objects=CUSTOM_OBJECTS, safe_mode=False)
 
     print(f"Model loaded. Input shape: {model.input_shape}")
     print(f"Output shape: {model.output_shape}")
 
+    if int8:
+        return convert_to_int8(model, calibration_samples, seed)
+
     # Convert to TFLite with dynamic range quantization
     print("\nConverting to TFLite with quantization...")
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
@@ -41,4 +67,9 @@ def convert_to_tflite():
     return TFLITE_MODEL_PATH
 
 if __name__ == "__main__":
-    convert_to_tflite()
+    parser = argparse.ArgumentParser(description="Convert the H5 BAC model to TFLite")
+    parser.add_argument('--int8', action='store_true', help="Full-integer quantization")
+    parser.add_argument('--calibration-samples', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0, help="Calibration sampling seed")
+    args = parser.parse_args()
+    convert_to_tflite(args.int8, args.calibration_samples, args.seed)
@@ -0,0 +1,228 @@
+"""
+Calibration windows for full-integer (int8) TFLite quantization
+Samples windows evenly across drinking profiles and climate bins of the
+synthetic dataset, streams them one at a time and caches the set as .npz so
+repeated conversions calibrate on exactly the same data.
+
+Usage (from ml_model/):
+    python data/calibration_dataset.py                  # build models/calibration_set.npz
+    python data/calibration_dataset.py --samples 1000 --refresh
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.dataset_loader import AlcoholDatasetLoader
+
+FEATURE_COLS = [
+    'ppg_heart_rate', 'ppg_quality', 'eda_value',
+    'skin_temperature', 'ambient_temperature', 'humidity',
+]
+PROFILES = ('sober', 'light', 'moderate', 'heavy')
+
+# (upper bound, label) on the raw session mean; the last bound is open
+TEMPERATURE_BINS = ((22.0, 'cool'), (27.0, 'mild'), (np.inf, 'hot'))
+HUMIDITY_BINS = ((40.0, 'dry'), (60.0, 'moderate'), (np.inf, 'humid'))
+
+DEFAULT_CACHE = 'models/calibration_set.npz'
+SCALER_PATH = 'models/scaler_params.json'
+
+
+def _bin(value: float, bins) -> str:
+    for upper, label in bins:
+        if value < upper:
+            return label
+    return bins[-1][1]
+
+
+def climate_bin(ambient_temperature: float, humidity: float) -> str:
+    """Climate label of a session from its raw mean ambient temperature and humidity"""
+    return f"{_bin(ambient_temperature, TEMPERATURE_BINS)}_{_bin(humidity, HUMIDITY_BINS)}"
+
+
+def session_strata(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """Profile and climate bin per session_id (climate from unnormalized values)"""
+    sessions = df_raw.groupby('session_id').agg(
+        profile=('profile', 'first'),
+        ambient_temperature=('ambient_temperature', 'mean'),
+        humidity=('humidity', 'mean'),
+    )
+    sessions['climate'] = [climate_bin(t, h) for t, h in
+                           zip(sessions['ambient_temperature'], sessions['humidity'])]
+    return sessions[['profile', 'climate']]
+
+
+def normalize(df: pd.DataFrame, scaler_params: Dict) -> pd.DataFrame:
+    """Z-score the model features with saved scaler parameters"""
+    df = df.copy()
+    for col in FEATURE_COLS:
+        df[col] = (df[col] - scaler_params['mean'][col]) / scaler_params['std'][col]
+    return df
+
+
+def stratum_quotas(strata: List[Tuple[str, str]], n_samples: int) -> Dict[Tuple[str, str], int]:
+    """Split n_samples as evenly as possible over the strata"""
+    base, extra = divmod(n_samples, len(strata))
+    return {stratum: base + (i < extra) for i, stratum in enumerate(sorted(strata))}
+
+
+def iter_calibration_windows(
+    df: pd.DataFrame,
+    strata: pd.DataFrame,
+    n_samples: int = 500,
+    sequence_length: int = 10,
+    seed: int = 0
+) -> Iterator[Tuple[np.ndarray, str, str]]:
+    """
+    Yield (window [T, F], profile, climate) evenly across (profile, climate) strata.
+    Strata are interleaved, so any prefix of the stream is balanced too; windows
+    are cut from one session at a time instead of materializing every sequence.
+    """
+    rng = np.random.default_rng(seed)
+    sessions = {
+        session_id: group.sort_values('timestamp')[FEATURE_COLS].to_numpy(np.float32)
+        for session_id, group in df.groupby('session_id')
+    }
+    by_stratum: Dict[Tuple[str, str], List[int]] = {}
+    for session_id, row in strata.iterrows():
+        if session_id in sessions and len(sessions[session_id]) >= sequence_length:
+            by_stratum.setdefault((row['profile'], row['climate']), []).append(session_id)
+    if not by_stratum:
+        raise ValueError(f"No session has {sequence_length} samples to cut a window from")
+
+    def stratum_stream(session_ids):
+        # Cycle over the stratum's sessions in random order, random offset each time
+        for session_id in itertools.cycle(rng.permutation(session_ids)):
+            values = sessions[session_id]
+            start = rng.integers(0, len(values) - sequence_length + 1)
+            yield values[start:start + sequence_length]
+
+    quotas = stratum_quotas(list(by_stratum), n_samples)
+    streams = {stratum: stratum_stream(by_stratum[stratum]) for stratum in quotas}
+    remaining = dict(quotas)
+    while any(remaining.values()):
+        for stratum, stream in streams.items():
+            if remaining[stratum]:
+                remaining[stratum] -= 1
+                yield next(stream), stratum[0], stratum[1]
+
+
+def _config_key(config: Dict) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def build_calibration_set(
+    n_samples: int = 500,
+    sequence_length: int = 10,
+    n_subjects: int = 50,
+    sessions_per_subject: int = 5,
+    noise_level: float = 0.03,
+    scaler_params: Optional[Dict] = None,
+    cache_path: Optional[str] = DEFAULT_CACHE,
+    seed: int = 0,
+    refresh: bool = False
+) -> Dict[str, np.ndarray]:
+    """
+    Stratified calibration windows, loaded from cache_path when it was built
+    with the same settings.
+
+    Args:
+        n_samples: Number of windows
+        sequence_length: Timesteps per window (model input length)
+        n_subjects, sessions_per_subject, noise_level: Synthetic dataset settings
+        scaler_params: Training normalization; fitted on the dataset if None
+        cache_path: .npz cache, or None to disable caching
+        seed: Sampling seed
+        refresh: Rebuild even if a matching cache exists
+
+    Returns:
+        Dict with X [n, T, F] float32, profile [n], climate [n] and the cache key
+    """
+    config = {
+        'n_samples': n_samples, 'sequence_length': sequence_length,
+        'n_subjects': n_subjects, 'sessions_per_subject': sessions_per_subject,
+        'noise_level': noise_level, 'scaler_params': scaler_params, 'seed': seed,
+    }
+    key = _config_key(config)
+    if cache_path and os.path.exists(cache_path) and not refresh:
+        with np.load(cache_path) as cached:
+            if str(cached['key']) == key:
+                return {name: cached[name] for name in cached.files}
+
+    loader = AlcoholDatasetLoader(data_dir="data/raw")
+    df_raw = loader.create_synthetic_dataset(n_subjects=n_subjects,
+                                             sessions_per_subject=sessions_per_subject,
+                                             noise_level=noise_level)
+    # Same outlier filter as training; normalize with the deployed scaler if given
+    df = loader.preprocess_data(df_raw, normalize=scaler_params is None, remove_outliers=True)
+    if scaler_params is not None:
+        df = normalize(df, scaler_params)
+
+    windows, profiles, climates = [], [], []
+    for window, profile, climate in iter_calibration_windows(
+            df, session_strata(df_raw), n_samples, sequence_length, seed):
+        windows.append(window)
+        profiles.append(profile)
+        climates.append(climate)
+    calibration = {
+        'X': np.stack(windows).astype(np.float32),
+        'profile': np.array(profiles),
+        'climate': np.array(climates),
+        'key': np.array(key),
+    }
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        np.savez_compressed(cache_path, **calibration)
+    return calibration
+
+
+def representative_dataset(X: np.ndarray) -> Callable[[], Iterator[List[np.ndarray]]]:
+    """converter.representative_dataset: one [1, T, F] float32 window per step"""
+    def generator():
+        for window in X:
+            yield [window[np.newaxis].astype(np.float32)]
+    return generator
+
+
+def load_scaler_params(path: str = SCALER_PATH) -> Optional[Dict]:
+    """Scaler saved by training/train_model.py, or None if training has not run"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the int8 calibration window set")
+    parser.add_argument('--samples', type=int, default=500)
+    parser.add_argument('--sequence-length', type=int, default=10)
+    parser.add_argument('--subjects', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    parser.add_argument('--output', default=DEFAULT_CACHE)
+    parser.add_argument('--refresh', action='store_true', help="Rebuild even if the cache matches")
+    args = parser.parse_args()
+
+    calibration = build_calibration_set(
+        n_samples=args.samples, sequence_length=args.sequence_length, n_subjects=args.subjects,
+        scaler_params=load_scaler_params(args.scaler), cache_path=args.output,
+        seed=args.seed, refresh=args.refresh,
+    )
+    print(f"Calibration set: {calibration['X'].shape} -> {args.output}")
+    counts = pd.crosstab(pd.Series(calibration['profile'], name='profile'),
+                         pd.Series(calibration['climate'], name='climate'))
+    print(counts.reindex([p for p in PROFILES if p in counts.index]).to_string())
+
+
+if __name__ == "__main__":
+    main()
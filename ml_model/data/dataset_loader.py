@@ -241,6 +241,57 @@ class AlcoholDatasetLoader:
 
         return np.array(X_sequences), np.array(y_targets)
 
+    def create_session_chunks(
+        self,
+        df: pd.DataFrame,
+        chunk_length: int = 120,
+        warmup: int = 10,
+        target_col: str = 'bac_true'
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Cut sessions into long chunks for per-timestep (sequence-to-sequence) training.
+
+        Chunks overlap by `warmup` steps. The first `warmup` steps of every chunk
+        except a session's first get weight 0, so each label is trained once and
+        only with at least `warmup` steps of context (or from the session start).
+        The tail chunk is zero-padded with weight 0.
+
+        Args:
+            df: Preprocessed data
+            chunk_length: Time steps per chunk
+            warmup: Overlap between consecutive chunks of a session
+            target_col: Target variable column name
+
+        Returns:
+            X [n, chunk_length, 6], y [n, chunk_length], weights [n, chunk_length]
+        """
+        feature_cols = [
+            'ppg_heart_rate', 'ppg_quality', 'eda_value',
+            'skin_temperature', 'ambient_temperature', 'humidity'
+        ]
+        if not 0 <= warmup < chunk_length:
+            raise ValueError("warmup must be in [0, chunk_length)")
+
+        X_chunks, y_chunks, weights = [], [], []
+        for _, session_data in df.groupby('session_id', sort=False):
+            session_data = session_data.sort_values('timestamp')
+            features = session_data[feature_cols].to_numpy(np.float32)
+            targets = session_data[target_col].to_numpy(np.float32)
+
+            for start in range(0, max(1, len(features) - warmup), chunk_length - warmup):
+                end = min(start + chunk_length, len(features))
+                x = np.zeros((chunk_length, len(feature_cols)), dtype=np.float32)
+                y = np.zeros(chunk_length, dtype=np.float32)
+                w = np.zeros(chunk_length, dtype=np.float32)
+                x[:end - start] = features[start:end]
+                y[:end - start] = targets[start:end]
+                w[0 if start == 0 else warmup:end - start] = 1.0
+                X_chunks.append(x)
+                y_chunks.append(y)
+                weights.append(w)
+
+        return np.array(X_chunks), np.array(y_chunks), np.array(weights)
+
     def get_train_test_split(
         self,
         X: np.ndarray,
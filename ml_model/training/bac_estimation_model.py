@@ -12,7 +12,7 @@ import os
 
 
 class TemporalSumLayer(layers.Layer):
-    """Sum across temporal axis — TFLite-compatible replacement for Lambda."""
+    """Sum across temporal axis — kept so models saved before AttentionPooling load."""
     def call(self, inputs):
         return tf.reduce_sum(inputs, axis=1)
 
@@ -20,6 +20,109 @@ class TemporalSumLayer(layers.Layer):
         return super().get_config()
 
 
+class AttentionPooling(layers.Layer):
+    """
+    Attention-weighted sum over timesteps: [seq [B, T, F], weights [B, T]] -> [B, F].
+    One batched matmul (TFLite BATCH_MATMUL) instead of repeating the weights
+    to [B, T, F], multiplying and summing.
+    """
+    def call(self, inputs):
+        sequence, weights = inputs
+        return tf.squeeze(tf.matmul(tf.expand_dims(weights, 1), sequence), axis=1)
+
+    def get_config(self):
+        return super().get_config()
+
+
+# Pass to keras.models.load_model for saved BAC models
+CUSTOM_OBJECTS = {'TemporalSumLayer': TemporalSumLayer, 'AttentionPooling': AttentionPooling}
+
+LEGAL_LIMIT = 0.08  # g/dL
+
+
+def bac_aware_loss(y_true, y_pred):
+    """MSE plus a 30x penalty on false negatives above the legal limit."""
+    mse = tf.reduce_mean(tf.square(y_true - y_pred))
+    false_negative_mask = tf.cast(
+        (y_true > LEGAL_LIMIT) & (y_pred < LEGAL_LIMIT),
+        tf.float32
+    )
+    false_negative_penalty = tf.reduce_mean(
+        false_negative_mask * tf.square(y_true - y_pred) * 30.0
+    )
+    return mse + false_negative_penalty
+
+
+def safety_metrics(y_true: np.ndarray, y_pred: np.ndarray, threshold: float = LEGAL_LIMIT) -> dict:
+    """Regression error and over-limit classification metrics (FNR is the safety-critical one)."""
+    y_true = np.asarray(y_true).flatten()
+    y_pred = np.asarray(y_pred).flatten()
+    y_test_binary = (y_true > threshold).astype(int)
+    y_pred_binary = (y_pred > threshold).astype(int)
+
+    true_positives = np.sum((y_test_binary == 1) & (y_pred_binary == 1))
+    false_negatives = np.sum((y_test_binary == 1) & (y_pred_binary == 0))
+    false_positives = np.sum((y_test_binary == 0) & (y_pred_binary == 1))
+    true_negatives = np.sum((y_test_binary == 0) & (y_pred_binary == 0))
+
+    precision = true_positives / (true_positives + false_positives + 1e-10)
+    recall = true_positives / (true_positives + false_negatives + 1e-10)
+    return {
+        'mae': float(np.mean(np.abs(y_true - y_pred))),
+        'rmse': float(np.sqrt(np.mean((y_true - y_pred) ** 2))),
+        'classification_accuracy': float(np.mean(y_test_binary == y_pred_binary)),
+        'precision': precision,
+        'recall': recall,
+        'f1_score': 2 * (precision * recall) / (precision + recall + 1e-10),
+        'false_negatives': int(false_negatives),
+        'false_positives': int(false_positives),
+        'true_positives': int(true_positives),
+        'true_negatives': int(true_negatives),
+        'fnr': false_negatives / (false_negatives + true_positives + 1e-10),
+        'fpr': false_positives / (false_positives + true_negatives + 1e-10),
+    }
+
+
+def export_tflite(model: Model, output_path: str, quantize: bool = True,
+                  representative_dataset=None) -> bytes:
+    """
+    Convert a Keras model to TensorFlow Lite (via SavedModel) and write it to output_path.
+    quantize stores float16 weights; passing representative_dataset (see
+    data/calibration_dataset.py) instead calibrates activation ranges for
+    full-integer int8 kernels. Inputs and outputs stay float32 either way.
+    """
+    # Save to SavedModel format first for TF 2.16 compatibility
+    saved_model_dir = output_path.replace('.tflite', '_saved_model')
+    model.export(saved_model_dir)
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+
+    # LSTM requires SELECT_TF_OPS for TensorListReserve
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS,
+        tf.lite.OpsSet.SELECT_TF_OPS,
+    ]
+    converter._experimental_lower_tensor_list_ops = False
+    converter.experimental_enable_resource_variables = True
+
+    if representative_dataset is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+            tf.lite.OpsSet.SELECT_TF_OPS,
+        ]
+    elif quantize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+
+    tflite_model = converter.convert()
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    return tflite_model
+
+
 class BACEstimationModel:
     """
     Neural network model for BAC estimation using sensor fusion.
@@ -68,13 +171,8 @@ class BACEstimationModel:
         attention_scores = layers.Flatten(name='attention_flatten')(attention_scores)
         attention_weights = layers.Activation('softmax', name='attention_softmax')(attention_scores)
 
-        # Apply attention: broadcast weights and multiply
-        attention_expanded = layers.RepeatVector(self.lstm_units * 2)(attention_weights)
-        attention_expanded = layers.Permute([2, 1])(attention_expanded)
-        attended = layers.Multiply()([lstm_out, attention_expanded])
-
-        # Sum over timesteps (TFLite-compatible custom layer)
-        attended = TemporalSumLayer(name='temporal_sum')(attended)
+        # Weighted sum over timesteps in one matmul
+        attended = AttentionPooling(name='attention_pooling')([lstm_out, attention_weights])
 
         # Dense layers
         dense = layers.Dense(32, activation='relu', name='dense_1')(attended)
@@ -90,18 +188,6 @@ class BACEstimationModel:
         if self.model is None:
             self.model = self.build_model()
 
-        def bac_aware_loss(y_true, y_pred):
-            mse = tf.reduce_mean(tf.square(y_true - y_pred))
-            dangerous_threshold = 0.08
-            false_negative_mask = tf.cast(
-                (y_true > dangerous_threshold) & (y_pred < dangerous_threshold),
-                tf.float32
-            )
-            false_negative_penalty = tf.reduce_mean(
-                false_negative_mask * tf.square(y_true - y_pred) * 30.0
-            )
-            return mse + false_negative_penalty
-
         self.model.compile(
             optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
             loss=bac_aware_loss,
@@ -165,38 +251,12 @@ class BACEstimationModel:
         loss, mae, mse, rmse = self.model.evaluate(X_test, y_test, verbose=0)
         y_pred = self.model.predict(X_test, verbose=0).flatten()
 
-        threshold = 0.08
-        y_test_binary = (y_test > threshold).astype(int)
-        y_pred_binary = (y_pred > threshold).astype(int)
-
-        accuracy = np.mean(y_test_binary == y_pred_binary)
-
-        true_positives = np.sum((y_test_binary == 1) & (y_pred_binary == 1))
-        false_negatives = np.sum((y_test_binary == 1) & (y_pred_binary == 0))
-        false_positives = np.sum((y_test_binary == 0) & (y_pred_binary == 1))
-        true_negatives = np.sum((y_test_binary == 0) & (y_pred_binary == 0))
-
-        precision = true_positives / (true_positives + false_positives + 1e-10)
-        recall = true_positives / (true_positives + false_negatives + 1e-10)
-        f1_score = 2 * (precision * recall) / (precision + recall + 1e-10)
-        fnr = false_negatives / (false_negatives + true_positives + 1e-10)
-        fpr = false_positives / (false_positives + true_negatives + 1e-10)
-
         return {
+            **safety_metrics(y_test, y_pred),
             'loss': loss,
             'mae': mae,
             'mse': mse,
             'rmse': rmse,
-            'classification_accuracy': accuracy,
-            'precision': precision,
-            'recall': recall,
-            'f1_score': f1_score,
-            'false_negatives': int(false_negatives),
-            'false_positives': int(false_positives),
-            'true_positives': int(true_positives),
-            'true_negatives': int(true_negatives),
-            'fnr': fnr,
-            'fpr': fpr,
         }
 
     def extract_attention_weights(self, X: np.ndarray) -> np.ndarray:
@@ -215,34 +275,14 @@ class BACEstimationModel:
     def convert_to_tflite(
         self,
         output_path: str = 'models/bac_model.tflite',
-        quantize: bool = True
+        quantize: bool = True,
+        representative_dataset=None
     ):
-        """Convert trained model to TensorFlow Lite."""
+        """Convert trained model to TensorFlow Lite (int8 if given a representative dataset)."""
         if self.model is None:
             raise ValueError("Model must be trained before conversion")
 
-        # Save to SavedModel format first for TF 2.16 compatibility
-        saved_model_dir = output_path.replace('.tflite', '_saved_model')
-        self.model.export(saved_model_dir)
-        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
-
-        # LSTM requires SELECT_TF_OPS for TensorListReserve
-        converter.target_spec.supported_ops = [
-            tf.lite.OpsSet.TFLITE_BUILTINS,
-            tf.lite.OpsSet.SELECT_TF_OPS,
-        ]
-        converter._experimental_lower_tensor_list_ops = False
-        converter.experimental_enable_resource_variables = True
-
-        if quantize:
-            converter.optimizations = [tf.lite.Optimize.DEFAULT]
-            converter.target_spec.supported_types = [tf.float16]
-
-        tflite_model = converter.convert()
-
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'wb') as f:
-            f.write(tflite_model)
+        tflite_model = export_tflite(self.model, output_path, quantize, representative_dataset)
 
         print(f"TFLite model saved to {output_path}")
         print(f"Model size: {len(tflite_model) / 1024:.2f} KB")
@@ -0,0 +1,277 @@
+"""
+Magnitude pruning and weight clustering for BACEstimationModel.
+Prunes the BiLSTM kernels and hidden dense layers to a target sparsity (per
+weight or in 1 x N blocks) on a polynomial schedule while fine-tuning, then
+clusters the remaining weights to a few shared values and fine-tunes the
+centroids. Reports sparsity, TFLite and gzip (OTA payload) size, latency and
+accuracy for each stage.
+
+Usage (from ml_model/):
+    python training/compress_model.py
+    python training/compress_model.py --sparsity 0.7 --clusters 8
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+os.environ['PYTHONHASHSEED'] = '0'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers, Model
+
+from data.dataset_loader import AlcoholDatasetLoader
+from training.bac_estimation_model import bac_aware_loss
+from training.distill_student import TEACHER_PATH, load_or_train_teacher, profile_model
+
+# Hidden dense layers of BACEstimationModel; attention_dense and bac_output are
+# single-unit projections whose few weights are kept exact
+DENSE_LAYERS = ('dense_1', 'dense_2')
+
+
+def compressible_weights(model: Model) -> List:
+    """Kernel variables of the BiLSTM (input and recurrent) and hidden dense layers."""
+    variables = []
+    for layer in model.layers:
+        if isinstance(layer, layers.Bidirectional):
+            for direction in (layer.forward_layer, layer.backward_layer):
+                variables += [direction.cell.kernel, direction.cell.recurrent_kernel]
+        elif layer.name in DENSE_LAYERS:
+            variables.append(layer.kernel)
+    if not variables:
+        raise ValueError("Model has no BiLSTM or dense_1/dense_2 layers to compress")
+    return variables
+
+
+def polynomial_sparsity(step: int, begin_step: int, end_step: int,
+                        final_sparsity: float, initial_sparsity: float = 0.0,
+                        power: int = 3) -> float:
+    """Sparsity ramping from initial to final between begin_step and end_step (fast early, slow late)."""
+    if step <= begin_step:
+        return initial_sparsity
+    progress = min(1.0, (step - begin_step) / max(1, end_step - begin_step))
+    return final_sparsity + (initial_sparsity - final_sparsity) * (1 - progress) ** power
+
+
+def magnitude_mask(weights: np.ndarray, sparsity: float, block_size: int = 1) -> np.ndarray:
+    """
+    Keep the largest-magnitude (1 - sparsity) fraction of weights.
+    block_size > 1 prunes structured 1 x block_size blocks along the output
+    axis, scored by their L2 norm (the block-sparse layout sparse kernels use).
+    """
+    if block_size > 1 and weights.shape[-1] % block_size == 0:
+        blocks = weights.reshape(*weights.shape[:-1], -1, block_size)
+        keep = magnitude_mask(np.linalg.norm(blocks, axis=-1), sparsity)
+        return np.repeat(keep, block_size, axis=-1).reshape(weights.shape)
+    k = int(round(sparsity * weights.size))
+    if k == 0:
+        return np.ones_like(weights, dtype=bool)
+    threshold = np.partition(np.abs(weights).ravel(), k - 1)[k - 1]
+    return np.abs(weights) > threshold
+
+
+class MagnitudePruning(keras.callbacks.Callback):
+    """
+    Zeroes the smallest weights of each variable during training.
+    Masks are recomputed every `frequency` steps as the scheduled sparsity
+    rises and re-applied after every batch, so the optimizer cannot regrow
+    pruned weights.
+    """
+
+    def __init__(self, variables: List, final_sparsity: float, end_step: int,
+                 begin_step: int = 0, frequency: int = 50, block_size: int = 1):
+        super().__init__()
+        self.variables = variables
+        self.final_sparsity = final_sparsity
+        self.block_size = block_size
+        self.begin_step = begin_step
+        self.end_step = end_step
+        self.frequency = frequency
+        self.step = 0
+        self.masks = [np.ones(v.shape, dtype=bool) for v in variables]
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step += 1
+        if self.step % self.frequency == 0 or self.step == self.end_step:
+            sparsity = polynomial_sparsity(min(self.step, self.end_step), self.begin_step,
+                                           self.end_step, self.final_sparsity)
+            self.masks = [magnitude_mask(v.numpy(), sparsity, self.block_size) for v in self.variables]
+        for variable, mask in zip(self.variables, self.masks):
+            variable.assign(variable.numpy() * mask)
+
+
+def kmeans_1d(values: np.ndarray, n_clusters: int, iterations: int = 20) -> np.ndarray:
+    """Centroids of 1-D values, linearly initialized between min and max."""
+    centroids = np.linspace(values.min(), values.max(), n_clusters)
+    for _ in range(iterations):
+        assignment = np.abs(values[:, None] - centroids[None, :]).argmin(axis=1)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.bincount(assignment, weights=values, minlength=n_clusters)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled]
+    return centroids
+
+
+class WeightClustering(keras.callbacks.Callback):
+    """
+    Shares each variable's non-zero weights among `n_clusters` values.
+    Assignments are fixed at the start; after every batch each weight is
+    snapped to the mean of its cluster, so the gradient steps fine-tune the
+    centroids. Zeros left by pruning stay zero.
+    """
+
+    def __init__(self, variables: List, n_clusters: int):
+        super().__init__()
+        self.variables = variables
+        self.n_clusters = n_clusters
+        self.assignments = []
+        for variable in variables:
+            weights = variable.numpy()
+            nonzero = weights != 0
+            centroids = kmeans_1d(weights[nonzero], n_clusters)
+            assignment = np.full(weights.shape, -1, dtype=np.int32)
+            assignment[nonzero] = np.abs(weights[nonzero][:, None] - centroids[None, :]).argmin(axis=1)
+            self.assignments.append(assignment)
+        self._snap()
+
+    def _snap(self):
+        for variable, assignment in zip(self.variables, self.assignments):
+            weights = variable.numpy()
+            clustered = assignment >= 0
+            counts = np.bincount(assignment[clustered], minlength=self.n_clusters)
+            sums = np.bincount(assignment[clustered], weights=weights[clustered], minlength=self.n_clusters)
+            centroids = sums / np.maximum(counts, 1)
+            snapped = np.zeros_like(weights)
+            snapped[clustered] = centroids[assignment[clustered]]
+            variable.assign(snapped)
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._snap()
+
+
+def weight_stats(model: Model) -> Dict:
+    """Sparsity and distinct values of the compressible weights and of the whole model."""
+    variables = compressible_weights(model)
+    target_total = sum(int(np.prod(v.shape)) for v in variables)
+    target_zeros = sum(int(np.sum(v.numpy() == 0)) for v in variables)
+    all_weights = model.get_weights()
+    return {
+        'compressible_params': target_total,
+        'compressible_sparsity': round(target_zeros / target_total, 4),
+        'model_sparsity': round(sum(int(np.sum(w == 0)) for w in all_weights)
+                                / sum(w.size for w in all_weights), 4),
+        'max_unique_values': max(len(np.unique(v.numpy())) for v in variables),
+    }
+
+
+def fine_tune(model: Model, X_train, y_train, X_val, y_val, epochs: int,
+              callbacks: List, learning_rate: float, batch_size: int = 32):
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=learning_rate), loss=bac_aware_loss)
+    return model.fit(X_train, y_train, validation_data=(X_val, y_val), epochs=epochs,
+                     batch_size=batch_size, callbacks=callbacks, verbose=0)
+
+
+def compress(model: Model, X_train, y_train, X_val, y_val, sparsity: float = 0.5,
+             n_clusters: Optional[int] = 16, prune_epochs: int = 10, cluster_epochs: int = 5,
+             learning_rate: float = 1e-4, batch_size: int = 32, block_size: int = 1,
+             on_stage=None) -> Model:
+    """
+    Prune then cluster `model` in place. Pruning ramps sparsity over the
+    first 70% of prune_epochs and holds it for the rest; clustering then
+    fine-tunes the centroids at half the learning rate. on_stage(name, model)
+    is called after each stage, e.g. to profile it.
+    """
+    variables = compressible_weights(model)
+    steps_per_epoch = int(np.ceil(len(X_train) / batch_size))
+    if sparsity > 0:
+        end_step = max(1, int(0.7 * prune_epochs * steps_per_epoch))
+        pruning = MagnitudePruning(variables, sparsity, end_step,
+                                   frequency=max(1, steps_per_epoch // 4), block_size=block_size)
+        fine_tune(model, X_train, y_train, X_val, y_val, prune_epochs, [pruning],
+                  learning_rate, batch_size)
+        if on_stage:
+            on_stage('pruned', model)
+    if n_clusters:
+        clustering = WeightClustering(variables, n_clusters)
+        fine_tune(model, X_train, y_train, X_val, y_val, cluster_epochs, [clustering],
+                  learning_rate / 2, batch_size)
+        if on_stage:
+            on_stage('pruned_clustered' if sparsity > 0 else 'clustered', model)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune and cluster the BAC model, then report")
+    parser.add_argument('--model', default=TEACHER_PATH, help="Trained model (trained here if missing)")
+    parser.add_argument('--train-epochs', type=int, default=50, help="Epochs if no trained model exists")
+    parser.add_argument('--sparsity', type=float, default=0.5)
+    parser.add_argument('--block-size', type=int, default=1,
+                        help="Prune 1 x N blocks along the output axis (1 = unstructured)")
+    parser.add_argument('--clusters', type=int, default=16, help="0 disables clustering")
+    parser.add_argument('--prune-epochs', type=int, default=10)
+    parser.add_argument('--cluster-epochs', type=int, default=5)
+    parser.add_argument('--learning-rate', type=float, default=1e-4)
+    parser.add_argument('--subjects', type=int, default=50)
+    parser.add_argument('--output-dir', default='models')
+    args = parser.parse_args()
+
+    np.random.seed(42)
+    tf.random.set_seed(42)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print("=" * 70)
+    print("AlcoWatch BAC Model - Pruning and Weight Clustering")
+    print("=" * 70)
+
+    print("\n[1/3] Loading dataset...")
+    loader = AlcoholDatasetLoader(data_dir="data/raw")
+    df = loader.create_synthetic_dataset(n_subjects=args.subjects, sessions_per_subject=5, noise_level=0.03)
+    df = loader.preprocess_data(df, normalize=True, remove_outliers=True)
+    X, y = loader.create_sequences(df, sequence_length=10)
+    X = X.astype(np.float32)
+    X_train, X_val, X_test, y_train, y_val, y_test = loader.get_train_test_split(X, y)
+
+    print("\n[2/3] Loading model...")
+    model = load_or_train_teacher(args.model, X_train, y_train, X_val, y_val, args.train_epochs)
+
+    report = {'config': {k: getattr(args, k) for k in
+                         ('sparsity', 'block_size', 'clusters', 'prune_epochs', 'cluster_epochs',
+                          'learning_rate')},
+              'stages': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        def profile(stage, m):
+            path = os.path.join(tmp if stage == 'baseline' else args.output_dir,
+                               'bac_model_baseline.tflite' if stage == 'baseline'
+                               else f'bac_model_{stage}.tflite')
+            row = {**weight_stats(m), **profile_model(m, X_test, y_test, path)}
+            with open(path, 'rb') as f:
+                row['gzip_kb'] = round(len(gzip.compress(f.read(), 9)) / 1024, 2)
+            report['stages'][stage] = row
+            print(f"   {stage:<17} sparsity={row['compressible_sparsity']:.0%}  "
+                  f"unique<={row['max_unique_values']:<6} tflite={row['tflite_kb']:.1f} KB  "
+                  f"gzip={row['gzip_kb']:.1f} KB  p50={row['latency_p50_ms']:.3f} ms  "
+                  f"MAE={row['mae']:.4f}  FNR={row['fnr']:.2%}")
+
+        print("\n[3/3] Compressing...")
+        profile('baseline', model)
+        compress(model, X_train, y_train, X_val, y_val, args.sparsity, args.clusters,
+                 args.prune_epochs, args.cluster_epochs, args.learning_rate,
+                 block_size=args.block_size, on_stage=profile)
+
+    model.save(os.path.join(args.output_dir, 'bac_model_compressed.h5'))
+    report_path = os.path.join(args.output_dir, 'compression_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
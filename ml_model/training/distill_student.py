@@ -0,0 +1,219 @@
+"""
+Knowledge distillation of the BiLSTM BAC model into small on-watch students.
+Students (1-D temporal conv, GRU, MLP over window statistics) are trained on
+a blend of the teacher's predictions and the true BAC, then compared with the
+teacher on TFLite size, latency and safety FNR.
+
+Usage (from ml_model/):
+    python training/distill_student.py
+    python training/distill_student.py --students conv1d mlp --epochs 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+os.environ['PYTHONHASHSEED'] = '0'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers, Model
+
+from data.dataset_loader import AlcoholDatasetLoader
+from training.bac_estimation_model import (
+    CUSTOM_OBJECTS, BACEstimationModel, bac_aware_loss, export_tflite, safety_metrics,
+)
+from benchmark_inference import summarize, time_calls, tflite_runner
+
+STUDENTS = ('conv1d', 'gru', 'mlp')
+TEACHER_PATH = 'models/bac_model_full.h5'
+
+
+class WindowStatistics(layers.Layer):
+    """
+    Engineered per-feature window statistics: mean, std, last value and
+    last-minus-first slope, [batch, T, F] -> [batch, 4F]. Built from
+    reduce/slice ops so it converts to TFLite builtins.
+    """
+    def call(self, inputs):
+        mean = tf.reduce_mean(inputs, axis=1)
+        std = tf.sqrt(tf.maximum(tf.reduce_mean(tf.square(inputs), axis=1) - tf.square(mean), 1e-12))
+        last = inputs[:, -1, :]
+        slope = last - inputs[:, 0, :]
+        return tf.concat([mean, std, last, slope], axis=1)
+
+    def get_config(self):
+        return super().get_config()
+
+
+# Pass to keras.models.load_model for saved student models (student_<kind>.keras)
+STUDENT_CUSTOM_OBJECTS = {**CUSTOM_OBJECTS, 'WindowStatistics': WindowStatistics}
+
+
+def build_student(kind: str, sequence_length: int = 10, n_features: int = 6) -> Model:
+    """Small student network with the teacher's [batch, T, F] -> [batch, 1] interface."""
+    inputs = layers.Input(shape=(sequence_length, n_features), name='sensor_input')
+    if kind == 'conv1d':
+        x = layers.Conv1D(16, 3, padding='causal', activation='relu')(inputs)
+        x = layers.Conv1D(16, 3, padding='causal', dilation_rate=2, activation='relu')(x)
+        x = layers.GlobalAveragePooling1D()(x)
+        x = layers.Dense(8, activation='relu')(x)
+    elif kind == 'gru':
+        x = layers.GRU(16, unroll=True)(inputs)  # fixed 10 steps: builtin ops, no TensorList
+        x = layers.Dense(8, activation='relu')(x)
+    elif kind == 'mlp':
+        x = WindowStatistics(name='window_statistics')(inputs)
+        x = layers.Dense(16, activation='relu')(x)
+        x = layers.Dense(8, activation='relu')(x)
+    else:
+        raise ValueError(f"Unknown student '{kind}' (choose from {', '.join(STUDENTS)})")
+    output = layers.Dense(1, activation='linear', name='bac_output')(x)
+    return Model(inputs=inputs, outputs=output, name=f'student_{kind}')
+
+
+def distillation_loss(alpha: float):
+    """
+    Targets are [y_true, y_teacher]. alpha weights the MSE to the teacher;
+    the rest is the BAC-aware loss on the true label, so students keep the
+    false-negative penalty the teacher was trained with.
+    """
+    def loss(targets, y_pred):
+        y_true, y_teacher = targets[:, :1], targets[:, 1:]
+        soft = tf.reduce_mean(tf.square(y_teacher - y_pred))
+        return alpha * soft + (1 - alpha) * bac_aware_loss(y_true, y_pred)
+    return loss
+
+
+def train_student(student: Model, X_train, y_train, teacher_train, X_val, y_val, teacher_val,
+                  alpha: float = 0.5, epochs: int = 50, batch_size: int = 64):
+    student.compile(optimizer=keras.optimizers.Adam(learning_rate=0.003),
+                    loss=distillation_loss(alpha))
+    callbacks = [
+        keras.callbacks.EarlyStopping(monitor='val_loss', patience=8, restore_best_weights=True),
+        keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=4, min_lr=1e-5),
+    ]
+    return student.fit(
+        X_train, np.stack([y_train, teacher_train], axis=1),
+        validation_data=(X_val, np.stack([y_val, teacher_val], axis=1)),
+        epochs=epochs, batch_size=batch_size, callbacks=callbacks, verbose=0,
+    )
+
+
+def profile_model(model: Model, X_test, y_test, tflite_path: str, iterations: int = 200) -> dict:
+    """Safety metrics of the TFLite model plus its size and single-window latency."""
+    export_tflite(model, tflite_path, quantize=True)
+    run = tflite_runner(tflite_path, X_test[:1].astype(np.float32), threads=1)
+    latency = summarize(time_calls(run, warmup=20, iterations=iterations), batch_size=1)
+
+    interpreter = tf.lite.Interpreter(model_path=tflite_path)
+    input_index = interpreter.get_input_details()[0]['index']
+    interpreter.resize_tensor_input(input_index, list(X_test.shape))
+    interpreter.allocate_tensors()
+    interpreter.set_tensor(input_index, X_test.astype(np.float32))
+    interpreter.invoke()
+    y_pred = interpreter.get_tensor(interpreter.get_output_details()[0]['index'])[:, 0]
+
+    metrics = safety_metrics(y_test, y_pred)
+    return {
+        'params': int(model.count_params()),
+        'tflite_kb': round(os.path.getsize(tflite_path) / 1024, 2),
+        'latency_p50_ms': latency['p50_ms'],
+        'latency_p99_ms': latency['p99_ms'],
+        'mae': metrics['mae'],
+        'rmse': metrics['rmse'],
+        'fnr': float(metrics['fnr']),
+        'fpr': float(metrics['fpr']),
+        'false_negatives': metrics['false_negatives'],
+        'classification_accuracy': metrics['classification_accuracy'],
+    }
+
+
+def load_or_train_teacher(path: str, X_train, y_train, X_val, y_val, epochs: int) -> Model:
+    if os.path.exists(path):
+        print(f"   Teacher: {path}")
+        return keras.models.load_model(path, custom_objects=CUSTOM_OBJECTS, compile=False)
+    print(f"   No teacher at {path}; training BACEstimationModel for {epochs} epochs")
+    teacher = BACEstimationModel(sequence_length=X_train.shape[1], n_features=X_train.shape[2])
+    teacher.compile_model(learning_rate=0.001)
+    teacher.train(X_train, y_train, X_val, y_val, epochs=epochs, batch_size=32, callbacks=[
+        keras.callbacks.EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True),
+    ])
+    return teacher.model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the BAC BiLSTM into small student models")
+    parser.add_argument('--students', nargs='+', default=list(STUDENTS), choices=STUDENTS)
+    parser.add_argument('--teacher', default=TEACHER_PATH)
+    parser.add_argument('--teacher-epochs', type=int, default=50,
+                        help="Epochs if no saved teacher exists")
+    parser.add_argument('--epochs', type=int, default=60)
+    parser.add_argument('--alpha', type=float, default=0.5,
+                        help="Weight of the teacher target vs the true BAC (0..1)")
+    parser.add_argument('--subjects', type=int, default=50)
+    parser.add_argument('--output-dir', default='models')
+    args = parser.parse_args()
+
+    np.random.seed(42)
+    tf.random.set_seed(42)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print("=" * 70)
+    print("AlcoWatch BAC Model - Student Distillation")
+    print("=" * 70)
+
+    print("\n[1/4] Loading dataset...")
+    loader = AlcoholDatasetLoader(data_dir="data/raw")
+    df = loader.create_synthetic_dataset(n_subjects=args.subjects, sessions_per_subject=5, noise_level=0.03)
+    df = loader.preprocess_data(df, normalize=True, remove_outliers=True)
+    X, y = loader.create_sequences(df, sequence_length=10)
+    X = X.astype(np.float32)
+    X_train, X_val, X_test, y_train, y_val, y_test = loader.get_train_test_split(X, y)
+    print(f"   Train: {len(X_train)}, Val: {len(X_val)}, Test: {len(X_test)}")
+
+    print("\n[2/4] Teacher predictions...")
+    teacher = load_or_train_teacher(args.teacher, X_train, y_train, X_val, y_val, args.teacher_epochs)
+    teacher_train = teacher.predict(X_train, verbose=0)[:, 0]
+    teacher_val = teacher.predict(X_val, verbose=0)[:, 0]
+
+    report = {'alpha': args.alpha, 'n_test': int(len(X_test)), 'models': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        print("\n[3/4] Profiling teacher...")
+        report['models']['teacher_bilstm'] = profile_model(
+            teacher, X_test, y_test, os.path.join(tmp, 'teacher.tflite')
+        )
+
+        print("\n[4/4] Training students...")
+        for kind in args.students:
+            student = build_student(kind, X.shape[1], X.shape[2])
+            history = train_student(student, X_train, y_train, teacher_train,
+                                    X_val, y_val, teacher_val, args.alpha, args.epochs)
+            path = os.path.join(args.output_dir, f'student_{kind}.tflite')
+            report['models'][f'student_{kind}'] = {
+                **profile_model(student, X_test, y_test, path),
+                'epochs_run': len(history.history['loss']),
+            }
+            student.save(os.path.join(args.output_dir, f'student_{kind}.keras'))
+            print(f"   {kind}: saved {path}")
+
+    teacher_row = report['models']['teacher_bilstm']
+    print(f"\n{'model':<18}{'params':>8}{'KB':>9}{'p50 ms':>9}{'MAE':>9}{'FNR':>8}{'FPR':>8}")
+    for name, row in report['models'].items():
+        print(f"{name:<18}{row['params']:>8}{row['tflite_kb']:>9.1f}{row['latency_p50_ms']:>9.3f}"
+              f"{row['mae']:>9.4f}{row['fnr']:>8.2%}{row['fpr']:>8.2%}")
+        row['latency_vs_teacher'] = round(row['latency_p50_ms'] / teacher_row['latency_p50_ms'], 3)
+        row['size_vs_teacher'] = round(row['tflite_kb'] / teacher_row['tflite_kb'], 3)
+
+    report_path = os.path.join(args.output_dir, 'distillation_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Sequence-to-sequence BAC model: one BAC estimate (and over-limit probability)
+per timestep from a causal LSTM, trained on long session chunks instead of
+N-10 overlapping windows. The streaming variant runs one sample per call with
+the LSTM state as explicit inputs/outputs, so the watch carries the state
+between 30-second readings.
+
+Usage (from ml_model/):
+    python training/sequence_model.py
+    python training/sequence_model.py --chunk-length 240 --epochs 40
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Optional, Tuple
+
+os.environ['PYTHONHASHSEED'] = '0'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers, Model
+from sklearn.model_selection import train_test_split
+
+from data.dataset_loader import AlcoholDatasetLoader
+from training.bac_estimation_model import LEGAL_LIMIT, export_tflite, safety_metrics
+
+STATE_NAMES = ('state_h', 'state_c')
+
+
+def sequence_bac_loss(y_true, y_pred):
+    """Per-timestep BAC-aware loss ([B, T, 1] -> [B, T]) so step weights apply."""
+    y_true = tf.squeeze(y_true, -1)
+    y_pred = tf.squeeze(y_pred, -1)
+    error = tf.square(y_true - y_pred)
+    false_negative = tf.cast((y_true > LEGAL_LIMIT) & (y_pred < LEGAL_LIMIT), tf.float32)
+    return error + false_negative * error * 30.0
+
+
+class BACSequenceModel:
+    """
+    Causal per-timestep BAC estimator.
+    Architecture: LSTM [batch, T, 64] -> Dense(32) -> Dropout -> Dense(16)
+    -> bac [batch, T, 1] and over_limit [batch, T, 1] at every step.
+    """
+
+    def __init__(
+        self,
+        n_features: int = 6,
+        lstm_units: int = 64,
+        dropout_rate: float = 0.3,
+        over_limit_weight: float = 0.1
+    ):
+        self.n_features = n_features
+        self.lstm_units = lstm_units
+        self.dropout_rate = dropout_rate
+        self.over_limit_weight = over_limit_weight
+        self.model = None
+
+    def _layers(self) -> dict:
+        """Named layers shared by the batch and streaming graphs"""
+        return {
+            'lstm': layers.LSTM(self.lstm_units, return_sequences=True, return_state=True, name='causal_lstm'),
+            'hidden': [
+                layers.Dense(32, activation='relu', name='dense_1'),
+                layers.Dropout(self.dropout_rate, name='dropout_dense'),
+                layers.Dense(16, activation='relu', name='dense_2'),
+            ],
+            'bac': layers.Dense(1, activation='linear', name='bac'),
+            'over_limit': layers.Dense(1, activation='sigmoid', name='over_limit'),
+        }
+
+    def build_model(self) -> Model:
+        """Training/batch model over sequences of any length: [batch, T, 6] -> per-step outputs."""
+        built = self._layers()
+        inputs = layers.Input(shape=(None, self.n_features), name='sensor_input')
+        # A forward LSTM only sees steps <= t, so every output is causal
+        sequence, _, _ = built['lstm'](inputs)
+        hidden = layers.Dropout(self.dropout_rate, name='dropout_lstm')(sequence)
+        for layer in built['hidden']:
+            hidden = layer(hidden)
+        outputs = {'bac': built['bac'](hidden), 'over_limit': built['over_limit'](hidden)}
+        return Model(inputs=inputs, outputs=outputs, name='AlcoWatch_BAC_Sequence_Model')
+
+    def build_streaming_model(self) -> Model:
+        """
+        One step per call with explicit LSTM state:
+        (sensor_input [batch, 1, 6], state_h, state_c) -> (bac, over_limit, state_h, state_c).
+        Shares weights with self.model by layer name. Unrolled, so it converts to
+        TFLite builtins without Flex TensorList ops.
+        """
+        if self.model is None:
+            raise ValueError("Model must be built before creating the streaming model")
+        built = self._layers()
+        built['lstm'] = layers.LSTM(self.lstm_units, return_sequences=True, return_state=True,
+                                    unroll=True, name='causal_lstm')
+        inputs = layers.Input(shape=(1, self.n_features), name='sensor_input')
+        states = [layers.Input(shape=(self.lstm_units,), name=name) for name in STATE_NAMES]
+        hidden, state_h, state_c = built['lstm'](inputs, initial_state=states)
+        for layer in built['hidden']:
+            hidden = layer(hidden)
+        outputs = {
+            'bac': layers.Reshape((1,), name='bac_step')(built['bac'](hidden)),
+            'over_limit': layers.Reshape((1,), name='over_limit_step')(built['over_limit'](hidden)),
+            'state_h': state_h,
+            'state_c': state_c,
+        }
+        streaming = Model(inputs=[inputs, *states], outputs=outputs, name='AlcoWatch_BAC_Streaming')
+        for layer in streaming.layers:
+            if layer.weights:
+                layer.set_weights(self.model.get_layer(layer.name).get_weights())
+        return streaming
+
+    def compile_model(self, learning_rate: float = 0.001):
+        """Compile with the per-step BAC-aware loss plus a weighted over-limit BCE."""
+        if self.model is None:
+            self.model = self.build_model()
+        self.model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+            loss={'bac': sequence_bac_loss, 'over_limit': 'binary_crossentropy'},
+            loss_weights={'bac': 1.0, 'over_limit': self.over_limit_weight},
+            weighted_metrics={'bac': ['mae']},
+        )
+        return self.model
+
+    @staticmethod
+    def _targets(y: np.ndarray) -> Dict[str, np.ndarray]:
+        y = y[..., np.newaxis].astype(np.float32)
+        return {'bac': y, 'over_limit': (y > LEGAL_LIMIT).astype(np.float32)}
+
+    def train(
+        self,
+        X_train: np.ndarray,
+        y_train: np.ndarray,
+        w_train: np.ndarray,
+        X_val: np.ndarray,
+        y_val: np.ndarray,
+        w_val: np.ndarray,
+        epochs: int = 50,
+        batch_size: int = 16,
+        callbacks: Optional[list] = None
+    ):
+        """Train on chunks; w_* are the per-step weights from create_session_chunks."""
+        if self.model is None:
+            self.compile_model()
+        if callbacks is None:
+            callbacks = [
+                keras.callbacks.EarlyStopping(monitor='val_loss', patience=8, restore_best_weights=True),
+                keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=4, min_lr=1e-6),
+            ]
+        return self.model.fit(
+            X_train, self._targets(y_train),
+            sample_weight={'bac': w_train, 'over_limit': w_train},
+            validation_data=(X_val, self._targets(y_val), {'bac': w_val, 'over_limit': w_val}),
+            epochs=epochs,
+            batch_size=batch_size,
+            callbacks=callbacks,
+            verbose=1
+        )
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Per-step BAC for [batch, T, 6] (or a single [T, 6] session) -> [batch, T]."""
+        if self.model is None:
+            raise ValueError("Model must be trained before prediction")
+        X = X[np.newaxis] if X.ndim == 2 else X
+        return self.model.predict(X, verbose=0)['bac'][..., 0]
+
+    def evaluate(self, X_test: np.ndarray, y_test: np.ndarray, w_test: np.ndarray) -> dict:
+        """Safety metrics over every weighted step."""
+        y_pred = self.predict(X_test)
+        mask = w_test > 0
+        return safety_metrics(y_test[mask], y_pred[mask])
+
+    def convert_streaming_tflite(self, output_path: str = 'models/bac_sequence_streaming.tflite',
+                                 quantize: bool = True) -> bytes:
+        """Export the single-step streaming model to TensorFlow Lite."""
+        tflite_model = export_tflite(self.build_streaming_model(), output_path, quantize)
+        print(f"Streaming TFLite model saved to {output_path}")
+        print(f"Model size: {len(tflite_model) / 1024:.2f} KB")
+        return tflite_model
+
+
+def stream_tflite(tflite_path: str, session: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Run a [T, 6] session one sample at a time through the streaming TFLite model."""
+    runner = tf.lite.Interpreter(model_path=tflite_path).get_signature_runner()
+    n_units = runner.get_input_details()['state_h']['shape'][-1]
+    state = {name: np.zeros((1, n_units), np.float32) for name in STATE_NAMES}
+    bac, over_limit = [], []
+    for sample in session.astype(np.float32):
+        out = runner(sensor_input=sample[np.newaxis, np.newaxis], **state)
+        state = {name: out[name] for name in STATE_NAMES}
+        bac.append(out['bac'][0, 0])
+        over_limit.append(out['over_limit'][0, 0])
+    return np.array(bac), np.array(over_limit)
+
+
+def split_sessions(df, test_size: float = 0.15, val_size: float = 0.15, seed: int = 42):
+    """Train/val/test frames split by session, so no session's chunks leak across sets"""
+    sessions = df['session_id'].unique()
+    temp, test = train_test_split(sessions, test_size=test_size, random_state=seed)
+    train, val = train_test_split(temp, test_size=val_size / (1 - test_size), random_state=seed)
+    return tuple(df[df['session_id'].isin(ids)] for ids in (train, val, test))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the per-timestep BAC sequence model")
+    parser.add_argument('--chunk-length', type=int, default=120, help="Steps per chunk (30 s each)")
+    parser.add_argument('--warmup', type=int, default=10, help="Context steps before labels count")
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--subjects', type=int, default=50)
+    parser.add_argument('--output-dir', default='models')
+    args = parser.parse_args()
+
+    np.random.seed(42)
+    tf.random.set_seed(42)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print("=" * 70)
+    print("AlcoWatch BAC Sequence Model - Per-Timestep Training")
+    print("=" * 70)
+
+    print("\n[1/4] Loading dataset...")
+    loader = AlcoholDatasetLoader(data_dir="data/raw")
+    df = loader.create_synthetic_dataset(n_subjects=args.subjects, sessions_per_subject=5, noise_level=0.03)
+    df = loader.preprocess_data(df, normalize=True, remove_outliers=True)
+    splits = [loader.create_session_chunks(part, args.chunk_length, args.warmup)
+              for part in split_sessions(df)]
+    (X_train, y_train, w_train), (X_val, y_val, w_val), (X_test, y_test, w_test) = splits
+    n_labels = int(sum(w.sum() for _, _, w in splits))
+    n_steps = sum(x.shape[0] * x.shape[1] for x, _, _ in splits)
+    print(f"   Chunks: {len(X_train)}/{len(X_val)}/{len(X_test)} x {args.chunk_length} steps")
+    print(f"   {n_steps} input steps for {n_labels} labels "
+          f"({n_steps / n_labels:.2f}x; 10-step windows need ~10x)")
+
+    print("\n[2/4] Training...")
+    model = BACSequenceModel(n_features=X_train.shape[2])
+    model.compile_model(learning_rate=0.001)
+    history = model.train(X_train, y_train, w_train, X_val, y_val, w_val,
+                          epochs=args.epochs, batch_size=args.batch_size)
+
+    print("\n[3/4] Evaluating...")
+    metrics = model.evaluate(X_test, y_test, w_test)
+    print(f"   Per-step MAE: {metrics['mae']:.4f}  FNR: {metrics['fnr']:.2%}  FPR: {metrics['fpr']:.2%}")
+
+    print("\n[4/4] Exporting streaming model...")
+    tflite_path = os.path.join(args.output_dir, 'bac_sequence_streaming.tflite')
+    model.convert_streaming_tflite(tflite_path)
+    # Streaming one sample at a time must reproduce the batch model on a session
+    session = X_test[0][w_test[0] > 0]  # first chunk of a test session, padding dropped
+    streamed, _ = stream_tflite(tflite_path, session)
+    stream_error = float(np.max(np.abs(streamed - model.predict(session)[0])))
+    print(f"   Streaming vs batch max abs difference: {stream_error:.2e}")
+
+    model.model.save(os.path.join(args.output_dir, 'bac_sequence_model.keras'))
+    report = {
+        'chunk_length': args.chunk_length,
+        'warmup': args.warmup,
+        'input_steps_per_label': round(n_steps / n_labels, 3),
+        'epochs_run': len(history.history['loss']),
+        'test_metrics': {k: float(v) for k, v in metrics.items()},
+        'streaming_tflite_kb': round(os.path.getsize(tflite_path) / 1024, 2),
+        'streaming_max_abs_diff': stream_error,
+    }
+    report_path = os.path.join(args.output_dir, 'sequence_model_metrics.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ tf.random.set_seed(42)
 
 from data.dataset_loader import AlcoholDatasetLoader
 from training.bac_estimation_model import BACEstimationModel, ClimateAdaptiveModel
+from benchmark_inference import numpy_kernel_for, run_suite, write_report
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
@@ -341,6 +342,21 @@ def main():
     model.model.save('models/bac_model_full.h5')
     print("   Full model saved")
 
+    # Inference latency of every backend (warm, percentiles, per batch size)
+    print("\n   Benchmarking inference latency...")
+    latency_config = {'batch_sizes': [1, 64], 'tflite_threads': [1, 2, 4], 'warmup': 10, 'iterations': 50}
+    try:
+        kernel = numpy_kernel_for(model.model)
+    except ImportError as e:
+        print(f"   NumPy kernel unavailable: {e}")
+        kernel = None
+    latency = run_suite(model.model, tflite_path if os.path.exists(tflite_path) else None, kernel,
+                        **latency_config)
+    # Training has already started TF, so threads cannot be pinned here (tf_threads=0 is the
+    # TF default, as in the CLI); run benchmark_inference.py for pinned numbers
+    write_report('models/latency_benchmark.json', latency, dict(latency_config, tf_threads=0))
+    print("   Latency results saved to models/latency_benchmark.json")
+
     # Climate calibration test
     print("\n" + "=" * 70)
     print("Climate-Adaptive Calibration Test")
@@ -0,0 +1,269 @@
+"""
+Batch export of BAC estimates for the fleet backend
+Writes many BACEstimate records to NDJSON, CSV or Arrow without building a
+per-object dict, while keeping the exact schema produced by BACEstimate.to_dict
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from json.encoder import encode_basestring_ascii
+from operator import attrgetter
+from typing import IO, TYPE_CHECKING, Iterable, Iterator, List, Sequence
+
+if TYPE_CHECKING:
+    from sensor_data import BACEstimate
+
+
+# Column order of BACEstimate.to_dict / SensorReading.to_dict
+ESTIMATE_FIELDS = [
+    'timestamp', 'bac_value', 'confidence', 'alert_level',
+    'sensor_readings', 'model_version', 'calibration_offset',
+]
+READING_FIELDS = [
+    'timestamp', 'ppg_value', 'ppg_quality', 'eda_value',
+    'temperature', 'ambient_temp', 'humidity', 'device_id',
+]
+
+# Flat CSV header: nested reading fields are prefixed with "sensor_readings."
+CSV_COLUMNS = (
+    [f for f in ESTIMATE_FIELDS if f != 'sensor_readings'] +
+    ['sensor_readings.' + f for f in READING_FIELDS]
+)
+
+# Field order of json.dumps(estimate.to_dict())
+_NDJSON_COLUMNS = (
+    'timestamp', 'bac_value', 'confidence', 'alert_level',
+    'sensor_readings.timestamp', 'sensor_readings.ppg_value',
+    'sensor_readings.ppg_quality', 'sensor_readings.eda_value',
+    'sensor_readings.temperature', 'sensor_readings.ambient_temp',
+    'sensor_readings.humidity', 'sensor_readings.device_id',
+    'model_version', 'calibration_offset',
+)
+_NDJSON_TEMPLATE = (
+    '{"timestamp": %s, "bac_value": %s, "confidence": %s, "alert_level": %s, '
+    '"sensor_readings": {"timestamp": %s, "ppg_value": %s, "ppg_quality": %s, '
+    '"eda_value": %s, "temperature": %s, "ambient_temp": %s, "humidity": %s, '
+    '"device_id": %s}, "model_version": %s, "calibration_offset": %s}\n'
+)
+
+# Scalar types whose json.dumps() text never contains the ", " list separator
+_NUMERIC_TYPES = {float, int, bool, type(None)}
+
+_get_estimate = attrgetter(
+    'timestamp', 'bac_value', 'confidence', 'alert_level.value',
+    'model_version', 'calibration_offset', 'sensor_readings',
+)
+_get_reading = attrgetter(*READING_FIELDS)
+
+
+def format_timestamps(timestamps) -> List[str]:
+    """
+    Format many timestamps exactly like datetime.isoformat()
+
+    A NumPy datetime64 array (e.g. a pandas column) is formatted in one
+    vectorized call. For datetime objects, converting to datetime64 costs more
+    than isoformat() itself, so those are mapped through isoformat() directly.
+    """
+    if getattr(timestamps, 'dtype', None) is not None:
+        import numpy as np
+        arr = np.asarray(timestamps, dtype='datetime64[us]')
+        whole_seconds = (arr.astype(np.int64) % 1_000_000) == 0
+        # isoformat() drops the fractional part when microsecond == 0
+        return np.where(
+            whole_seconds,
+            np.datetime_as_string(arr, unit='s'),
+            np.datetime_as_string(arr, unit='us'),
+        ).tolist()
+    return list(map(datetime.isoformat, timestamps))
+
+
+def _json_column(values: Sequence) -> List[str]:
+    """
+    JSON-encode every value of a column exactly as json.dumps() would
+
+    Numeric columns are encoded with a single C-level json.dumps() call on the
+    whole column and split apart again; strings are escaped once per distinct
+    value (versions, device ids and alert levels repeat heavily).
+    """
+    kinds = set(map(type, values))
+    if kinds <= _NUMERIC_TYPES:
+        return json.dumps(list(values))[1:-1].split(', ') if values else []
+    if kinds == {str}:
+        cache = {}
+        out = []
+        for value in values:
+            text = cache.get(value)
+            if text is None:
+                text = cache[value] = encode_basestring_ascii(value)
+            out.append(text)
+        return out
+    return [json.dumps(value) for value in values]
+
+
+def _csv_field(value) -> str:
+    """Render one value exactly as csv.writer would."""
+    buf = io.StringIO()
+    # The writer only quotes newlines found in its lineterminator, so keep the
+    # default '\r\n' and strip it (with the dummy second field) afterwards
+    csv.writer(buf).writerow([value, ''])
+    return buf.getvalue()[:-3]
+
+
+def _csv_column(values: Sequence) -> List[str]:
+    """CSV-encode every value of a column exactly as csv.writer would."""
+    kinds = set(map(type, values))
+    if kinds <= {float, int, type(None)} and values:
+        text = json.dumps(list(values))
+        # Finite floats and ints share repr with JSON; null -> empty field
+        if 'NaN' not in text and 'Infinity' not in text:
+            return [
+                '' if t == 'null' else t
+                for t in text[1:-1].split(', ')
+            ]
+    cache = {}
+    out = []
+    for value in values:
+        if value is None:
+            out.append('')
+            continue
+        if not isinstance(value, str):
+            out.append(str(value))  # csv.writer stringifies non-strings
+            continue
+        text = cache.get(value)
+        if text is None:
+            text = cache[value] = _csv_field(value)
+        out.append(text)
+    return out
+
+
+def _columns(estimates: Iterable['BACEstimate']) -> dict:
+    """Collect estimate and reading attributes into per-field sequences."""
+    estimates = list(estimates)
+    if not estimates:
+        return {name: () for name in CSV_COLUMNS}
+
+    (timestamps, bac_values, confidences, alert_levels, versions,
+     offsets, readings) = zip(*map(_get_estimate, estimates))
+    reading_cols = list(zip(*map(_get_reading, readings)))
+
+    cols = {
+        'timestamp': format_timestamps(timestamps),
+        'bac_value': bac_values,
+        'confidence': confidences,
+        'alert_level': alert_levels,
+        'model_version': versions,
+        'calibration_offset': offsets,
+        'sensor_readings.timestamp': format_timestamps(reading_cols[0]),
+    }
+    for field, values in zip(READING_FIELDS[1:], reading_cols[1:]):
+        cols['sensor_readings.' + field] = values
+    return cols
+
+
+def iter_ndjson(estimates: Iterable['BACEstimate']) -> Iterator[str]:
+    """
+    Yield one JSON line per estimate, newline included
+
+    Each line is identical to json.dumps(estimate.to_dict()) + '\\n'.
+    """
+    cols = _columns(estimates)
+    encoded = [_json_column(cols[name]) for name in _NDJSON_COLUMNS]
+    template = _NDJSON_TEMPLATE
+    for row in zip(*encoded):
+        yield template % row
+
+
+def write_ndjson(estimates: Iterable['BACEstimate'], fp: IO[str]) -> int:
+    """Write estimates as newline-delimited JSON. Returns number of records."""
+    lines = list(iter_ndjson(estimates))
+    fp.write(''.join(lines))
+    return len(lines)
+
+
+def write_csv(estimates: Iterable['BACEstimate'], fp: IO[str]) -> int:
+    """
+    Write estimates as CSV with a flattened to_dict header (CSV_COLUMNS)
+
+    Output matches csv.writer over the flattened to_dict values: None is an
+    empty field and numbers use repr().
+    """
+    cols = _columns(estimates)
+    # ISO-8601 timestamps never contain characters that need CSV quoting
+    encoded = [
+        cols[name] if name.endswith('timestamp') else _csv_column(cols[name])
+        for name in CSV_COLUMNS
+    ]
+    lines = [','.join(CSV_COLUMNS)]
+    lines.extend(map(','.join, zip(*encoded)))
+    lines.append('')
+    fp.write('\r\n'.join(lines))
+    return len(lines) - 2
+
+
+def arrow_schema():
+    """
+    Fixed pyarrow schema of to_arrow_table
+
+    Numbers are always float64 and strings always string, so a batch of
+    integer-only or all-None values keeps the same column types.
+    Requires pyarrow.
+    """
+    import pyarrow as pa
+
+    reading = pa.struct([
+        ('timestamp', pa.string()),
+        ('ppg_value', pa.float64()),
+        ('ppg_quality', pa.float64()),
+        ('eda_value', pa.float64()),
+        ('temperature', pa.float64()),
+        ('ambient_temp', pa.float64()),
+        ('humidity', pa.float64()),
+        ('device_id', pa.string()),
+    ])
+    return pa.schema([
+        ('timestamp', pa.string()),
+        ('bac_value', pa.float64()),
+        ('confidence', pa.float64()),
+        ('alert_level', pa.string()),
+        ('sensor_readings', reading),
+        ('model_version', pa.string()),
+        ('calibration_offset', pa.float64()),
+    ])
+
+
+def to_arrow_table(estimates: Iterable['BACEstimate']):
+    """
+    Build a pyarrow Table with the to_dict schema (see arrow_schema)
+
+    sensor_readings is a struct column, timestamps are ISO-8601 strings.
+    Requires pyarrow.
+    """
+    import pyarrow as pa
+
+    schema = arrow_schema()
+    reading_type = schema.field('sensor_readings').type
+    cols = _columns(estimates)
+    readings = pa.StructArray.from_arrays(
+        [pa.array(cols['sensor_readings.' + f.name], type=f.type) for f in reading_type],
+        fields=list(reading_type),
+    )
+    arrays = []
+    for field in schema:
+        if field.name == 'sensor_readings':
+            arrays.append(readings)
+        else:
+            arrays.append(pa.array(cols[field.name], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_arrow(estimates: Iterable['BACEstimate'], path: str) -> int:
+    """Write estimates to an Arrow IPC file. Returns number of records."""
+    import pyarrow as pa
+
+    table = to_arrow_table(estimates)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return table.num_rows
@@ -3,6 +3,7 @@ Shared data models for AlcoWatch system
 Defines the structure of sensor data, BAC estimates, and communication messages
 """
 
+import struct
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional, List
@@ -152,6 +153,107 @@ class ClimateCalibration:
     }
 
 
+def safe_correction(bac_model: float, bac_corrected: float) -> float:
+    """
+    Corrected BAC, except that a model reading over the legal limit is never
+    corrected to at or below it; the uncorrected reading is kept instead.
+    """
+    if bac_model > LEGAL_BAC_LIMIT_US and bac_corrected <= LEGAL_BAC_LIMIT_US:
+        return bac_model
+    return max(0.0, bac_corrected)
+
+
+@dataclass
+class PersonalCalibration:
+    """
+    Per-user linear correction of the global model: bac = scale * bac_model + bias.
+    Fitted by ridge least squares on breathalyzer-confirmed samples, shrunk
+    toward the identity by `prior_strength` pseudo-samples. Only the running
+    sums are kept, so each sample is an O(1) update and the whole state packs
+    into PACKED_SIZE bytes.
+
+    Safety rule: corrections are bounded on the false-negative side. Downward
+    corrections are capped far tighter than upward ones (scale >= 0.9,
+    bias >= -0.01 g/dL), and a model reading above the legal limit is never
+    personalized to at or below it (see safe_correction); only upward
+    corrections can move a reading across the limit.
+    """
+    scale: float = 1.0
+    bias: float = 0.0
+    n: float = 0.0  # effective sample count
+    sum_x: float = 0.0  # model BAC
+    sum_y: float = 0.0  # breathalyzer BAC
+    sum_xx: float = 0.0
+    sum_xy: float = 0.0
+
+    PRIOR_STRENGTH = 3.0  # pseudo-samples pulling toward scale 1, bias 0
+    SCALE_LIMITS = (0.9, 2.0)  # asymmetric: lowering readings risks false negatives
+    BIAS_LIMITS = (-0.01, 0.05)  # g/dL
+    _FORMAT = '<B7f'
+    _VERSION = 1
+    PACKED_SIZE = struct.calcsize(_FORMAT)
+
+    @classmethod
+    def from_baseline(cls, bac_baseline: float) -> 'PersonalCalibration':
+        """Seed with the model's sober reading as one confirmed zero-BAC sample"""
+        calibration = cls()
+        calibration.update(bac_baseline, 0.0)
+        return calibration
+
+    def update(self, bac_model: float, bac_measured: float, decay: float = 1.0):
+        """
+        Add one confirmed sample and refit. decay < 1 down-weights older
+        samples so the correction can follow slow drift.
+        """
+        self.n = self.n * decay + 1.0
+        self.sum_x = self.sum_x * decay + bac_model
+        self.sum_y = self.sum_y * decay + bac_measured
+        self.sum_xx = self.sum_xx * decay + bac_model * bac_model
+        self.sum_xy = self.sum_xy * decay + bac_model * bac_measured
+        self._fit()
+
+    def _fit(self):
+        # Normal equations of sum (y - a x - b)^2 + k x_ref^2 (a - 1)^2 + k b^2,
+        # with x_ref the legal limit so both priors act on a BAC-sized scale
+        prior_scale = self.PRIOR_STRENGTH * LEGAL_BAC_LIMIT_US ** 2
+        a11 = self.sum_xx + prior_scale
+        a12 = self.sum_x
+        a22 = self.n + self.PRIOR_STRENGTH
+        r1 = self.sum_xy + prior_scale
+        r2 = self.sum_y
+        det = a11 * a22 - a12 * a12
+        scale = (r1 * a22 - a12 * r2) / det
+        bias = (a11 * r2 - a12 * r1) / det
+        self.scale = min(max(scale, self.SCALE_LIMITS[0]), self.SCALE_LIMITS[1])
+        self.bias = min(max(bias, self.BIAS_LIMITS[0]), self.BIAS_LIMITS[1])
+
+    def apply(self, bac_model: float) -> float:
+        """Personalized BAC, never negative and never moved below the legal limit"""
+        return safe_correction(bac_model, self.scale * bac_model + self.bias)
+
+    def to_bytes(self) -> bytes:
+        return struct.pack(self._FORMAT, self._VERSION, self.scale, self.bias, self.n,
+                           self.sum_x, self.sum_y, self.sum_xx, self.sum_xy)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'PersonalCalibration':
+        version, *values = struct.unpack(cls._FORMAT, data)
+        if version != cls._VERSION:
+            raise ValueError(f"Unsupported PersonalCalibration version {version}")
+        return cls(*values)
+
+    def to_dict(self):
+        return {
+            'scale': self.scale,
+            'bias': self.bias,
+            'n': self.n,
+            'sum_x': self.sum_x,
+            'sum_y': self.sum_y,
+            'sum_xx': self.sum_xx,
+            'sum_xy': self.sum_xy
+        }
+
+
 @dataclass
 class UserProfile:
     """User profile for personalized BAC estimation"""
@@ -163,11 +265,29 @@ class UserProfile:
     bac_baseline: Optional[float] = None  # Baseline BAC when sober
     calibration: Optional[ClimateCalibration] = None
     medical_conditions: List[str] = None
+    personalization: Optional[PersonalCalibration] = None
 
     def __post_init__(self):
         if self.medical_conditions is None:
             self.medical_conditions = []
 
+    def add_confirmed_sample(self, bac_model: float, bac_measured: float, decay: float = 1.0):
+        """Update the personal correction with a breathalyzer-confirmed reading"""
+        if self.personalization is None:
+            self.personalization = (PersonalCalibration() if self.bac_baseline is None
+                                    else PersonalCalibration.from_baseline(self.bac_baseline))
+        self.personalization.update(bac_model, bac_measured, decay)
+
+    def personalize(self, bac_model: float) -> float:
+        """Model BAC (after climate calibration) corrected for this user"""
+        if self.personalization is not None:
+            return self.personalization.apply(bac_model)
+        if self.bac_baseline is not None:
+            # Same bias bounds as a fitted correction
+            low, high = PersonalCalibration.BIAS_LIMITS
+            return safe_correction(bac_model, bac_model + min(max(-self.bac_baseline, low), high))
+        return bac_model
+
 
 # Constants
 LEGAL_BAC_LIMIT_US = 0.08  # g/dL
@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+import math
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from batch_export import (
+    CSV_COLUMNS,
+    ESTIMATE_FIELDS,
+    READING_FIELDS,
+    arrow_schema,
+    to_arrow_table,
+    write_csv,
+    write_ndjson,
+)
+from sensor_data import AlertLevel, BACEstimate, SensorReading
+
+SPECIAL_STRINGS = ['plain', '', 'comma, inside', 'quote " inside', 'new\nline', 'café ☃', 'tab\t', '\\back']
+
+
+def make_estimates():
+    base = datetime(2024, 5, 1, 12, 0, 0)
+    zones = [None, timezone.utc, timezone(timedelta(hours=5, minutes=30))]
+    numbers = [0.0, 0.08, 1e-7, 123456789.125, -0.0, math.nan, math.inf, 3]
+    estimates = []
+    for i in range(24):
+        stamp = (base + timedelta(seconds=i, microseconds=0 if i % 2 else 1234 * i)).replace(
+            tzinfo=zones[i % 3])
+        reading = SensorReading(
+            timestamp=stamp - timedelta(milliseconds=250),
+            ppg_value=numbers[i % len(numbers)],
+            ppg_quality=1 if i % 4 == 0 else 0.9,  # int and float in one column
+            eda_value=4.2,
+            temperature=33.1,
+            ambient_temp=None if i % 3 == 0 else 24.5,
+            humidity=None if i % 5 == 0 else 55,
+            device_id=None if i % 7 == 0 else SPECIAL_STRINGS[i % len(SPECIAL_STRINGS)],
+        )
+        estimates.append(BACEstimate(
+            timestamp=stamp,
+            bac_value=numbers[(i + 3) % len(numbers)],
+            confidence=0.93,
+            alert_level=list(AlertLevel)[i % 4],
+            sensor_readings=reading,
+            model_version=SPECIAL_STRINGS[(i + 1) % len(SPECIAL_STRINGS)],
+            calibration_offset=None if i % 6 == 0 else -0.002,
+        ))
+    return estimates
+
+
+def as_floats(d):
+    """to_dict with int numbers widened to float, as the Arrow schema stores them"""
+    return {k: as_floats(v) if isinstance(v, dict) else float(v) if type(v) is int else v
+            for k, v in d.items()}
+
+
+def flatten(estimate):
+    d = estimate.to_dict()
+    row = [d[f] for f in ESTIMATE_FIELDS if f != 'sensor_readings']
+    return row + [d['sensor_readings'][f] for f in READING_FIELDS]
+
+
+class TestMatchesToDict:
+    def test_ndjson_matches_json_dumps(self):
+        estimates = make_estimates()
+        out = io.StringIO()
+        assert write_ndjson(estimates, out) == len(estimates)
+        assert out.getvalue() == ''.join(json.dumps(e.to_dict()) + '\n' for e in estimates)
+
+    def test_csv_matches_csv_writer(self):
+        estimates = make_estimates()
+        out = io.StringIO()
+        assert write_csv(estimates, out) == len(estimates)
+        expected = io.StringIO()
+        writer = csv.writer(expected)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(flatten(e) for e in estimates)
+        assert out.getvalue() == expected.getvalue()
+
+    def test_empty_batch(self):
+        out = io.StringIO()
+        assert write_ndjson([], out) == 0
+        assert out.getvalue() == ''
+
+
+class TestArrowSchema:
+    def test_schema_does_not_depend_on_batch(self):
+        pytest.importorskip('pyarrow')
+        estimates = make_estimates()
+        # ppg_quality is int-only in some batches; ambient_temp/device_id all None in others
+        schemas = {to_arrow_table(estimates[i:i + 1]).schema for i in range(len(estimates))}
+        schemas.add(to_arrow_table(estimates).schema)
+        schemas.add(to_arrow_table([]).schema)
+        assert schemas == {arrow_schema()}
+
+    def test_values_match_to_dict(self):
+        pytest.importorskip('pyarrow')
+        estimates = make_estimates()
+        rows = to_arrow_table(estimates).to_pylist()
+        for row, estimate in zip(rows, estimates):
+            assert json.dumps(row) == json.dumps(as_floats(estimate.to_dict()))
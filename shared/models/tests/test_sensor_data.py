@@ -0,0 +1,101 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sensor_data import LEGAL_BAC_LIMIT_US, PersonalCalibration, UserProfile, safe_correction
+
+
+def make_profile(**kwargs):
+    return UserProfile(user_id='u1', age=30, weight=70.0, height=175.0, gender='M', **kwargs)
+
+
+def fit(samples, decay=1.0):
+    calibration = PersonalCalibration()
+    for bac_model, bac_measured in samples:
+        calibration.update(bac_model, bac_measured, decay)
+    return calibration
+
+
+class TestSafeCorrection:
+    def test_over_limit_never_corrected_to_or_below_limit(self):
+        rng = np.random.default_rng(0)
+        for bac_model, corrected in rng.uniform(0.0, 0.3, (2000, 2)):
+            result = safe_correction(bac_model, corrected)
+            if bac_model > LEGAL_BAC_LIMIT_US:
+                assert result > LEGAL_BAC_LIMIT_US
+            assert result >= 0.0
+
+    def test_correction_applies_otherwise(self):
+        assert safe_correction(0.06, 0.05) == pytest.approx(0.05)
+        assert safe_correction(0.09, 0.085) == pytest.approx(0.085)
+        assert safe_correction(0.01, -0.02) == 0.0
+
+
+class TestPersonalCalibration:
+    def test_identity_without_samples(self):
+        assert PersonalCalibration().apply(0.05) == pytest.approx(0.05)
+
+    def test_converges_on_simulated_offset(self):
+        rng = np.random.default_rng(1)
+        x = rng.uniform(0.0, 0.15, 200)
+        calibration = fit(zip(x, 1.2 * x + 0.02 + rng.normal(0, 0.002, x.size)))
+        assert calibration.scale == pytest.approx(1.2, abs=0.02)
+        assert calibration.bias == pytest.approx(0.02, abs=0.002)
+
+    def test_downward_corrections_clamped(self):
+        x = np.linspace(0.0, 0.15, 50)
+        calibration = fit(zip(x, 0.5 * x - 0.05))
+        assert (calibration.scale, calibration.bias) == (
+            PersonalCalibration.SCALE_LIMITS[0], PersonalCalibration.BIAS_LIMITS[0])
+
+    def test_upward_corrections_clamped(self):
+        x = np.linspace(0.0, 0.15, 50)
+        calibration = fit(zip(x, 3.0 * x + 0.1))
+        assert (calibration.scale, calibration.bias) == (
+            PersonalCalibration.SCALE_LIMITS[1], PersonalCalibration.BIAS_LIMITS[1])
+
+    def test_clamped_fit_keeps_over_limit_reading(self):
+        calibration = fit([(0.12, 0.0)] * 20)
+        assert calibration.apply(0.20) > LEGAL_BAC_LIMIT_US
+        assert calibration.apply(0.085) > LEGAL_BAC_LIMIT_US
+
+    def test_decay_follows_drift(self):
+        # Sensor drifts from no offset to +0.03 g/dL; a decayed fit tracks the new offset closer
+        x = np.tile(np.linspace(0.0, 0.15, 10), 20)
+        errors = {}
+        for decay in (1.0, 0.9):
+            calibration = fit(zip(x, x), decay)
+            for bac_model in x:
+                calibration.update(bac_model, bac_model + 0.03, decay)
+            errors[decay] = abs(calibration.apply(0.05) - 0.08)
+        assert errors[0.9] < errors[1.0]
+
+    def test_bytes_round_trip(self):
+        calibration = fit([(0.02, 0.0), (0.07, 0.09), (0.11, 0.12)])
+        data = calibration.to_bytes()
+        assert len(data) == PersonalCalibration.PACKED_SIZE == 29
+        restored = PersonalCalibration.from_bytes(data)
+        for name, value in calibration.to_dict().items():
+            assert getattr(restored, name) == pytest.approx(value, rel=1e-6)
+
+    def test_unknown_version_rejected(self):
+        data = bytes([PersonalCalibration._VERSION + 1]) + PersonalCalibration().to_bytes()[1:]
+        with pytest.raises(ValueError):
+            PersonalCalibration.from_bytes(data)
+
+
+class TestUserProfile:
+    def test_baseline_fallback_bias_is_clamped(self):
+        profile = make_profile(bac_baseline=0.05)
+        low = PersonalCalibration.BIAS_LIMITS[0]
+        assert profile.personalize(0.07) == pytest.approx(0.07 + low)
+
+    def test_baseline_fallback_keeps_over_limit_reading(self):
+        profile = make_profile(bac_baseline=0.005)
+        assert profile.personalize(0.082) > LEGAL_BAC_LIMIT_US
+
+    def test_no_baseline_no_samples_is_identity(self):
+        assert make_profile().personalize(0.07) == 0.07